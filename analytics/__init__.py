@@ -0,0 +1,216 @@
+'''
+Offline play analytics over the ball drop logs of one or more cabinets.
+
+The logs written by scores.DropLog are streamed a chunk of rows at a time
+into NumPy arrays, so the memory used does not depend on the length of
+the history. Each chunk is reduced with vectorised operations into:
+
+* hits and hit rate per target, relative to the balls rolled
+* a histogram of game scores
+* the mean game length, from the first to the last drop of each game
+* dead sensors: targets with no hits in the most recent games
+
+Requires numpy, which is only needed where the analytics are run:
+
+    python -m analytics drops/ [other-cabinet/drops ...]
+'''
+import numpy
+
+from scores import drops
+
+DEFAULT_CHUNK_ROWS = 1024 * 1024
+DEFAULT_TARGETS = 8
+SCORE_BIN = 50
+DEAD_GAMES = 50
+CATCH_ALL = 0
+
+
+def read_chunks(directory, chunk_rows=DEFAULT_CHUNK_ROWS):
+    '''Yield dicts of column arrays of at most chunk_rows rows.'''
+    rows = drops.row_count(directory)
+    files = dict((name, open(drops.column_path(directory, name), 'rb'))
+                 for name, _, _ in drops.COLUMNS)
+    try:
+        while rows > 0:
+            count = min(rows, chunk_rows)
+            yield dict((name, numpy.fromfile(files[name], dtype, count))
+                       for name, _, dtype in drops.COLUMNS)
+            rows -= count
+    finally:
+        for column_file in files.values():
+            column_file.close()
+
+
+class Analysis(object):
+    '''Aggregates of the drops of one cabinet, built a chunk at a time.'''
+
+    def __init__(self, targets=DEFAULT_TARGETS, score_bin=SCORE_BIN,
+                 dead_games=DEAD_GAMES):
+        self.score_bin = score_bin
+        self.dead_games = dead_games
+        self.hits = numpy.zeros(targets, dtype=numpy.int64)
+        self.score_counts = numpy.zeros(0, dtype=numpy.int64)
+        # The bin of score_counts[0]
+        self.low_bin = 0
+        self.games = 0
+        self.points = 0
+        self.length_ns = 0
+        # The last game each target was hit in
+        self.last_hit = numpy.full(targets, -1, dtype=numpy.int64)
+        self.last_game = -1
+        # (game, points, first time, last time) of the game at the end of
+        # the previous chunk, it may carry on into the next
+        self.carry = None
+
+    def add_games(self, scores, lengths):
+        '''Count finished games by score and length.'''
+        if not len(scores):
+            return
+        # Scores may be negative, the counts start at the lowest bin seen
+        bins = scores // self.score_bin
+        low = min(self.low_bin, int(bins.min()))
+        if low < self.low_bin:
+            self.score_counts = numpy.concatenate(
+                [numpy.zeros(self.low_bin - low, dtype=numpy.int64),
+                 self.score_counts])
+            self.low_bin = low
+        counts = numpy.bincount(bins - low)
+        if len(counts) > len(self.score_counts):
+            counts[:len(self.score_counts)] += self.score_counts
+            self.score_counts = counts
+        else:
+            self.score_counts[:len(counts)] += counts
+        self.games += len(scores)
+        self.points += int(scores.sum())
+        self.length_ns += int(lengths.sum())
+
+    def add(self, chunk):
+        '''Fold a chunk of rows from read_chunks into the aggregates.'''
+        game = chunk['game'].astype(numpy.int64)
+        target = chunk['target'].astype(numpy.int64)
+        points = chunk['points'].astype(numpy.int64)
+        times = chunk['time']
+        if not len(game):
+            return
+
+        targets = max(len(self.hits), int(target.max()) + 1)
+        if targets > len(self.hits):
+            self.hits = numpy.concatenate(
+                [self.hits, numpy.zeros(targets - len(self.hits),
+                                        dtype=numpy.int64)])
+            self.last_hit = numpy.concatenate(
+                [self.last_hit, numpy.full(targets - len(self.last_hit), -1,
+                                           dtype=numpy.int64)])
+        self.hits += numpy.bincount(target, minlength=targets)
+        numpy.maximum.at(self.last_hit, target, game)
+        self.last_game = max(self.last_game, int(game[-1]))
+
+        # Rows are in game order, reduce each run of a game
+        starts = numpy.flatnonzero(numpy.diff(game)) + 1
+        starts = numpy.concatenate([[0], starts])
+        ends = numpy.concatenate([starts[1:], [len(game)]]) - 1
+        scores = numpy.add.reduceat(points, starts)
+        firsts = times[starts]
+        lasts = times[ends]
+        if self.carry is not None:
+            carry_game, carry_points, carry_first, _ = self.carry
+            if carry_game == game[0]:
+                scores[0] += carry_points
+                firsts[0] = carry_first
+            else:
+                self.finish()
+        self.carry = (int(game[-1]), int(scores[-1]), int(firsts[-1]),
+                      int(lasts[-1]))
+        self.add_games(scores[:-1], lasts[:-1] - firsts[:-1])
+
+    def finish(self):
+        '''Count the game carried over from the last chunk.'''
+        if self.carry is None:
+            return
+        _, points, first, last = self.carry
+        self.carry = None
+        self.add_games(numpy.array([points]), numpy.array([last - first]))
+
+    def report(self):
+        '''The aggregates as a dict of plain Python values.'''
+        self.finish()
+        balls = int(self.hits[CATCH_ALL])
+        rates = self.hits / balls if balls else self.hits * 0.0
+        scores = (numpy.arange(len(self.score_counts)) + self.low_bin) * \
+            self.score_bin
+        dead = numpy.flatnonzero(
+            self.last_game - self.last_hit >= self.dead_games)
+        return {
+            'games': self.games,
+            'balls': balls,
+            'hits': self.hits.tolist(),
+            'hit_rate': rates.tolist(),
+            'score_histogram': dict(
+                (int(score), int(count)) for score, count
+                in zip(scores, self.score_counts) if count),
+            'mean_score': self.points / self.games if self.games else 0.0,
+            'mean_length_s': (self.length_ns / self.games / 1e9
+                              if self.games else 0.0),
+            'points': self.points,
+            'length_s': self.length_ns / 1e9,
+            'dead_targets': dead.tolist(),
+        }
+
+
+def analyse(directory, chunk_rows=DEFAULT_CHUNK_ROWS, **settings):
+    '''Analyse the drop log of a cabinet, returns Analysis.report().'''
+    analysis = Analysis(**settings)
+    for chunk in read_chunks(directory, chunk_rows):
+        analysis.add(chunk)
+    return analysis.report()
+
+
+def combine(reports):
+    '''Total the reports of several cabinets.
+
+    Dead targets are only meaningful per cabinet, they are not combined.
+    '''
+    games = sum(report['games'] for report in reports)
+    balls = sum(report['balls'] for report in reports)
+    targets = max([len(report['hits']) for report in reports] or [0])
+    hits = [sum(report['hits'][target] for report in reports
+                if target < len(report['hits']))
+            for target in range(targets)]
+    histogram = {}
+    for report in reports:
+        for score, count in report['score_histogram'].items():
+            histogram[score] = histogram.get(score, 0) + count
+    points = sum(report['points'] for report in reports)
+    length = sum(report['length_s'] for report in reports)
+    return {
+        'games': games,
+        'balls': balls,
+        'hits': hits,
+        'hit_rate': [count / balls if balls else 0.0 for count in hits],
+        'score_histogram': dict(sorted(histogram.items())),
+        'mean_score': points / games if games else 0.0,
+        'mean_length_s': length / games if games else 0.0,
+        'points': points,
+        'length_s': length,
+    }
+
+
+def main():
+    import argparse
+    import json
+    import sys
+    parser = argparse.ArgumentParser(
+        description='Play analytics over ball drop logs.')
+    parser.add_argument('directories', nargs='+',
+                        help='the drop log directory of each cabinet')
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS)
+    args = parser.parse_args()
+    cabinets = dict((directory, analyse(directory, args.chunk_rows))
+                    for directory in args.directories)
+    results = {
+        'cabinets': cabinets,
+        'all': combine(list(cabinets.values())),
+    }
+    json.dump(results, sys.stdout, indent=2, sort_keys=True)
+    sys.stdout.write('\n')
+    return 0
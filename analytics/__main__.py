@@ -0,0 +1,5 @@
+import sys
+
+from analytics import main
+
+sys.exit(main())
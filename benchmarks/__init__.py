@@ -0,0 +1,5 @@
+'''
+Performance benchmarks, run from the top of the tree, e.g.:
+
+    python -m benchmarks.input_latency
+'''
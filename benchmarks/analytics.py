@@ -0,0 +1,73 @@
+'''
+Play analytics throughput over a long drop history.
+
+A synthetic history of --rows ball drops is written in the DropLog format
+and analysed in chunks. The rows per second and the peak resident memory
+are reported for each chunk size; the memory stays flat as the history
+grows.
+
+    python -m benchmarks.analytics [--rows N]
+'''
+import argparse
+import os
+import resource
+import tempfile
+import time
+
+import numpy
+
+import analytics
+import game
+from scores import drops
+
+
+def write_history(directory, rows, seed=0, chunk_rows=1024 * 1024):
+    '''Write rows of games of 18 drops, half of them into a target.'''
+    rng = numpy.random.default_rng(seed)
+    values = numpy.array([game.Game.MIDWAY[t] for t in range(8)])
+    files = dict((name, open(drops.column_path(directory, name), 'wb'))
+                 for name, _, _ in drops.COLUMNS)
+    try:
+        for start in range(0, rows, chunk_rows):
+            row = numpy.arange(start, min(rows, start + chunk_rows))
+            target = rng.integers(1, 8, len(row))
+            # Every other drop is the ball reaching the catch-all
+            target[row % 2 == 1] = 0
+            columns = {
+                'game': row // 18,
+                'target': target,
+                'points': values[target],
+                'time': row * 2 * 10**9 + (row // 18) * 60 * 10**9,
+            }
+            for name, _, dtype in drops.COLUMNS:
+                columns[name].astype(dtype).tofile(files[name])
+    finally:
+        for column_file in files.values():
+            column_file.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--rows', type=int, default=20 * 1000 * 1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        write_history(tmp, args.rows)
+        size = sum(os.path.getsize(drops.column_path(tmp, name))
+                   for name, _, _ in drops.COLUMNS)
+        print('History: {} rows, {:.0f} MB'.format(args.rows, size / 1e6))
+        for chunk_rows in (64 * 1024, 1024 * 1024):
+            start = time.monotonic()
+            report = analytics.analyse(tmp, chunk_rows)
+            elapsed = time.monotonic() - start
+            # Linux reports the peak resident set size in kilobytes
+            peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            print('chunk {:8d}: {:6.2f} s, {:10.0f} rows/s, peak RSS '
+                  '{:.0f} MB, {} games'.format(
+                      chunk_rows, elapsed, args.rows / elapsed, peak / 1e3,
+                      report['games']))
+    return 0
+
+
+if __name__ == '__main__':
+    main()
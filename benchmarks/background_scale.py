@@ -0,0 +1,47 @@
+'''
+Time to get the background for each screen size of the fleet.
+
+Scaling the background image to the screen is done on the first start at
+a resolution, later starts load it from the cache. Nothing is scaled per
+frame.
+
+    python -m benchmarks.background_scale
+'''
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks.common import make_background
+
+import pygame
+
+from display import assets
+
+SIZES = ((1280, 720), (1440, 900), (1920, 1080), (3840, 2160))
+
+
+def timed(function, *args):
+    start = time.monotonic()
+    function(*args)
+    return (time.monotonic() - start) * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.parse_args()
+    pygame.init()
+    with tempfile.TemporaryDirectory() as tmp:
+        source = os.path.join(tmp, 'background.png')
+        make_background(source, (1440, 900))
+        cache = assets.ScaledCache(os.path.join(tmp, 'cache'))
+        for size in SIZES:
+            first = timed(cache.background, source, size)
+            later = timed(cache.background, source, size)
+            print('{:>9}: first start {:7.1f} ms, later starts {:6.1f} ms'
+                  .format('{}x{}'.format(*size), first, later))
+    return 0
+
+
+if __name__ == '__main__':
+    main()
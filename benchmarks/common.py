@@ -0,0 +1,101 @@
+'''
+Helpers shared by the benchmarks.
+'''
+import os
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import pygame
+
+
+def make_background(path, size):
+    '''Write a patterned background image of the given size.'''
+    surface = pygame.Surface(size)
+    for x in range(0, size[0], 40):
+        for y in range(0, size[1], 40):
+            surface.fill(((x * 7) % 256, (y * 5) % 256, 64),
+                         (x, y, 20, 20))
+    pygame.image.save(surface, path)
+
+
+def make_config(directory, size=(1440, 900), **settings):
+    '''A configuration using a generated background in directory.'''
+    path = os.path.join(directory, 'background.png')
+    make_background(path, size)
+    config = {'background': path, 'window_size': size, 'score_font': ''}
+    config.update(settings)
+    return config
+
+
+def write_trace(path, games, seed=0, poll_ms=10, missed=0.0):
+    '''Write a synthetic event log of a night of play.
+
+    Each game starts with the start button, then nine balls are rolled a
+    few seconds apart. Most hit a scoring target and then roll on into
+    the catch-all target, the rest only reach the catch-all. Poll ticks
+    are recorded throughout, as the real loop would handle them. The
+    fraction missed of the catch-all edges are left out, as a worn sensor
+    would miss them.
+    '''
+    import random
+
+    import cortex
+    import game
+    import recorder
+
+    rng = random.Random(seed)
+    modes = cortex.OperationMode
+    rec = recorder.Recorder(path, modes.ALL)
+    values = game.Game.MIDWAY
+    now = 0
+    state = game.Game(clock=lambda: now / 1e9)
+    last_poll = [0]
+
+    def write(kind, code, a=0, b=0):
+        # Poll ticks that fell due before this record
+        while last_poll[0] + poll_ms * 1000000 <= now:
+            last_poll[0] += poll_ms * 1000000
+            rec.write(recorder.EVENT, cortex.Cortex.POLL_EVENT, 0, 0,
+                      last_poll[0])
+        rec.write(kind, code, a, b, now)
+
+    def target(number, mode):
+        write(recorder.EVENT, cortex.Cortex.TARGET_EVENT, number,
+              values[number])
+        if mode != modes.PLAY:
+            return mode
+        state.drop_ball(number)
+        if state.check_game_over():
+            write(recorder.EVENT, cortex.Cortex.END_EVENT)
+            write(recorder.MODE, rec.modes[modes.POST_PLAY])
+            return modes.POST_PLAY
+        return mode
+
+    rec.write(recorder.MODE, rec.modes[modes.ATTRACT], now=now)
+    for _ in range(games):
+        now += int(rng.uniform(5, 30) * 1e9)
+        write(recorder.EVENT, cortex.Cortex.START_EVENT)
+        write(recorder.MODE, rec.modes[modes.PLAY])
+        state.start_game()
+        mode = modes.PLAY
+        drops = []
+        for _ in range(9):
+            now += int(rng.uniform(2, 4) * 1e9)
+            if rng.random() < 0.7:
+                drops.append((now, rng.randint(1, 7)))
+            drops.append((now + int(rng.uniform(0.3, 0.8) * 1e9), 0))
+        for at, number in sorted(drops):
+            if number == 0 and missed and rng.random() < missed:
+                continue
+            now = at
+            mode = target(number, mode)
+    rec.close()
+    return rec.count
+
+
+def percentile(values, fraction):
+    '''The nearest rank percentile of sorted values.'''
+    if not values:
+        return None
+    rank = int(round(fraction * (len(values) - 1)))
+    return values[rank]
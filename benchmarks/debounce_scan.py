@@ -0,0 +1,85 @@
+'''
+Micro-benchmark of one input scan across 8, 32 and 128 simulated pins.
+
+The batched InputBank scan is compared with the previous approach of one
+Trigger object per pin, each reading its own pin and the wall clock.
+
+    python -m benchmarks.debounce_scan [--ticks N]
+'''
+import argparse
+import random
+import time
+import timeit
+
+import machine
+from tests.fake_gpio import FakeGPIO
+
+PIN_COUNTS = (8, 32, 128)
+
+
+class LegacyTrigger(object):
+    '''The per-object debounce the input bank replaces.'''
+
+    def __init__(self, gpio, pin):
+        self.gpio = gpio
+        self.pin = pin
+        self.bouncetime = 2000
+        self.latched = False
+        self.latch_time = 0
+
+    def poll(self):
+        state = self.gpio.input(self.pin)
+        now = int(round(time.time() * 1000))
+        if self.latch_time + self.bouncetime > now:
+            return False
+        if self.latched and state == 1:
+            self.latched = False
+            return False
+        if state == 0:
+            self.latched = True
+            self.latch_time = now
+            return True
+        return False
+
+
+def make_gpio(count):
+    '''A fake GPIO where about one pin in sixteen is held low.'''
+    gpio = FakeGPIO()
+    for pin in range(count):
+        gpio.levels[pin] = random.random() > 1.0 / 16
+    return gpio
+
+
+def bench(count, ticks):
+    '''Return the per scan time in microseconds for both approaches.'''
+    gpio = make_gpio(count)
+    bank = machine.InputBank()
+    for pin in range(count):
+        bank.add(str(pin), pin, None)
+    legacy = [LegacyTrigger(gpio, pin) for pin in range(count)]
+
+    def scan_bank():
+        bank.scan(gpio.input, time.monotonic_ns())
+
+    def scan_legacy():
+        for trigger in legacy:
+            trigger.poll()
+
+    batched = min(timeit.repeat(scan_bank, number=ticks, repeat=3))
+    per_object = min(timeit.repeat(scan_legacy, number=ticks, repeat=3))
+    return 1e6 * batched / ticks, 1e6 * per_object / ticks
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--ticks', type=int, default=2000)
+    args = parser.parse_args()
+    print('{:>5} {:>14} {:>14}'.format('pins', 'batched us', 'per-object us'))
+    for count in PIN_COUNTS:
+        batched, per_object = bench(count, args.ticks)
+        print('{:>5} {:>14.2f} {:>14.2f}'.format(count, batched, per_object))
+    return 0
+
+
+if __name__ == '__main__':
+    main()
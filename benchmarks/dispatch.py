@@ -0,0 +1,95 @@
+'''
+Events dispatched per second by Cortex.handle_event.
+
+The handlers are replaced with no-ops so only the dispatch itself is
+measured, for the dispatch table and for the if-chain it replaced.
+
+    python -m benchmarks.dispatch [--events N]
+'''
+import argparse
+import logging
+import random
+import timeit
+
+import mock
+import pygame
+
+import cortex
+
+
+def legacy_handle_event(ctex, event):
+    '''The if-chain dispatch the table replaced.'''
+    if event.type == pygame.QUIT:
+        return False
+    if event.type == pygame.KEYDOWN:
+        return ctex.key_down(event)
+    if event.type in (pygame.KEYUP, ctex.INPUT_EVENT):
+        return True
+    if event.type == ctex.START_EVENT:
+        pass
+    if event.type == ctex.POLL_EVENT:
+        ctex.poll_targets()
+    if ctex.mode == cortex.OperationMode.ATTRACT:
+        if event.type == ctex.START_EVENT:
+            ctex.play()
+            return True
+    if ctex.mode == cortex.OperationMode.POST_PLAY:
+        if event.type == ctex.START_EVENT:
+            ctex.play()
+            return True
+        if event.type == ctex.POST_PLAY_TIMEOUT:
+            ctex.attract()
+            return True
+    if ctex.mode == cortex.OperationMode.PLAY:
+        if event.type == ctex.END_EVENT:
+            ctex.post_play()
+            return True
+        if event.type == ctex.TARGET_EVENT:
+            ctex.hit_target(event)
+            return True
+    return True
+
+
+def make_events(ctex, count):
+    '''A mix of poll ticks and target hits, as seen during a game.'''
+    rng = random.Random(0)
+    events = []
+    for _ in range(count):
+        if rng.random() < 0.8:
+            events.append(pygame.event.Event(ctex.POLL_EVENT))
+        else:
+            target = rng.randint(0, 7)
+            events.append(pygame.event.Event(
+                ctex.TARGET_EVENT, sub=(target, ctex.game.targets[target])))
+    return events
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--events', type=int, default=100000)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    with mock.patch('display.Display'):
+        ctex = cortex.Cortex({})
+    ctex.mode = cortex.OperationMode.PLAY
+    for name in ('poll_targets', 'hit_target', 'play', 'post_play',
+                 'attract'):
+        setattr(ctex, name, lambda *args: None)
+    events = make_events(ctex, args.events)
+
+    def table():
+        for event in events:
+            ctex.handle_event(event)
+
+    def chain():
+        for event in events:
+            legacy_handle_event(ctex, event)
+
+    for name, run in (('table', table), ('if-chain', chain)):
+        seconds = min(timeit.repeat(run, number=1, repeat=3))
+        print('{:>9}: {:10.0f} events/s'.format(name, args.events / seconds))
+    return 0
+
+
+if __name__ == '__main__':
+    main()
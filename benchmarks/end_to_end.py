@@ -0,0 +1,162 @@
+'''
+End-to-end hit-to-photon latency of the real Cortex.
+
+A scripted fake GPIO drops balls into each target in turn while the real
+Cortex, Game and Display run against the offscreen SDL video driver. The
+latency of each ball is measured from its pin edge to the end of the
+first frame pushed after the hit was scored. Loop CPU time and peak
+memory are reported alongside, as JSON for comparing releases.
+
+    python -m benchmarks.end_to_end [--balls N] [--interval S]
+        [--input-mode poll|edge] [--output results.json]
+'''
+import os
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'offscreen')
+# Keep stdout clean for the JSON results
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import argparse
+import bisect
+import json
+import logging
+import platform
+import resource
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.common import make_config, percentile
+
+import pygame
+
+import cortex
+from cortex import aio
+import machine
+from tests.fake_gpio import ball_drops
+
+
+def run(config, balls, interval, runtime=None):
+    '''Run the script through the real event loop, returns the results.
+
+    runtime is 'asyncio' to run the Cortex with cortex.aio instead.
+    '''
+    ctex = cortex.Cortex(config)
+    gpio = ctex.machine.gpio
+    gpio.levels.clear()
+    del gpio.history[:]
+    # Keep the game running for the length of the benchmark
+    ctex.game.check_game_over = lambda: False
+    ctex.play()
+
+    pins = dict((trigger.pin, trigger.event.sub[0])
+                for trigger in ctex.targets if trigger.event.sub[0] != 0)
+    scored = []
+    latencies = []
+
+    hit_target = ctex.hit_target
+
+    def timed_hit_target(event):
+        scored.append(event.sub[0])
+        hit_target(event)
+    ctex.hit_target = timed_hit_target
+
+    render_frame = ctex.render.render
+
+    def timed_render_frame():
+        animating = render_frame()
+        pushed = time.monotonic_ns()
+        for target in scored:
+            latencies.append((target, pushed))
+        del scored[:]
+        return animating
+    ctex.render.render = timed_render_frame
+
+    script = ball_drops(sorted(pins), balls, interval)
+    thread = gpio.play(script)
+
+    def finish():
+        thread.join()
+        time.sleep(0.5)
+        pygame.event.post(pygame.event.Event(pygame.QUIT))
+    threading.Thread(target=finish).start()
+
+    wall = time.monotonic()
+    cpu = time.process_time()
+    if runtime == 'asyncio':
+        aio.AsyncRuntime(ctex).run()
+    else:
+        ctex.event_loop()
+    cpu = time.process_time() - cpu
+    wall = time.monotonic() - wall
+
+    # Match each frame push with the latest edge on the hit target's pin
+    edges = {}
+    for at, pin, level in gpio.history:
+        if not level:
+            edges.setdefault(pins[pin], []).append(at)
+    results = []
+    for target, pushed in latencies:
+        times = edges[target]
+        position = bisect.bisect_right(times, pushed)
+        if position:
+            results.append((pushed - times[position - 1]) / 1e6)
+    results.sort()
+    return {
+        'balls': balls,
+        'scored': len(results),
+        'missed': balls - len(results),
+        'latency_ms': {
+            'p50': percentile(results, 0.50),
+            'p95': percentile(results, 0.95),
+            'p99': percentile(results, 0.99),
+            'max': results[-1] if results else None,
+        },
+        'render': ctex.render.stats(),
+        'cpu_seconds': cpu,
+        'wall_seconds': wall,
+        'cpu_percent': 100.0 * cpu / wall,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--balls', type=int, default=100)
+    parser.add_argument('--interval', type=float, default=0.1,
+                        help='seconds between balls')
+    parser.add_argument('--input-mode', default=None,
+                        help='poll or edge, both by default')
+    parser.add_argument('--output', default=None,
+                        help='write the JSON results here, not stdout')
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    modes = ([args.input_mode] if args.input_mode else
+             [machine.POLL_MODE, machine.EDGE_MODE])
+    results = {
+        'python': platform.python_version(),
+        'pygame': pygame.version.ver,
+        'video_driver': os.environ['SDL_VIDEODRIVER'],
+        'modes': {},
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        for input_mode in modes:
+            config = make_config(tmp, input_mode=input_mode)
+            results['modes'][input_mode] = run(config, args.balls,
+                                               args.interval)
+    # Linux reports the peak resident set size in kilobytes
+    results['max_rss_kb'] = resource.getrusage(
+        resource.RUSAGE_SELF).ru_maxrss
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+    else:
+        json.dump(results, sys.stdout, indent=2, sort_keys=True)
+        sys.stdout.write('\n')
+    return 0
+
+
+if __name__ == '__main__':
+    main()
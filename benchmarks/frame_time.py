@@ -0,0 +1,78 @@
+'''
+Compare Display.show_score frame times against the full screen flip path.
+
+The legacy path is the previous show_score: clear to a new full screen
+surface, re-blit the background pattern and flip the whole display after
+every one of the outline passes.
+
+    python -m benchmarks.frame_time [--frames N]
+'''
+import argparse
+import logging
+import tempfile
+import timeit
+
+from benchmarks.common import make_config
+
+import pygame
+
+import display
+
+RESOLUTIONS = ((1440, 900), (1920, 1080))
+
+
+def legacy_show_score(disp, score):
+    '''The show_score path before the compositor.'''
+    background = pygame.Surface(disp.screen.get_size())
+    background.fill((0, 0, 0))
+    disp.blit(background, (0, 0), False)
+    disp.blit(disp.background_pattern, (0, 0), False)
+
+    def render_font(font, x, y, color, content):
+        offsets = [(-2, -2), (-2, 2), (2, -2), (2, 2)]
+        for xoffset, yoffset in offsets:
+            text = font.render(content, 1, (0, 0, 0))
+            textpos = text.get_rect()
+            textpos.centerx = x + xoffset
+            textpos.centery = y + yoffset
+            disp.blit(text, textpos)
+        text = font.render(content, 1, color)
+        textpos = text.get_rect()
+        textpos.centerx = x
+        textpos.centery = y
+        disp.blit(text, textpos)
+
+    rect = background.get_rect()
+    render_font(disp.score_font, rect.centerx, rect.centery,
+                disp.SCORE_COLOR, str(score))
+
+
+def bench(size, frames):
+    '''Returns the mean frame time in ms for the legacy and new paths.'''
+    with tempfile.TemporaryDirectory() as tmp:
+        disp = display.Display(make_config(tmp, size), False)
+    scores = iter(range(0, 10 ** 9, 50))
+    legacy = min(timeit.repeat(lambda: legacy_show_score(disp, next(scores)),
+                               number=frames, repeat=3))
+    current = min(timeit.repeat(
+        lambda: disp.show_score(next(scores), 1, 50, []),
+        number=frames, repeat=3))
+    return 1000.0 * legacy / frames, 1000.0 * current / frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--frames', type=int, default=50)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    print('{:>10} {:>12} {:>12}'.format('resolution', 'legacy ms',
+                                        'compositor ms'))
+    for size in RESOLUTIONS:
+        legacy, current = bench(size, args.frames)
+        print('{:>10} {:>12.3f} {:>12.3f}'.format(
+            '{}x{}'.format(*size), legacy, current))
+    return 0
+
+
+if __name__ == '__main__':
+    main()
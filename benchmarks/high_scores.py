@@ -0,0 +1,94 @@
+'''
+High score store with years of games.
+
+A database of a million games is opened, then rank and top score queries,
+the cost of add() to the event loop and the background write rate are
+measured. Finally a writer process is killed mid write and the database
+is checked on reopening.
+
+    python -m benchmarks.high_scores [--games N]
+'''
+import argparse
+import logging
+import os
+import random
+import signal
+import sqlite3
+import tempfile
+import time
+import timeit
+
+import scores
+
+
+def populate(path, games, rng):
+    '''Write games directly, as years of play would have.'''
+    store = scores.ScoreStore(path)
+    store.close()
+    connection = sqlite3.connect(path)
+    with connection:
+        connection.executemany(scores.INSERT, (
+            (float(number), rng.randrange(0, 2701, 50))
+            for number in range(games)))
+    connection.close()
+
+
+def per_call_us(statement, number):
+    seconds = min(timeit.repeat(statement, number=number, repeat=3))
+    return seconds / number * 1e6
+
+
+def power_cut(path):
+    '''Kill a process mid write, returns the integrity check result.'''
+    pid = os.fork()
+    if pid == 0:
+        store = scores.ScoreStore(path)
+        while True:
+            store.add(1234)
+    time.sleep(0.5)
+    os.kill(pid, signal.SIGKILL)
+    os.waitpid(pid, 0)
+    connection = sqlite3.connect(path)
+    result = connection.execute('PRAGMA integrity_check').fetchone()[0]
+    connection.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--games', type=int, default=1000000)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    rng = random.Random(0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'scores.db')
+        populate(path, args.games, rng)
+
+        start = time.monotonic()
+        store = scores.ScoreStore(path)
+        print('Open {} games: {:.3f} s'.format(
+            len(store.index), time.monotonic() - start))
+        print('rank():   {:8.2f} us'.format(per_call_us(
+            lambda: store.rank(rng.randrange(2701)), 10000)))
+        print('top(10):  {:8.2f} us'.format(per_call_us(
+            lambda: store.top(10), 10000)))
+
+        count = 100000
+        start = time.monotonic()
+        for _ in range(count):
+            store.add(rng.randrange(0, 2701, 50))
+        queued = time.monotonic() - start
+        store.flush()
+        written = time.monotonic() - start
+        print('add():    {:8.2f} us on the event loop'.format(
+            queued / count * 1e6))
+        print('Writer:   {:8.0f} games/s'.format(count / written))
+        store.close()
+
+        print('Integrity after a kill mid write: {}'.format(power_cut(path)))
+    return 0
+
+
+if __name__ == '__main__':
+    main()
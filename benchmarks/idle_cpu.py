@@ -0,0 +1,97 @@
+'''
+Measure the event loop's CPU utilisation in each operating mode.
+
+The real Cortex runs headless against the fake GPIO for a few seconds per
+mode, with balls dropping every half second in PLAY. The busy loop the
+event loop used to be, pygame.event.get() in a bare while loop, is
+measured for reference.
+
+    python -m benchmarks.idle_cpu [--seconds S] [--input-mode poll|edge]
+'''
+import argparse
+import logging
+import tempfile
+import threading
+import time
+
+from benchmarks.common import make_config
+
+import pygame
+
+import cortex
+import machine
+
+
+def quit_after(seconds):
+    '''Post a QUIT event after seconds.'''
+    timer = threading.Timer(
+        seconds, pygame.event.post, [pygame.event.Event(pygame.QUIT)])
+    timer.start()
+    return timer
+
+
+def drop_balls(ctex, stop):
+    '''Drop a ball into a target every half second until stopped.'''
+    gpio = ctex.machine.gpio
+    target = 1
+    while not stop.wait(0.5):
+        pin = ctex.targets[target].pin
+        gpio.set_input(pin, False)
+        time.sleep(0.015)
+        gpio.set_input(pin, True)
+        target = target % 7 + 1
+
+
+def measure(run):
+    '''Returns the CPU utilisation of run() as a percentage of one core.'''
+    wall = time.monotonic()
+    cpu = time.process_time()
+    run()
+    return 100.0 * (time.process_time() - cpu) / (time.monotonic() - wall)
+
+
+def bench_mode(config, mode, seconds):
+    '''CPU utilisation of the event loop in a mode.'''
+    ctex = cortex.Cortex(config)
+    ctex.game.check_game_over = lambda: False
+    stop = threading.Event()
+    if mode == cortex.OperationMode.PLAY:
+        ctex.play()
+        threading.Thread(target=drop_balls, args=(ctex, stop)).start()
+    else:
+        ctex.set_mode(mode)
+    quit_after(seconds)
+    try:
+        return measure(ctex.event_loop)
+    finally:
+        stop.set()
+
+
+def bench_busy_loop(seconds):
+    '''CPU utilisation of a loop that never waits.'''
+    def run():
+        end = time.monotonic() + seconds
+        while time.monotonic() < end:
+            pygame.event.get()
+    return measure(run)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--seconds', type=float, default=5.0)
+    parser.add_argument('--input-mode', default=machine.POLL_MODE)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    with tempfile.TemporaryDirectory() as tmp:
+        config = make_config(tmp, input_mode=args.input_mode)
+        for mode in (cortex.OperationMode.ATTRACT, cortex.OperationMode.PLAY,
+                     cortex.OperationMode.POST_PLAY):
+            print('{:>10}: {:5.1f}% CPU'.format(
+                mode, bench_mode(config, mode, args.seconds)))
+    print('{:>10}: {:5.1f}% CPU'.format('busy loop',
+                                        bench_busy_loop(args.seconds)))
+    return 0
+
+
+if __name__ == '__main__':
+    main()
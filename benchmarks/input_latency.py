@@ -0,0 +1,101 @@
+'''
+Compare edge-to-hit_target latency for the poll and edge input modes.
+
+A feeder thread drives a target pin on the fake GPIO low for a short pulse,
+the same way a ball rolling through a target would, and the time from the
+falling edge until Cortex.hit_target runs is measured. Pulses that the
+poll mode never sees are reported as missed.
+
+    python -m benchmarks.input_latency [--hits N] [--pulse MS]
+'''
+import argparse
+import logging
+import os
+import random
+import threading
+import time
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy')
+
+import mock
+import pygame
+
+import cortex
+import machine
+
+
+def run_mode(input_mode, hits, pulse):
+    '''Run the real event loop in the given input mode.'''
+    with mock.patch('display.Display'):
+        ctex = cortex.Cortex({'input_mode': input_mode})
+    gpio = ctex.machine.gpio
+    gpio.levels.clear()
+    trigger = ctex.targets[1]
+    # Keep the game running for the length of the benchmark
+    ctex.game.check_game_over = lambda: False
+    ctex.play()
+
+    hit = threading.Event()
+    hit_times = []
+    hit_target = ctex.hit_target
+
+    def timed_hit_target(event):
+        hit_times.append(time.monotonic())
+        hit_target(event)
+        hit.set()
+    ctex.hit_target = timed_hit_target
+
+    latencies = []
+    missed = [0]
+
+    def feeder():
+        for _ in range(hits):
+            # Land out of phase with the poll timer
+            time.sleep(random.uniform(0.02, 0.08))
+            hit.clear()
+            edge_time = time.monotonic()
+            gpio.set_input(trigger.pin, False)
+            time.sleep(pulse)
+            gpio.set_input(trigger.pin, True)
+            if hit.wait(0.25):
+                latencies.append(hit_times[-1] - edge_time)
+            else:
+                missed[0] += 1
+        pygame.event.post(pygame.event.Event(pygame.QUIT))
+
+    thread = threading.Thread(target=feeder)
+    thread.start()
+    ctex.event_loop()
+    thread.join()
+    return latencies, missed[0]
+
+
+def report(input_mode, latencies, missed):
+    '''Print a one line summary for a mode.'''
+    if not latencies:
+        print('{:>5}: no hits seen, {} missed'.format(input_mode, missed))
+        return
+    latencies = sorted(latencies)
+    ms = [1000.0 * value for value in latencies]
+    print('{:>5}: mean {:7.3f} ms  p50 {:7.3f} ms  max {:7.3f} ms  '
+          'missed {}/{}'.format(
+              input_mode, sum(ms) / len(ms), ms[len(ms) // 2], ms[-1],
+              missed, missed + len(ms)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--hits', type=int, default=50)
+    parser.add_argument('--pulse', type=float, default=10.0,
+                        help='pin low time in milliseconds')
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    for input_mode in (machine.POLL_MODE, machine.EDGE_MODE):
+        latencies, missed = run_mode(input_mode, args.hits,
+                                     args.pulse / 1000.0)
+        report(input_mode, latencies, missed)
+    return 0
+
+
+if __name__ == '__main__':
+    main()
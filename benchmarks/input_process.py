@@ -0,0 +1,118 @@
+'''
+Input timing under render load, scanning in the event loop or a process.
+
+Balls are dropped on the fake GPIO while the event loop spends render-ms
+of busy Python, holding the interpreter as a full screen flip would,
+between polls of the machine. Reported for each input mode, in
+milliseconds from the true edge:
+
+    seen       the time the hit is stamped with, from the edge time
+    delivered  when the event loop has the hit
+
+In poll mode a hit is only seen when the loop gets round to polling, and a
+ball shorter than a frame can be missed altogether. In process mode the
+input process sees it within a scan period, and the loop delivers it with
+its true time on its next poll.
+
+    python -m benchmarks.input_process [--balls N] [--render-ms MS]
+'''
+import argparse
+import bisect
+import functools
+import logging
+import multiprocessing
+import time
+
+from benchmarks.common import percentile
+
+import mock
+
+import machine
+from machine import scanner
+from tests.fake_gpio import FakeGPIO, ball_drops
+
+TARGETS = range(1, 8)
+
+
+def process_input(script, results, ring_name, inputs, settings, stop):
+    '''The input process, driving its own fake GPIO from the script.'''
+    gpio = FakeGPIO()
+    gpio.play(script)
+    scanner.run_input(ring_name, inputs, settings, stop, gpio=gpio)
+    results.put(gpio.history)
+
+
+def busy(milliseconds):
+    end = time.monotonic() + milliseconds / 1000.0
+    while time.monotonic() < end:
+        pass
+
+
+def run(input_mode, args):
+    gpio = FakeGPIO()
+    m = machine.Machine('start', gpio=gpio, input_mode=input_mode)
+    pins = dict((m.create_trigger(str(target), target, 2,
+                                  (target, 0)).pin, target)
+                for target in TARGETS)
+    # The first ball waits for the input process to start
+    script = ball_drops(sorted(pins), args.balls, args.interval, start=2)
+    if input_mode == machine.PROCESS_MODE:
+        results = multiprocessing.get_context('spawn').Queue()
+        m.input_target = functools.partial(process_input, script, results)
+        m.start()
+    else:
+        gpio.play(script)
+    hits = []
+    end = time.monotonic() + max(at for at, _, _ in script) + 2
+
+    def post(event):
+        hits.append((event.sub[0], getattr(event, 'edge_time', None),
+                     time.monotonic_ns()))
+    with mock.patch('machine.pygame.event.post', post):
+        while time.monotonic() < end:
+            busy(args.render_ms)
+            m.poll()
+    stats = m.ring_report()
+    if input_mode == machine.PROCESS_MODE:
+        m.input_stop.set()
+        history = results.get()
+    else:
+        history = gpio.history
+    m.close()
+
+    edges = {}
+    for at, pin, level in history:
+        if not level:
+            edges.setdefault(pins[pin], []).append(at)
+    seen = []
+    delivered = []
+    for target, edge_time, at in hits:
+        # The hit is of the latest edge on its pin before it was seen
+        seen_time = edge_time or at
+        times = edges[target]
+        edge = times[bisect.bisect_right(times, seen_time) - 1]
+        seen.append((seen_time - edge) / 1e6)
+        delivered.append((at - edge) / 1e6)
+    return sorted(seen), sorted(delivered), args.balls - len(hits), stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--balls', type=int, default=100)
+    parser.add_argument('--interval', type=float, default=0.05,
+                        help='seconds between balls')
+    parser.add_argument('--render-ms', type=float, default=30)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    for input_mode in (machine.POLL_MODE, machine.PROCESS_MODE):
+        seen, delivered, missed, stats = run(input_mode, args)
+        print('{:7}: seen p50 {:5.1f} p99 {:5.1f} ms, delivered p50 {:5.1f} '
+              'p99 {:5.1f} ms, {} missed {}'.format(
+                  input_mode, percentile(seen, 0.5), percentile(seen, 0.99),
+                  percentile(delivered, 0.5), percentile(delivered, 0.99),
+                  missed, stats))
+    return 0
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+'''
+Per lane hit-to-photon latency as lanes are added to one host.
+
+Every lane runs the end to end benchmark in its own worker process, the
+way the lanes module runs real lanes, each with its own fake GPIO, pins,
+game and offscreen window. With --slow-ms the first lane takes that much
+longer over every frame, the other lanes should not notice.
+
+    python -m benchmarks.lanes [--lanes 1,2,4,8] [--balls N]
+        [--interval S] [--slow-ms MS]
+'''
+import os
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'offscreen')
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import argparse
+import functools
+import logging
+import tempfile
+import time
+
+from benchmarks.common import make_config
+
+import lanes
+
+
+def measure_lane(results, balls, interval, slow_ms, config):
+    '''Run one lane of the benchmark, in its worker process.'''
+    logging.disable(logging.WARNING)
+    from benchmarks import end_to_end
+    import display
+    if slow_ms and config['lane'] == 0:
+        render_frame = display.Display.render_frame
+
+        def slow_render_frame(self, *args, **kwargs):
+            time.sleep(slow_ms / 1000.0)
+            return render_frame(self, *args, **kwargs)
+        display.Display.render_frame = slow_render_frame
+    result = end_to_end.run(config, balls, interval)
+    results.put((config['lane'], result))
+
+
+def run(count, directory, args):
+    config = make_config(directory, window_size=(320, 200),
+                         input_mode='edge')
+    config['lanes'] = [{'pins': {'base': 20 + 10 * number,
+                                 'start': 19 + 10 * number,
+                                 'servo': 12 + 10 * number}}
+                       for number in range(count)]
+    controller = lanes.LaneController(config)
+    results = controller.context.Queue()
+    controller.target = functools.partial(
+        measure_lane, results, args.balls, args.interval, args.slow_ms)
+    controller.run()
+    return dict(results.get() for _ in range(count))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--lanes', default='1,2,4,8')
+    parser.add_argument('--balls', type=int, default=50)
+    parser.add_argument('--interval', type=float, default=0.1,
+                        help='seconds between balls')
+    parser.add_argument('--slow-ms', type=float, default=0,
+                        help='extra time the first lane takes per frame')
+    args = parser.parse_args()
+    print('{} CPUs'.format(len(lanes.get_cpus() or []) or 'unknown'))
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in [int(count) for count in args.lanes.split(',')]:
+            results = run(count, tmp, args)
+            # The slow lane is left out, it is the others that matter
+            others = [results[lane] for lane in sorted(results)
+                      if not (args.slow_ms and lane == 0 and count > 1)]
+            print('{} lanes: p50 {:6.1f} ms, worst lane p99 {:6.1f} ms, '
+                  '{} missed, cpu {:5.1f}% per lane'.format(
+                      count,
+                      max(result['latency_ms']['p50'] for result in others),
+                      max(result['latency_ms']['p99'] for result in others),
+                      sum(result['missed'] for result in others),
+                      sum(result['cpu_percent'] for result in others) /
+                      len(others)))
+    return 0
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+'''
+Overhead of recording metrics on the hot paths.
+
+Times a histogram observation on its own, then Cortex.hit_target with the
+display mocked out, with and without metrics, and the cost of rendering
+the whole registry as a scrape would.
+
+    python -m benchmarks.metrics [--hits N]
+'''
+import argparse
+import logging
+import timeit
+
+import mock
+
+import cortex
+import metrics
+
+
+def bench_hit_target(config, hits):
+    '''Microseconds per Cortex.hit_target.'''
+    with mock.patch('display.Display'):
+        ctex = cortex.Cortex(config)
+    ctex.game.check_game_over = lambda: False
+    ctex.watch_stall = lambda: None
+    ctex.play()
+    events = [mock.Mock(sub=(hit % 8, 0)) for hit in range(hits)]
+
+    def run():
+        for event in events:
+            ctex.hit_target(event)
+    return min(timeit.repeat(run, number=1, repeat=5)) / hits * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--hits', type=int, default=20000)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    histogram = metrics.Histogram('bench_seconds', 'Bench.')
+    values = [(value * 7919) % 200000000 for value in range(args.hits)]
+    seconds = min(timeit.repeat(
+        lambda: [histogram.observe(value) for value in values],
+        number=1, repeat=3))
+    print('observe:         {:6.3f} us'.format(seconds / args.hits * 1e6))
+
+    plain = bench_hit_target({}, args.hits)
+    timed = bench_hit_target({'metrics': {}}, args.hits)
+    print('hit_target:      {:6.2f} us plain, {:6.2f} us with metrics '
+          '({:+.2f} us)'.format(plain, timed, timed - plain))
+
+    with mock.patch('display.Display'):
+        ctex = cortex.Cortex({'metrics': {}})
+    registry = ctex.metrics.registry
+    seconds = min(timeit.repeat(registry.render, number=100, repeat=3))
+    print('scrape render:   {:6.1f} us'.format(seconds / 100 * 1e6))
+    return 0
+
+
+if __name__ == '__main__':
+    main()
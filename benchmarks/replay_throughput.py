@@ -0,0 +1,38 @@
+'''
+Measure how fast a recorded night of play replays headlessly.
+
+A synthetic event log is written first, then replayed against the real
+Game and Cortex with the display stubbed out.
+
+    python -m benchmarks.replay_throughput [--games N]
+'''
+import argparse
+import logging
+import os
+import tempfile
+
+from benchmarks.common import write_trace
+
+import recorder
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--games', type=int, default=200)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'night.rec')
+        count = write_trace(path, args.games)
+        size = os.path.getsize(path)
+        summary = recorder.replay(path)
+    print('{} games, {} records, {} bytes'.format(args.games, count, size))
+    print('Replayed {} events in {:.3f} s: {:.0f} events/s'.format(
+        summary['events'], summary['seconds'],
+        summary['events_per_second']))
+    print('Mode mismatches: {}'.format(summary['mode_mismatches']))
+    return 0
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+'''
+Loop latency and CPU of the pygame event loop against the asyncio runtime.
+
+For each runtime and input mode, balls are dropped through the real Cortex
+as in benchmarks.end_to_end, reporting the hit-to-photon latency and the
+CPU used while playing. The CPU of each runtime left idle in ATTRACT is
+reported alongside.
+
+    python -m benchmarks.runtime [--balls N] [--interval S] [--seconds S]
+'''
+import os
+
+os.environ.setdefault('SDL_VIDEODRIVER', 'offscreen')
+
+import argparse
+import logging
+import tempfile
+
+from benchmarks import end_to_end
+from benchmarks.common import make_config
+from benchmarks.idle_cpu import measure, quit_after
+
+import cortex
+import machine
+from cortex import aio
+
+RUNTIMES = ('pygame', 'asyncio')
+
+
+def bench_idle(config, runtime, seconds):
+    '''CPU utilisation of a runtime in ATTRACT.'''
+    ctex = cortex.Cortex(config)
+    quit_after(seconds)
+    if runtime == 'asyncio':
+        return measure(aio.AsyncRuntime(ctex).run)
+    return measure(ctex.event_loop)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--balls', type=int, default=100)
+    parser.add_argument('--interval', type=float, default=0.1,
+                        help='seconds between balls')
+    parser.add_argument('--seconds', type=float, default=5.0,
+                        help='seconds idle in ATTRACT')
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    with tempfile.TemporaryDirectory() as tmp:
+        for input_mode in (machine.POLL_MODE, machine.EDGE_MODE):
+            config = make_config(tmp, input_mode=input_mode)
+            for runtime in RUNTIMES:
+                results = end_to_end.run(config, args.balls, args.interval,
+                                         runtime)
+                latency = results['latency_ms']
+                print('{:7} {:5}: latency p50 {:5.1f} p99 {:5.1f} ms, '
+                      '{} missed, {:5.1f}% CPU playing, {:5.1f}% idle'.format(
+                          runtime, input_mode, latency['p50'],
+                          latency['p99'], results['missed'],
+                          results['cpu_percent'],
+                          bench_idle(config, runtime, args.seconds)))
+    return 0
+
+
+if __name__ == '__main__':
+    main()
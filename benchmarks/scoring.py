@@ -0,0 +1,57 @@
+'''
+Cost of Game.drop_ball as scoring rules are added.
+
+The rules are compiled when the game is created, so the time per ball
+should not grow with the number of multipliers and streaks.
+
+    python -m benchmarks.scoring [--balls N]
+'''
+import argparse
+import logging
+import random
+import timeit
+
+import game
+
+
+def make_config(multipliers, streaks):
+    definition = dict(game.Game.GAMES['midway'])
+    definition['rules'] = (
+        [{'name': 'Multiplier {}'.format(number), 'multiplier': 2,
+          'balls': [number % 9 + 1]} for number in range(multipliers)] +
+        [{'name': 'Streak {}'.format(number), 'streak': 2 + number % 3,
+          'targets': [number % 7 + 1, (number + 3) % 7 + 1], 'bonus': 100}
+         for number in range(streaks)])
+    return {'game': 'bench', 'games': {'bench': definition}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--balls', type=int, default=100000)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    rng = random.Random(0)
+    targets = [rng.randint(0, 7) for _ in range(args.balls)]
+
+    for multipliers, streaks in ((0, 0), (2, 1), (8, 4), (16, 6)):
+        state = game.Game(make_config(multipliers, streaks))
+        drop_ball = state.drop_ball
+
+        def run():
+            state.start_game()
+            for target in targets:
+                drop_ball(target)
+                if target:
+                    drop_ball(0)
+
+        seconds = min(timeit.repeat(run, number=1, repeat=3))
+        print('{:2d} multipliers, {} streaks ({:3d} states): {:6.2f} us '
+              'per drop'.format(
+                  multipliers, streaks,
+                  len(state.rules.transitions) // state.rules.symbols,
+                  seconds / (args.balls + sum(map(bool, targets))) * 1e6))
+    return 0
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+'''
+Timing of the servo PWM steps, with the event loop idle and busy.
+
+Moves between the release and hold angles run on the fake GPIO, whose PWM
+records when every duty cycle change is made. Reported for each step is
+how far the time since the previous step strays from the PWM period, and
+how late the step was against its deadline, in milliseconds. The busy run
+keeps the main thread computing, as the event loop does while drawing.
+There each step waits up to the interpreter's switch interval for the
+main thread to let go, but every step waits about as long, so the steps
+stay a period apart.
+
+    python -m benchmarks.servo_jitter [--moves N]
+'''
+import argparse
+import threading
+
+from benchmarks.common import percentile
+
+import machine
+from tests import fake_gpio
+
+
+def busy(stop):
+    while not stop.is_set():
+        sum(range(1000))
+
+
+def run(moves, load):
+    gpio = fake_gpio.FakeGPIO()
+    m = machine.Machine('start', gpio=gpio,
+                        servo={'move_ms': 200, 'hold_ms': 40})
+    pwm = gpio.pwms[m.SERVO_PIN]
+    period = m.servo.period
+    stop = threading.Event()
+    if load:
+        threading.Thread(target=busy, args=(stop,), daemon=True).start()
+    jitter = []
+    for move in range(moves):
+        start = len(pwm.timeline)
+        if move % 2:
+            m.hold_balls()
+        else:
+            m.release_balls()
+        m.servo.wait()
+        # The steps of the ramp, leaving out the switch off after the hold
+        times = [at for at, duty in pwm.timeline[start:] if duty]
+        jitter.extend(abs(later - earlier - period) / 1e6
+                      for earlier, later in zip(times, times[1:]))
+    stop.set()
+    stats = m.servo.stats()
+    m.close()
+    return sorted(jitter), stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--moves', type=int, default=20)
+    args = parser.parse_args()
+    for name, load in (('idle', False), ('busy', True)):
+        jitter, stats = run(args.moves, load)
+        print('{}: {} steps, period error p50 {:.3f} ms p99 {:.3f} ms '
+              'max {:.3f} ms, late mean {:.3f} ms max {:.3f} ms'.format(
+                  name, stats['steps'], percentile(jitter, 0.5),
+                  percentile(jitter, 0.99), jitter[-1],
+                  stats['late_mean_ms'], stats['late_max_ms']))
+    return 0
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+'''
+Cold start timeline of skeeball.py, with and without the asset bundle.
+
+Each start runs in a fresh interpreter in a scratch directory holding a
+config.yaml, so the times include the interpreter and its imports. The
+event loop returns as soon as it is entered. Reported in milliseconds
+since the process started:
+
+    config       the configuration is loaded
+    first_frame  the background is on the screen
+    input_ready  the event loop is about to take input
+
+    python -m benchmarks.startup [--runs N]
+'''
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+import yaml
+
+from benchmarks.common import make_config, percentile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = '''
+import json
+import cortex
+import logs
+import skeeball
+cortex.Cortex.run_loop = lambda self: None
+skeeball.main()
+print(json.dumps(logs.startup.report()))
+'''
+
+
+def start(directory):
+    '''Start skeeball once, returns its timeline.'''
+    env = dict(os.environ, PYTHONPATH=ROOT, SDL_VIDEODRIVER='dummy',
+               PYGAME_HIDE_SUPPORT_PROMPT='1')
+    output = subprocess.check_output(
+        [sys.executable, '-c', CHILD], cwd=directory, env=env,
+        stderr=subprocess.DEVNULL)
+    return json.loads(output.decode().strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        config = make_config(tmp, logging={'path': 'skeeball.log'})
+        config_path = os.path.join(tmp, 'config.yaml')
+        with open(config_path, 'w') as config_file:
+            yaml.safe_dump(config, config_file)
+        for name in ('config.yaml', 'bundle'):
+            if name == 'bundle':
+                subprocess.check_call(
+                    [sys.executable, '-m', 'display', '--config',
+                     config_path, os.path.join(tmp, 'assets')],
+                    cwd=ROOT, stdout=subprocess.DEVNULL,
+                    env=dict(os.environ, SDL_VIDEODRIVER='dummy'))
+            runs = [start(tmp) for _ in range(args.runs)]
+            print('{}:'.format(name))
+            for mark in ('config', 'first_frame', 'input_ready'):
+                times = sorted(run[mark] for run in runs)
+                print('  {:12} p50 {:7.1f} ms  max {:7.1f} ms'.format(
+                    mark, percentile(times, 0.5), times[-1]))
+    return 0
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+'''
+Games per hour on one lane, counting balls by edges or by the ball flow.
+
+A synthetic night of play is written with a fraction of the catch-all
+edges missed, then the ball drops of each game are replayed through two
+ways of deciding the game is over:
+
+    edges  the previous rule, the game ends once the balls that passed
+           the catch-all and those that scored add up to the balls of the
+           game; a game that never adds up waits for an attendant
+    flow   game.flow.BallFlow, transit times and gaps between balls are
+           learned and a stalled game ends by itself
+
+Reported is how long each game holds the lane, from the start button to
+the end of the game, and the games per hour with players queueing.
+
+    python -m benchmarks.turnover [--games N] [--missed FRACTION]
+'''
+import argparse
+import logging
+import os
+import tempfile
+
+from benchmarks.common import percentile, write_trace
+
+import cortex
+import game
+import recorder
+
+BALLS = 9
+POST_PLAY_S = cortex.Cortex.POST_PLAY_MS / 1000.0
+
+
+def read_games(path):
+    '''The (start, [(time, target), ...]) of every game in a trace.'''
+    games = []
+    for record in recorder.read(path):
+        if record.kind != recorder.EVENT:
+            continue
+        now = record.time / 1e9
+        if record.code == cortex.Cortex.START_EVENT:
+            games.append((now, []))
+        elif record.code == cortex.Cortex.TARGET_EVENT and games:
+            games[-1][1].append((now, record.a))
+    return games
+
+
+def edges_end(start, drops, attendant_s):
+    '''When the previous rule ends a game.'''
+    remaining = BALLS
+    pending = 0
+    for now, target in drops:
+        if target == 0:
+            remaining -= 1
+            pending = max(0, pending - 1)
+        else:
+            pending += 1
+        if remaining - pending == 0:
+            return now, False
+    return (drops[-1][0] if drops else start) + attendant_s, True
+
+
+def flow_end(state, clock, start, drops):
+    '''When the ball flow ends a game, learning as it goes.'''
+    clock[0] = start
+    state.start_game()
+    for now, target in drops:
+        clock[0] = now
+        state.drop_ball(target)
+        if state.check_game_over():
+            return now, False
+    flow = state.flow
+    return flow.last_activity + flow.stall_timeout(), True
+
+
+def summary(name, lane_times, stalled):
+    lane_times = sorted(lane_times)
+    mean = sum(lane_times) / len(lane_times)
+    print('{:6}: lane held p50 {:6.1f} s, p99 {:6.1f} s, mean {:6.1f} s, '
+          '{:3} stalled, {:5.1f} games/hour'.format(
+              name, percentile(lane_times, 0.5),
+              percentile(lane_times, 0.99), mean, stalled,
+              3600 / (mean + POST_PLAY_S)))
+    return mean
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[1])
+    parser.add_argument('--games', type=int, default=500)
+    parser.add_argument('--missed', type=float, default=0.02,
+                        help='fraction of catch-all edges missed')
+    parser.add_argument('--attendant', type=float, default=120,
+                        help='seconds for an attendant to end a stuck game')
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'night.rec')
+        write_trace(path, args.games, missed=args.missed)
+        games = read_games(path)
+
+    clock = [0.0]
+    state = game.Game(clock=lambda: clock[0])
+    results = {'edges': ([], 0), 'flow': ([], 0)}
+    for start, drops in games:
+        for name, (end, stalled) in (
+                ('edges', edges_end(start, drops, args.attendant)),
+                ('flow', flow_end(state, clock, start, drops))):
+            lane_times, count = results[name]
+            lane_times.append(end - start)
+            results[name] = (lane_times, count + stalled)
+    print('{} games, {:.0%} of catch-all edges missed'.format(
+        len(games), args.missed))
+    edges = summary('edges', *results['edges'])
+    flow = summary('flow', *results['flow'])
+    print('Turnover: {:+.1%} games/hour, learned {}'.format(
+        (edges + POST_PLAY_S) / (flow + POST_PLAY_S) - 1,
+        state.flow.stats()))
+    return 0
+
+
+if __name__ == '__main__':
+    main()
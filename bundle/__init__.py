@@ -0,0 +1,53 @@
+'''
+Reads the manifest and configuration of a prebuilt asset bundle.
+
+The bundle is built, and its fonts and background loaded, by
+display.assets. Reading it needs no pygame, so the configuration is
+loaded from the bundle before the display, and pygame, are imported.
+'''
+import json
+import logging
+import marshal
+import os
+
+DEFAULT_PATH = 'assets'
+DEFAULT_CACHE = 'cache'
+MANIFEST = 'bundle.json'
+CONFIG = 'config.marshal'
+
+logger = logging.getLogger(__name__)
+
+
+def mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except (OSError, TypeError):
+        return None
+
+
+def load_manifest(path):
+    '''The manifest of the bundle at path, None if there is none.'''
+    if not path:
+        return None
+    try:
+        with open(os.path.join(path, MANIFEST)) as manifest_file:
+            return json.load(manifest_file)
+    except (IOError, ValueError):
+        logger.warning('No asset bundle at %s, build it with '
+                       'python -m display', path)
+        return None
+
+
+def get_config(path, manifest, config_path):
+    '''The bundled configuration if config_path has not changed since.'''
+    if (manifest.get('config_mtime') is None or
+            mtime(config_path) != manifest['config_mtime']):
+        return None
+    try:
+        with open(os.path.join(path, manifest['config']),
+                  'rb') as config_file:
+            return marshal.load(config_file)
+    except (IOError, EOFError, ValueError, TypeError):
+        logger.warning('Asset bundle %s has no configuration, rebuild it',
+                       path)
+        return None
@@ -3,8 +3,12 @@ Cortex is the event handler and dispatcher.
 '''
 import logging
 import display
+import logs
 import machine
 import game
+import recorder
+import scores
+import timers
 
 import pygame
 import time
@@ -17,165 +21,440 @@ class OperationMode(object):
     PLAY = 'PLAY'
     POST_PLAY = 'POST_PLAY'
     SHUTDOWN = 'SHUTDOWN'
+    ALL = (ATTRACT, PLAY, POST_PLAY, SHUTDOWN)
 
 class Cortex(object):
     # XXX: This constants need to go somewhere else
-    POST_PLAY_TIMEOUT = None
     TARGET_EVENT = pygame.USEREVENT
     START_EVENT = pygame.USEREVENT + 1
     END_EVENT = pygame.USEREVENT + 2
     POLL_EVENT = pygame.USEREVENT + 3
+    INPUT_EVENT = pygame.USEREVENT + 4
+    POST_PLAY_TIMEOUT = pygame.USEREVENT + 5
+    ATTRACT_EVENT = pygame.USEREVENT + 6
 
     POLL_SPEED = 50
+    HIGH_SCORE_COUNT = 5
+    # How long the final score is shown, and how often the attract screens
+    # change. Override with 'post_play_ms' and 'attract_ms'.
+    POST_PLAY_MS = 15000
+    ATTRACT_MS = 10000
+    # Input poll period and frame rate for each mode, the loop sleeps
+    # between them. Override with 'modes' in the configuration.
+    MODE_RATES = {
+        OperationMode.ATTRACT: {'poll_ms': 100, 'fps': 10},
+        OperationMode.PLAY: {'poll_ms': 10, 'fps': 30},
+        OperationMode.POST_PLAY: {'poll_ms': 50, 'fps': 10},
+    }
 
     def __init__(self, config):
         '''Initialize the Cortex.'''
-        logging.basicConfig(format='%(asctime)s %(message)s')
         self.config = config
         self.logger = logging.getLogger(__name__)
         self.logger.setLevel(logging.INFO)
         self.mode = OperationMode.ATTRACT
-        self.game = game.Game()
+        # Every timed action is scheduled here, the loop sleeps until the
+        # next one is due
+        self.timers = timers.Timers()
+        # Timers that only run in the current mode
+        self.mode_timers = []
+        self.game = game.Game(config)
 
         self.start_event = pygame.event.Event(self.START_EVENT)
 
-        self.machine = machine.Machine(self.start_event)
-        self.display = display.Display(config, False)
+        input_mode = config.get('input_mode', machine.POLL_MODE)
+        # Input events are kept out of the SDL queue, which drops events
+        # silently once it is full
+        self.input_events = machine.events.EventQueue(
+            config.get('input_queue_size', machine.events.DEFAULT_CAPACITY))
+        gpio = machine.GPIO
+        if config.get('headless'):
+            # Claim no pins and drive no servo, e.g. replaying on a cabinet
+            import tests.fake_gpio
+            gpio = tests.fake_gpio.FakeGPIO()
+            input_mode = machine.POLL_MODE
+        self.machine = machine.Machine(
+            self.start_event, gpio=gpio, input_mode=input_mode,
+            debounce=config.get('debounce'),
+            wake_event=pygame.event.Event(self.INPUT_EVENT),
+            timers=self.timers, servo=config.get('servo'),
+            pins=config.get('pins'),
+            input_process=config.get('input_process'),
+            event_queue=self.input_events)
+        if config.get('headless'):
+            self.display = display.HeadlessDisplay(config, False)
+        else:
+            self.display = display.Display(config, False)
+        # Screen updates are merged and drawn at most once per frame
+        self.render = display.RenderScheduler(
+            self.display.render_frame,
+            config.get('fps', display.scheduler.DEFAULT_FPS))
         self.last_target = 0
         self.last_points = 0
+        # The final score of the last game, shown between the high scores
+        self.last_score = None
+        self.attract_page = 0
+        # The pending check for a stalled game
+        self.stall_timer = None
 
-        # Configure the targets and their event handlers
+        # Configure the targets, indexed by target number so that a key's
+        # trigger is a single lookup. GPIO callbacks carry their input index
         self.targets = []
+        self.target_index = {}
         for target in self.game.targets:
             value = self.game.targets[target]
             self.log(logging.INFO, 'target: {} - {}'.format(target, value))
             event = self.TARGET_EVENT
             sub_event = (target, value)
-            self.targets.append(self.machine.create_trigger('target {}'.format(target), target, event, sub_event))
-            # XXX: Create a mapping of pygame.events to target objects
-            # This will allow the event handler to lookup the target based on event
+            trigger = self.machine.create_trigger(
+                'target {}'.format(target), target, event, sub_event)
+            self.targets.append(trigger)
+            self.target_index[target] = trigger
         self.log(logging.INFO, 'Cortex target list:')
         self.log(logging.INFO, self.targets)
 
         self.end_event = pygame.event.Event(self.END_EVENT)
         self.log(logging.INFO, 'end_event: {}'.format(self.end_event))
 
-        pygame.time.set_timer(self.POLL_EVENT, self.POLL_SPEED)
+        # Optionally record everything the event loop handles
+        self.recorder = None
+        if config.get('record'):
+            self.recorder = recorder.Recorder(config['record'],
+                                              OperationMode.ALL)
+            self.machine.recorder = self.recorder
+
+        # Finished games are stored when 'scores' names a database
+        self.scores = scores.ScoreStore(config.get('scores'))
+        # Every ball drop is logged for analytics when 'drops' names a
+        # directory
+        if config.get('drops'):
+            self.game.drops = scores.DropLog(config['drops'])
+
+        self.handlers = self.build_dispatch()
+
+        # Hot path timings and counts, exported when 'metrics' is set.
+        # Imported here, the HTTP server is slow to import and rarely used
+        self.metrics = None
+        self.exporter = None
+        if config.get('metrics') is not None:
+            from cortex import instruments
+            self.metrics = instruments.CortexMetrics(self)
+            self.metrics.install()
+
         pygame.init()
+        self.set_mode(self.mode)
 
     def log(self, level, msg):
         '''Cortex specific event logger.'''
-        self.logger.log(level, '{}: {}'.format(self.mode, msg))
+        self.logger.log(level, '%s: %s', self.mode, msg)
+
+    def get_rates(self, mode):
+        '''Returns the (poll_ms, fps) to run at in a mode.'''
+        rates = dict(self.MODE_RATES.get(mode, {}))
+        rates.update(self.config.get('modes', {}).get(mode, {}))
+        return (rates.get('poll_ms', self.POLL_SPEED),
+                rates.get('fps', self.config.get(
+                    'fps', display.scheduler.DEFAULT_FPS)))
+
+    def set_mode(self, mode):
+        '''Switch operating mode, adjusting the poll and frame rates.
+
+        Any timers of the previous mode are cancelled.
+        '''
+        self.mode = mode
+        if self.recorder is not None:
+            self.recorder.mode(mode)
+        for timer in self.mode_timers:
+            timer.cancel()
+        self.mode_timers = []
+        poll_ms, fps = self.get_rates(mode)
+        # In edge mode the GPIO callbacks report every input as it changes
+        if poll_ms and self.machine.input_mode != machine.EDGE_MODE:
+            self.mode_timers.append(self.timers.call_every(
+                poll_ms * machine.NS_PER_MS, self.input_events.put,
+                pygame.event.Event(self.POLL_EVENT), machine.events.TICK))
+        self.render.set_fps(fps)
+        self.log(logging.INFO, 'Polling every {} ms at {} fps'.format(
+            poll_ms, fps))
 
     def get_current_time(self):
         return int(round(time.time() * 1000))
 
     def poll_targets(self):
         '''Poll for target events'''
-        self.log(logging.INFO, 'poll triggered')
-        for target in self.targets:
-            target.poll()
+        self.log(logging.DEBUG, 'poll triggered')
         self.machine.poll()
 
-    def update_servo(self):
-        '''Update the servo position.'''
-        return
-        self.machine.check_duty_cycle()
+    def post_after(self, delay_ms, event):
+        '''Post event after delay_ms, unless the mode changes first.'''
+        self.mode_timers.append(self.timers.post_later(
+            delay_ms * machine.NS_PER_MS, event))
 
     def play(self):
         '''Starts a new play of the currently selected game.'''
-        # Display the new game screen
-        # Release the balls
         self.log(logging.INFO, 'play triggered')
         self.game.start_game()
-        self.display.show_score(self.game.score, 0, 0, [])
-        #self.machine.release_balls()
-        self.mode = OperationMode.PLAY
+        self.display.set_score(self.game.score, 0, 0, [])
+        self.render.request()
+        # The servo moves on its own thread, this does not wait for it
+        self.machine.release_balls()
+        self.set_mode(OperationMode.PLAY)
+        if self.game.rules.seconds:
+            # A timed game ends when its time is up, hits or not
+            self.post_after(self.game.rules.seconds * 1000, self.end_event)
+        self.watch_stall()
+
+    def watch_stall(self):
+        '''Check the game has not stalled once it could have.'''
+        if not self.game.rules.balls:
+            return
+        if self.stall_timer is not None:
+            self.stall_timer.cancel()
+        delay_ms = int(self.game.flow.stall_timeout() * 1000)
+        self.stall_timer = self.timers.call_later(
+            delay_ms * machine.NS_PER_MS, self.check_stall)
+        self.mode_timers.append(self.stall_timer)
+
+    def check_stall(self):
+        '''End a game that has had no balls for too long.'''
+        if self.game.check_game_over():
+            self.log(logging.INFO, 'Game stalled, posting end_event')
+            pygame.event.post(self.end_event)
+        else:
+            self.watch_stall()
 
     def post_play(self):
         '''Start the post play period, presenting the last score.'''
         self.log(logging.INFO, 'post_play triggered')
         bonus = []
-        self.mode = OperationMode.POST_PLAY
-        self.display.show_final_score(self.game.score, self.last_target,
-                                      self.last_points, bonus)
-        # Display current ranking
-        pass
+        self.set_mode(OperationMode.POST_PLAY)
+        self.machine.hold_balls()
+        self.post_after(self.config.get('post_play_ms', self.POST_PLAY_MS),
+                        pygame.event.Event(self.POST_PLAY_TIMEOUT))
+        self.last_score = self.game.score
+        self.display.set_score(self.game.score, self.last_target,
+                               self.last_points, bonus, final=True)
+        self.render.request()
+        self.log(logging.INFO, 'Debounce (hits, suppressed): {}'.format(
+            self.machine.debounce_report()))
+        self.log(logging.INFO, 'Render: {}'.format(self.render.stats()))
+        self.log(logging.INFO, 'Input queue: {}'.format(
+            self.input_events.report()))
+        if self.machine.ring is not None:
+            self.log(logging.INFO, 'Input ring: {}'.format(
+                self.machine.ring_report()))
+        self.log(logging.INFO, 'Ball flow: {}'.format(self.game.flow.stats()))
+        self.persist()
+        rank = self.scores.add(self.game.score)
+        logs.event(self.logger, logging.INFO, 'game', score=self.game.score,
+                   rank=rank, games=len(self.scores.index))
+
+    def persist(self):
+        '''Write out the event log and ball drops of the game.'''
+        if self.recorder is not None:
+            self.recorder.flush()
+        if self.game.drops is not None:
+            self.game.drops.flush()
 
     def attract(self):
         '''Start attracting players to play a new game.'''
+        self.set_mode(OperationMode.ATTRACT)
+        self.attract_page = 0
+        self.show_attract_page()
+        delay = self.config.get('attract_ms', self.ATTRACT_MS)
+        self.mode_timers.append(self.timers.post_every(
+            delay * machine.NS_PER_MS,
+            pygame.event.Event(self.ATTRACT_EVENT)))
+
+    def show_attract_page(self):
+        '''Show the high scores, alternating with the last final score.'''
         # Display game attraction graphics
-        # Display high scores
-        pass
+        if self.attract_page % 2 and self.last_score is not None:
+            self.display.set_score(self.last_score, 0, 0, [], final=True)
+        else:
+            self.display.set_high_scores(
+                self.scores.top(self.HIGH_SCORE_COUNT))
+        self.render.request()
+
+    def rotate_attract(self):
+        '''Move on to the next attract screen.'''
+        self.attract_page += 1
+        self.show_attract_page()
 
     def hit_target(self, event):
         '''Handler for processing target events.'''
         self.game.drop_ball(event.sub[0])
-        target, points = event.sub
-        self.display.show_score(self.game.score, target, points, [])
-        self.log(logging.INFO, 'Points: {}'.format(points))
-        self.log(logging.INFO, 'Score: {}'.format(self.game.score))
+        target = event.sub[0]
+        # The points scored after the game's rules are applied
+        points = self.game.points
+        bonus = list(self.game.bonus)
+        self.display.set_score(self.game.score, target, points, bonus)
+        self.render.request()
+        logs.event(self.logger, logging.INFO, 'hit', mode=self.mode,
+                   target=target, points=points, score=self.game.score,
+                   bonus=','.join(bonus))
         if self.game.check_game_over():
             self.log(logging.INFO, 'Posting end_event')
             pygame.event.post(self.end_event)
+        else:
+            self.watch_stall()
         self.last_target = target
         self.last_points = points
-        #self.machine.hold_balls()
+
+    def build_dispatch(self):
+        '''Build the event dispatch table.
+
+        Returns {mode: {event type: handlers}}. The handlers for an event
+        are the global ones followed by the mode specific ones, each is
+        called with the event and returns False to stop the event loop.
+        Handlers look up their method when called, so they can be replaced
+        on the instance.
+        '''
+        common = {
+            pygame.QUIT: [lambda event: self.quit()],
+            pygame.KEYDOWN: [lambda event: self.key_down(event)],
+            self.START_EVENT: [lambda event: self.log(
+                logging.INFO, 'START_BUTTON TRIGGERED')],
+            self.POLL_EVENT: [lambda event: self.poll_targets()],
+        }
+        play = lambda event: self.play()
+        modes = {
+            OperationMode.ATTRACT: {
+                self.START_EVENT: [play],
+                self.ATTRACT_EVENT: [lambda event: self.rotate_attract()],
+            },
+            OperationMode.POST_PLAY: {
+                self.START_EVENT: [play],
+                self.POST_PLAY_TIMEOUT: [lambda event: self.attract()],
+            },
+            OperationMode.PLAY: {
+                self.END_EVENT: [lambda event: self.post_play()],
+                self.TARGET_EVENT: [lambda event: self.hit_target(event)],
+            },
+        }
+        table = {}
+        for mode in OperationMode.ALL:
+            handlers = modes.get(mode, {})
+            table[mode] = dict(
+                (event_type, tuple(common.get(event_type, []) +
+                                   handlers.get(event_type, [])))
+                for event_type in set(common) | set(handlers))
+        return table
+
+    def quit(self):
+        '''Stop the event loop.'''
+        self.log(logging.WARNING, 'QUITing the event loop')
+        return False
+
+    def key_down(self, event):
+        '''Simulate the inputs from the keyboard.
+
+        Space presses start and the digits hit their target, any other key
+        stops the event loop.
+        '''
+        self.log(logging.INFO, 'Event key: {}'.format(event.key))
+        if event.key == ord(' '):
+            self.machine.start_callback(None)
+            return True
+        if event.key > ord('9') or event.key < ord('0'):
+            return False
+        trigger = self.target_index.get(event.key - ord('0'))
+        if trigger is not None:
+            trigger.callback(None)
+        return True
+
+    def handle_event(self, event):
+        '''Process a single event.
+
+        Returns False when the event loop should stop.
+        '''
+        if self.recorder is not None:
+            self.recorder.event(event)
+        for handler in self.handlers[self.mode].get(event.type, ()):
+            if handler(event) is False:
+                return False
+        return True
+
+    def wait_events(self):
+        '''Block until there are events, or a frame or timer is due.
+
+        Returns the pending pygame events, possibly none. Timers, GPIO
+        edges and input all wake the loop, so nothing busy waits.
+        '''
+        if len(self.input_events):
+            return pygame.event.get()
+        timeout = self.render.timeout(self.render.clock())
+        timer_timeout = self.timers.timeout()
+        if timeout is None or (timer_timeout is not None and
+                               timer_timeout < timeout):
+            timeout = timer_timeout
+        if timeout == 0:
+            return pygame.event.get()
+        if timeout is None:
+            event = pygame.event.wait()
+        else:
+            # Round up so the frame is due when the wait ends
+            event = pygame.event.wait(-(-timeout // 1000000))
+        if event.type == pygame.NOEVENT:
+            return []
+        return [event] + pygame.event.get()
 
     def event_loop(self):
         '''The pygame event loop.'''
-        # Start the event loop
+        self.start()
+        try:
+            self.run_loop()
+        finally:
+            self.shutdown()
+
+    def start(self):
+        '''Get ready to take input, whichever runtime runs the loop.'''
         self.log(logging.INFO, 'Starting event loop')
-        while True: 
-            current_time = self.get_current_time()
-
-            for event in pygame.event.get():
-                # Process global events first
-                #self.log(logging.INFO, 'New event: {}'.format(event))
-                if event.type == pygame.QUIT:
-                    self.log(logging.WARNING, 'QUITing the event loop')
+        if self.mode == OperationMode.ATTRACT:
+            self.attract()
+        self.machine.start()
+        if self.metrics is not None:
+            self.exporter = self.metrics.export(self.config['metrics'])
+        logs.mark('input_ready')
+        logs.event(self.logger, logging.INFO, 'startup',
+                   **logs.startup.report())
+
+    def shutdown(self):
+        '''Write everything out and release the machine.'''
+        if self.recorder is not None:
+            self.recorder.flush()
+        if self.game.drops is not None:
+            self.game.drops.close()
+        self.scores.close()
+        self.machine.close()
+        if self.exporter is not None:
+            self.exporter.stop()
+
+    def run_loop(self):
+        '''Handle events until QUIT.'''
+        while True:
+            # Timers post their events, the wait picks them straight up
+            self.timers.run()
+            events = self.wait_events()
+
+            # Edges from the GPIO callback thread go first, they carry the
+            # lowest latency input
+            for event in self.machine.get_edge_events():
+                if not self.handle_event(event):
                     return
-                if event.type == pygame.KEYDOWN:
-                    self.log(logging.INFO, 'Event key: {}'.format(event.key))
-                    if event.key == ord(' '):
-                        self.start_button.callback(None)
-                        continue
-                    if event.key > ord('9'):
-                        return
-                    if event.key < ord('0'):
+
+            # Then the input queue, including the hits found by the poll
+            # ticks in it
+            input_events = self.input_events.get_all()
+            while input_events:
+                for event in input_events:
+                    if not self.handle_event(event):
                         return
-                    event_no = event.key - ord('0')
-                    self.targets[event_no].callback(None)
-                    continue
-                if event.type == pygame.KEYUP:
-                    continue
-                if event.type == self.START_EVENT:
-                    self.log(logging.INFO, 'START_BUTTON TRIGGERED')
-                if event.type == self.POLL_EVENT:
-                    self.poll_targets()
-                    # The servo control is untested
-                    #self.update_servo()
-
-                # Process events per specific mode
-                if self.mode == OperationMode.ATTRACT:
-                    if event.type == self.START_EVENT:
-                        self.play()
-                        continue
-                if self.mode == OperationMode.POST_PLAY:
-                    if event.type == self.START_EVENT:
-                        self.play()
-                        continue
-                    if event.type == self.POST_PLAY_TIMEOUT:
-                        self.attract()
-                        continue
-                if self.mode == OperationMode.PLAY:
-                    if event.type == self.END_EVENT:
-                        self.post_play()
-                        continue
-                    if event.type == self.TARGET_EVENT:
-                        self.hit_target(event)
-                        continue
-
-                # Unhandled event
-                #self.log(logging.ERROR, 'Unhandled event: {}'.format(
-                #    event.type))
+                input_events = self.input_events.get_all()
+
+            for event in events:
+                if not self.handle_event(event):
+                    return
+
+            # Draw once all of the pending input has been handled
+            self.render.tick()
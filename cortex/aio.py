@@ -0,0 +1,159 @@
+'''
+An asyncio runtime for the Cortex, in place of the pygame event loop.
+
+The work of the event loop is split into tasks:
+
+    input      runs the timers and handles GPIO edges and input events,
+               woken by the GPIO thread or the next timer
+    frame      pumps pygame for SDL events, e.g. keys and timer posts,
+               and draws the frames
+    telemetry  logs the render, input queue and debounce counts
+
+The Cortex handlers, and so the OperationMode semantics, are unchanged:
+every task calls the same handle_event() on the one event loop thread.
+Blocking disk writes, the event log and ball drops at the end of a game,
+go to a single worker thread so they are written in order.
+
+    AsyncRuntime(ctex).run()
+'''
+import asyncio
+import concurrent.futures
+import logging
+
+import logs
+import machine
+
+import pygame
+
+# How often pygame is pumped when no frame is due
+DEFAULT_PUMP_MS = 10
+DEFAULT_TELEMETRY_S = 60
+
+
+async def wait(event, timeout):
+    '''Wait for an asyncio.Event for at most timeout ns, None for ever.'''
+    if timeout is None:
+        await event.wait()
+    elif not event.is_set():
+        try:
+            await asyncio.wait_for(event.wait(), timeout / 1e9)
+        except asyncio.TimeoutError:
+            pass
+    event.clear()
+
+
+class AsyncRuntime(object):
+    '''Runs a Cortex's event handling as asyncio tasks.'''
+
+    def __init__(self, ctex, pump_ms=DEFAULT_PUMP_MS,
+                 telemetry_s=DEFAULT_TELEMETRY_S):
+        self.ctex = ctex
+        self.pump_ns = pump_ms * machine.NS_PER_MS
+        self.telemetry_s = telemetry_s
+        self.logger = logging.getLogger(__name__)
+        self.loop = None
+        self.executor = None
+        # Pending writes in the executor
+        self.writes = []
+
+    def run(self):
+        '''Run until a handler stops the loop, e.g. on QUIT.'''
+        asyncio.run(self.main())
+
+    async def main(self):
+        ctex = self.ctex
+        self.loop = asyncio.get_running_loop()
+        self.executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix='persist')
+        self.wake = asyncio.Event()
+        self.frame = asyncio.Event()
+        self.stopped = asyncio.Event()
+        # The GPIO thread wakes the input task, rather than pygame
+        ctex.machine.wake_event = None
+        ctex.machine.wake = self.wake_threadsafe
+        ctex.persist = self.persist
+        ctex.start()
+        tasks = [asyncio.ensure_future(task) for task in (
+            self.input_task(), self.frame_task(), self.telemetry_task())]
+        try:
+            await self.stopped.wait()
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            await asyncio.gather(*self.writes, return_exceptions=True)
+            self.executor.shutdown()
+            ctex.machine.wake = None
+            ctex.shutdown()
+
+    def wake_threadsafe(self):
+        '''Wake the input task, safe to call from any thread.'''
+        self.loop.call_soon_threadsafe(self.wake.set)
+
+    def handle(self, events):
+        '''Handle events, returns False once the loop should stop.'''
+        for event in events:
+            if not self.ctex.handle_event(event):
+                self.stopped.set()
+                return False
+        return True
+
+    def persist(self):
+        '''Write out the game in the executor, in place of Cortex.persist.'''
+        ctex = self.ctex
+        drops = ctex.game.drops
+        # Taken here, drops appended from now on go to the next write
+        rows = drops.detach() if drops is not None else None
+
+        def write():
+            if ctex.recorder is not None:
+                ctex.recorder.flush()
+            if rows is not None:
+                drops.write_rows(rows)
+        self.writes = [pending for pending in self.writes
+                       if not pending.done()]
+        self.writes.append(self.loop.run_in_executor(self.executor, write))
+
+    async def input_task(self):
+        ctex = self.ctex
+        while not self.stopped.is_set():
+            ctex.timers.run()
+            if not (self.handle(ctex.machine.get_edge_events()) and
+                    self.handle(ctex.input_events.get_all())):
+                return
+            self.frame.set()
+            if not len(ctex.input_events):
+                await wait(self.wake, ctex.timers.timeout())
+            else:
+                # Let the other tasks in before the next batch
+                await asyncio.sleep(0)
+
+    async def frame_task(self):
+        ctex = self.ctex
+        render = ctex.render
+        while not self.stopped.is_set():
+            events = pygame.event.get()
+            if not self.handle(events):
+                return
+            # The handlers may have queued input, or added a timer due
+            # before the input task would next wake
+            if events or len(ctex.input_events):
+                self.wake.set()
+            render.tick()
+            timeout = render.timeout(render.clock())
+            if timeout is None or timeout > self.pump_ns:
+                timeout = self.pump_ns
+            await wait(self.frame, timeout)
+
+    async def telemetry_task(self):
+        ctex = self.ctex
+        while not self.stopped.is_set():
+            await asyncio.sleep(self.telemetry_s)
+            fields = dict(ctex.render.stats())
+            fields.update(('queue_' + name, value) for name, value in
+                          ctex.input_events.report().items())
+            fields['suppressed'] = sum(
+                suppressed for _, suppressed in
+                ctex.machine.debounce_report().values())
+            logs.event(self.logger, logging.INFO, 'telemetry',
+                       mode=ctex.mode, **fields)
@@ -0,0 +1,142 @@
+'''
+The metrics of a Cortex, see the metrics module.
+
+The hot paths are timed by wrapping the Cortex's own methods on the
+instance, the dispatch table looks them up when called, so a Cortex
+without metrics runs exactly as before. Everything else is sampled once a
+second by a timer on the event loop.
+'''
+import collections
+import time
+
+import metrics
+
+NS_PER_MS = 1000000
+SAMPLE_NS = metrics.NS_PER_SECOND
+HOUR_NS = 3600 * metrics.NS_PER_SECOND
+# Queue depths, in events
+DEPTH_BOUNDS = (0, 1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+
+class CortexMetrics(object):
+    '''Records a Cortex's metrics in a registry.'''
+
+    def __init__(self, ctex, registry=None, clock=time.monotonic_ns):
+        self.ctex = ctex
+        self.clock = clock
+        self.registry = registry = registry or metrics.Registry()
+        self.poll_jitter = registry.histogram(
+            'skeeball_poll_jitter_seconds',
+            'How far each input poll was from its period.')
+        self.poll_time = registry.histogram(
+            'skeeball_poll_targets_seconds',
+            'Time spent in Cortex.poll_targets.')
+        self.hit_time = registry.histogram(
+            'skeeball_hit_target_seconds',
+            'Time spent in Cortex.hit_target.')
+        self.frame_time = registry.histogram(
+            'skeeball_show_score_seconds',
+            'Time spent drawing and showing a frame of the score.')
+        self.queue_depth = registry.histogram(
+            'skeeball_input_queue_depth',
+            'Input events waiting, sampled every second.',
+            bounds=DEPTH_BOUNDS, scale=1)
+        self.fps = registry.gauge(
+            'skeeball_fps', 'Frames drawn in the last second.')
+        self.queue_high_water = registry.gauge(
+            'skeeball_input_queue_high_water',
+            'The most input events ever waiting.')
+        self.games_per_hour = registry.gauge(
+            'skeeball_games_per_hour', 'Games finished in the last hour.')
+        self.frames = registry.counter(
+            'skeeball_frames_total', 'Frames drawn.')
+        self.hits = registry.counter(
+            'skeeball_hits_total', 'Target hits scored.')
+        self.suppressed = registry.counter(
+            'skeeball_debounce_suppressed_total',
+            'Input pulses suppressed by the debounce.')
+        self.dropped = registry.counter(
+            'skeeball_input_queue_dropped_total',
+            'Input events dropped from a full queue.')
+        self.games = registry.counter(
+            'skeeball_games_total', 'Games finished.')
+        self.poll_period = None
+        self.last_poll = None
+        self.last_frames = 0
+        # End times of the games in the last hour
+        self.game_ends = collections.deque()
+
+    def install(self):
+        '''Wrap the Cortex's hot paths and start sampling.'''
+        ctex = self.ctex
+        self.wrap(ctex, 'set_mode', self.set_mode)
+        self.wrap(ctex, 'poll_targets', self.poll_targets)
+        self.wrap(ctex, 'hit_target', self.hit_target)
+        self.wrap(ctex, 'post_play', self.post_play)
+        self.wrap(ctex.render, 'render', self.render)
+        self.timer = ctex.timers.call_every(SAMPLE_NS, self.sample)
+
+    def export(self, settings):
+        '''Start exporting the metrics, returns the metrics.Exporter.'''
+        return metrics.Exporter(
+            self.registry, port=settings.get('port'),
+            host=settings.get('host', metrics.DEFAULT_HOST),
+            snapshot=settings.get('snapshot'),
+            snapshot_s=settings.get('snapshot_s',
+                                    metrics.DEFAULT_SNAPSHOT_S))
+
+    def wrap(self, target, name, wrapper):
+        '''Replace target.name with wrapper, given the original first.'''
+        original = getattr(target, name)
+        setattr(target, name, lambda *args: wrapper(original, *args))
+
+    def set_mode(self, original, mode):
+        original(mode)
+        poll_ms, _ = self.ctex.get_rates(mode)
+        self.poll_period = poll_ms * NS_PER_MS
+        self.last_poll = None
+
+    def poll_targets(self, original):
+        start = self.clock()
+        if self.last_poll is not None:
+            self.poll_jitter.observe(
+                abs(start - self.last_poll - self.poll_period))
+        self.last_poll = start
+        original()
+        self.poll_time.observe(self.clock() - start)
+
+    def hit_target(self, original, event):
+        start = self.clock()
+        original(event)
+        self.hit_time.observe(self.clock() - start)
+        self.hits.value += 1
+
+    def render(self, original):
+        start = self.clock()
+        animating = original()
+        self.frame_time.observe(self.clock() - start)
+        return animating
+
+    def post_play(self, original):
+        original()
+        self.games.value += 1
+        self.game_ends.append(self.clock())
+
+    def sample(self):
+        '''Sample the counts kept elsewhere, runs once a second.'''
+        ctex = self.ctex
+        now = self.clock()
+        frames = ctex.render.frames
+        self.fps.value = frames - self.last_frames
+        self.frames.value = self.last_frames = frames
+        self.queue_depth.observe(len(ctex.input_events))
+        report = ctex.input_events.report()
+        self.queue_high_water.value = report['high_water']
+        self.dropped.value = sum(value for name, value in report.items()
+                                 if name.startswith('dropped_'))
+        self.suppressed.value = sum(
+            suppressed for _, suppressed in
+            ctex.machine.debounce_report().values())
+        while self.game_ends and self.game_ends[0] <= now - HOUR_NS:
+            self.game_ends.popleft()
+        self.games_per_hour.value = len(self.game_ends)
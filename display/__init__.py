@@ -2,10 +2,18 @@
 Provides the display output interface.
 '''
 import logging
-from math import pi
+import os
 
 import pygame
 
+import logs
+from display import assets
+from display.board import BoardLayout, BoardSprites, Highlight
+from display.compositor import Compositor
+from display.glyphs import GlyphAtlas, TextCache
+from display.layout import Layout, REFERENCE_SIZE
+from display.scheduler import RenderScheduler
+
 
 class Display(object):
     '''The display interface.'''
@@ -17,29 +25,62 @@ class Display(object):
 
     def __init__(self, config, fullscreen=True, pygame=pygame):
         '''Initialize the display.'''
-        logging.basicConfig(format='%(asctime)s %(message)s')
         self.logger = logging.getLogger(__name__)
         self.config = config
         self.pygame = pygame
         self.pygame.init()
+        # Fonts and the background come prebuilt from the bundle, if any,
+        # otherwise the background is scaled once and cached on disk
+        self.assets = assets.load(self.config.get('assets'))
+        self.cache = None
+        if self.config.get('cache'):
+            self.cache = assets.ScaledCache(self.config['cache'])
 
         if fullscreen:
             width, height = self.get_fullscreen_resolution()
             self.screen = self.pygame.display.set_mode(
                 [width, height], self.pygame.FULLSCREEN)
+        elif self.config.get('viewport'):
+            # A lane's part of a shared screen, see the lanes module
+            x, y, width, height = self.config['viewport']
+            os.environ['SDL_VIDEO_WINDOW_POS'] = '{},{}'.format(x, y)
+            self.screen = self.pygame.display.set_mode(
+                [width, height], self.pygame.NOFRAME)
         else:
-            self.screen = pygame.display.set_mode((1440, 900))
-            pygame.display.set_caption('skeeball')
-            background = pygame.Surface(self.screen.get_size())
-            background = background.convert()
-            background.fill((0, 0, 0))
+            size = self.config.get('window_size', REFERENCE_SIZE)
+            self.screen = self.pygame.display.set_mode(size)
+            self.pygame.display.set_caption('skeeball')
+        # Every position and font size is worked out once for the screen
+        self.layout = Layout(self.screen.get_size(),
+                             self.config.get('layout'))
+
+        # Initialize the screen and background, this is the first frame
+        self.background_pattern = None
+        self.background = self.init_background()
+        logs.mark('first_frame')
 
         self.score_font = self.init_score_font()
         self.text_font = self.init_text_font()
-        self.background_pattern = pygame.image.load(self.config['background'])
+        # Scores are drawn from pre-rendered digits, anything else goes
+        # through the text cache
+        self.score_glyphs = GlyphAtlas(self.score_font, self.SCORE_COLOR,
+                                       pygame=self.pygame)
+        self.text_cache = TextCache(pygame=self.pygame)
+        self.compositor = Compositor(self.screen, self.background,
+                                     self.pygame)
+
+        # The board is laid out once for the screen size, it is only drawn
+        # once show_board is first called
+        self.board_layout = BoardLayout(self.screen.get_size(),
+                                        self.config.get('board'), self.pygame)
+        self.board = None
+        self.highlight = None
 
-        # Initialize the screen and background
-        self.init_background()
+        # What the next frame shows
+        self.score = None
+        self.final = False
+        self.bonus = ()
+        self.high_scores = None
 
     def blit(self, surface, position, flip=True):
         '''Render the surface and optionally flip the buffer.'''
@@ -48,118 +89,209 @@ class Display(object):
             self.pygame.display.flip()
 
     def get_fullscreen_resolution(self):
-        '''Returns the maximum fullscreen resolution.'''
+        '''Returns the configured resolution, or the maximum one.'''
         modes = self.pygame.display.list_modes(0, self.pygame.FULLSCREEN)
         max_mode = modes[0]
+        resolution = self.config.get('resolution')
+        if resolution and list(resolution) in [list(mode) for mode in modes]:
+            max_mode = resolution
         self.log(logging.INFO, 'Selected fullscreen mode: {}'.format(
             max_mode))
         return max_mode
 
     def init_background(self):
-        '''Initialize the screen surface with black.'''
-        background = self.pygame.Surface(self.screen.get_size())
-        background.fill((0, 0, 0))
-        self.blit(background, (0, 0), False)
-        self.blit(self.background_pattern, (0, 0))
+        '''Initialize the screen surface with black.
+
+        Returns the background, pattern scaled to cover the screen,
+        converted to the screen format so that restoring regions of it is
+        a plain copy.
+        '''
+        size = self.screen.get_size()
+        background = None
+        if self.assets is not None:
+            background = self.assets.background(
+                size, self.config['background'], self.pygame)
+        if background is None and self.cache is not None:
+            background = self.cache.background(self.config['background'],
+                                               size, self.pygame)
+        if background is None:
+            pattern = self.pygame.image.load(self.config['background'])
+            if pattern.get_flags() & self.pygame.SRCALPHA:
+                pattern = pattern.convert_alpha()
+            else:
+                pattern = pattern.convert()
+            self.background_pattern = pattern
+            background = assets.compose_background(pattern, size,
+                                                   self.pygame)
+        background = background.convert()
+        self.blit(background, (0, 0))
         return background
 
     def init_score_font(self):
         '''Initialize the font used to render the current score.'''
+        if self.assets is not None:
+            return self.assets.font('score_font',
+                                    self.layout.score_font_size, self.pygame)
         font_path = self.config['score_font']
         try:
-            font = self.pygame.font.Font(font_path, 256)
+            font = self.pygame.font.Font(font_path,
+                                         self.layout.score_font_size)
         except IOError:
-            font = self.pygame.font.SysFont('helvetica', 256)
+            font = self.pygame.font.SysFont(assets.TEXT_FONT,
+                                            self.layout.score_font_size)
         return font
 
     def init_text_font(self):
-        font = self.pygame.font.SysFont('helvetica', 128)
+        if self.assets is not None:
+            return self.assets.font('text_font', self.layout.text_font_size,
+                                    self.pygame)
+        font = self.pygame.font.SysFont(assets.TEXT_FONT,
+                                        self.layout.text_font_size)
         return font
 
     def log(self, level, msg):
         '''Machine specific event logger.'''
         self.logger.log(level, msg)
 
+    def init_board(self):
+        '''Render the board sprites and add the board to the background.'''
+        self.board = BoardSprites(self.board_layout, self.BOARD_COLOR,
+                                  self.TARGET_COLOR, self.pygame)
+        self.highlight = Highlight(self.board)
+        self.background.blit(self.board.board, self.board_layout.position)
+        self.compositor.restore_all()
+
     def show_board(self, target):
-        '''Draw the game board and optionally highlight a target.'''
-        size = self.screen.get_size()
-        size = (size[0] / 2, size[1])
-        pos = (size[0], 0)
-        center_left = size[0] / 2 - 50
-        center_right = center_left + 100
-        targets = {0: [0, 0, 0, 0],
-                   1: [center_left, 725, 100, 100],
-                   2: [center_left, 600, 100, 100],
-                   3: [center_left, 475, 100, 100],
-                   4: [center_left, 300, 100, 100],
-                   5: [center_left, 125, 100, 100],
-                   6: [5, 5, 100, 100],
-                   7: [size[0] - 5 - 100, 5, 100, 100]}
-        arcs = [[[size[0] / 2 - 200, 300, 400, 400], 0, 2.1 * pi],
-                [[0, size[0] - 615, size[0], size[0]], pi, 2 * pi]]
-
-        board = self.pygame.Surface(size)
-        pygame.draw.rect(board, self.BOARD_COLOR, [0, 0, size[0], size[1]], 3)
-        for t in targets:
-            if t == 0:
-                continue
-            color = self.BOARD_COLOR
-            if t == target:
-                color = self.TARGET_COLOR
-            pygame.draw.ellipse(board, color, targets[t], 3)
-        for a in arcs:
-            pygame.draw.arc(board, self.BOARD_COLOR, a[0], a[1], a[2], 3)
-        self.blit(board, pos)
+        '''Draw the game board and optionally highlight a target.
+
+        Returns True while the highlight is animating, call render_frame()
+        once per frame until it returns False.
+        '''
+        if self.board is None:
+            self.init_board()
+        self.highlight.start(target)
+        return self.render_frame()
+
+    def render_font(self, font, x, y, color, content):
+        '''Draw outlined text centered on (x, y) through the compositor.'''
+        if (font is self.score_font and color == self.SCORE_COLOR and
+                content in self.score_glyphs):
+            self.score_glyphs.draw(self.compositor, content, (x, y))
+            return
+        text = self.text_cache.get(font, content, color)
+        textpos = text.get_rect()
+        textpos.centerx = x
+        textpos.centery = y
+        self.compositor.blit(text, textpos)
+
+    def render_frame(self):
+        '''Draw the current score and board highlight.
+
+        Only the regions drawn by the previous frame are restored from the
+        background, and the frame is pushed with a single display update.
+        Returns True if another frame is needed to finish an animation.
+        '''
+        self.compositor.clear()
+        animating = False
+        if self.highlight is not None:
+            animating = self.highlight.draw(self.compositor)
+        if self.score is not None:
+            layout = self.layout
+            self.render_font(self.score_font, layout.score[0],
+                             layout.score[1], self.SCORE_COLOR,
+                             str(self.score))
+            if self.final:
+                self.render_font(self.text_font, layout.final_label[0],
+                                 layout.final_label[1], self.SCORE_COLOR,
+                                 'Final Score')
+            if self.bonus:
+                self.render_font(self.text_font, layout.bonus[0],
+                                 layout.bonus[1], self.SCORE_COLOR,
+                                 ' + '.join(self.bonus))
+        elif self.high_scores is not None:
+            self.render_high_scores()
+        self.compositor.present()
+        return animating
+
+    def set_score(self, score, target, points, bonus, final=False):
+        '''Update the score shown by the next frame without drawing it.'''
+        self.score = score
+        self.final = final
+        self.bonus = tuple(bonus)
+        self.high_scores = None
+        if self.highlight is not None and target:
+            self.highlight.start(target)
 
     def show_score(self, score, target, points, bonus, final=False):
         '''Show the current score.'''
-        # Clear the background first
-        background = self.pygame.Surface(self.screen.get_size())
-        background.fill((0, 0, 0))
-        # Blit the background surface to the screen, but don't flip it until
-        # the text is drawn below
-        self.blit(background, (0, 0), False)
-
-        self.blit(self.background_pattern, (0, 0), False)
-
-        def render_font(font, x, y, color, content):
-            offsets = [(-2, -2), (-2, 2), (2, -2), (2, 2)]
-            for xoffset, yoffset in offsets:
-                text = font.render(content, 1, (0, 0, 0))
-                textpos = text.get_rect()
-                textpos.centerx = x + xoffset
-                textpos.centery = y + yoffset
-                # Blit the text surface onto the screen
-                self.blit(text, textpos)
-            text = font.render(content, 1, color)
-            textpos = text.get_rect()
-            textpos.centerx = x
-            textpos.centery = y
-            # Blit the text surface onto the screen
-            self.blit(text, textpos)
-
-        text_x = background.get_rect().centerx
-        text_y = background.get_rect().centery
-        render_font(self.score_font, text_x, text_y, self.SCORE_COLOR,
-                    str(score))
-
-        if final:
-            render_font(self.text_font, text_x, text_y - 250, self.SCORE_COLOR,
-                        'Final Score')
-            return
-            text = self.text_font.render('Final Score', 1, self.SCORE_COLOR)
-            textpos = text.get_rect()
-            textpos.centerx = (background.get_rect().centerx -
-                background.get_width() / 2)
-            textpos.centery = background.get_rect().centery - 150
-            self.log(logging.INFO, 'final score: {}, {}'.format(textpos.centerx,
-                                                                textpos.centery))
-            self.blit(text, textpos)
+        self.set_score(score, target, points, bonus, final)
+        return self.render_frame()
 
     def show_final_score(self, score, target, points, bonus):
         '''Show the final score at the end of the game.'''
         self.show_score(score, target, points, bonus, True)
 
+    def render_high_scores(self):
+        '''Draw the high score table, best first.'''
+        x, y = self.layout.high_scores
+        line_height = self.text_font.get_linesize()
+        y -= line_height * len(self.high_scores) // 2
+        self.render_font(self.text_font, x, y - line_height,
+                         self.SCORE_COLOR, 'High Scores')
+        for rank, score in enumerate(self.high_scores, 1):
+            y += line_height
+            self.render_font(self.text_font, x, y, self.SCORE_COLOR,
+                             '{}.  {}'.format(rank, score))
+
+    def set_high_scores(self, scores):
+        '''Show the high scores, instead of a score, from the next frame.'''
+        self.score = None
+        self.final = False
+        self.bonus = ()
+        self.high_scores = list(scores)
+
     def show_high_scores(self, scores):
         '''Show the list of high scores.'''
-        pass
+        self.set_high_scores(scores)
+        return self.render_frame()
+
+
+class HeadlessDisplay(object):
+    '''A display that keeps what would be shown and draws nothing.
+
+    Used with 'headless' in the configuration, e.g. to replay event logs.
+    '''
+
+    def __init__(self, config, fullscreen=True):
+        self.config = config
+        self.score = None
+        self.final = False
+        self.bonus = ()
+        self.high_scores = None
+
+    def render_frame(self):
+        '''Nothing is drawn, so nothing is ever animating.'''
+        return False
+
+    def set_score(self, score, target, points, bonus, final=False):
+        self.score = score
+        self.final = final
+        self.bonus = tuple(bonus)
+        self.high_scores = None
+
+    def show_score(self, score, target, points, bonus, final=False):
+        self.set_score(score, target, points, bonus, final)
+        return self.render_frame()
+
+    def show_final_score(self, score, target, points, bonus):
+        self.show_score(score, target, points, bonus, True)
+
+    def set_high_scores(self, scores):
+        self.score = None
+        self.final = False
+        self.bonus = ()
+        self.high_scores = list(scores)
+
+    def show_high_scores(self, scores):
+        self.set_high_scores(scores)
+        return self.render_frame()
@@ -0,0 +1,5 @@
+import sys
+
+from display.assets import main
+
+sys.exit(main())
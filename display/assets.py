@@ -0,0 +1,198 @@
+'''
+A prebuilt bundle of the display assets, for a fast cold start.
+
+Resolving a system font by name scans every installed font, and decoding
+and compositing the background image is slow on a Pi. The bundle does
+both ahead of time, for one screen size:
+
+    python -m display [--size 1440x900] [--config config.yaml] [assets]
+
+The bundle directory holds bundle.json, with the screen size and the
+resolved font paths, config.marshal, a copy of the configuration, and
+background.raw, the background at the screen size as raw RGB pixels ready
+to convert(). The configuration is marshalled rather than kept in the JSON,
+which would turn integer keys, e.g. of the debounce targets, into strings.
+The manifest and configuration are read by the bundle module, which does
+not import pygame.
+'''
+import json
+import logging
+import marshal
+import os
+
+import pygame
+
+import bundle
+from bundle import CONFIG, DEFAULT_CACHE, DEFAULT_PATH, MANIFEST, mtime
+from display.layout import REFERENCE_SIZE
+
+BACKGROUND = 'background.raw'
+PIXEL_FORMAT = 'RGB'
+TEXT_FONT = 'helvetica'
+
+logger = logging.getLogger(__name__)
+
+
+def resolve_font(path, name, pygame=pygame):
+    '''The path of a font file, or of the system font name.
+
+    None means pygame's default font, the same fallback SysFont makes.
+    '''
+    if path and os.path.exists(path):
+        return os.path.abspath(path)
+    return pygame.font.match_font(name)
+
+
+def compose_background(pattern, size, pygame=pygame):
+    '''The background for a screen size, from the background image.
+
+    The image is smoothscaled, keeping its aspect ratio, to cover the
+    screen and centered on it over black.
+    '''
+    width, height = size
+    pattern_width, pattern_height = pattern.get_size()
+    if (pattern_width, pattern_height) != (width, height):
+        scale = max(float(width) / pattern_width,
+                    float(height) / pattern_height)
+        pattern = pygame.transform.smoothscale(pattern, (
+            max(1, int(round(pattern_width * scale))),
+            max(1, int(round(pattern_height * scale)))))
+        pattern_width, pattern_height = pattern.get_size()
+    background = pygame.Surface(size)
+    background.fill((0, 0, 0))
+    background.blit(pattern, ((width - pattern_width) // 2,
+                              (height - pattern_height) // 2))
+    return background
+
+
+class ScaledCache(object):
+    '''Backgrounds composed for a screen size, cached on disk.
+
+    The cache is keyed by the image, its modification time and the screen
+    size, so only the first start at a resolution does any scaling.
+    '''
+
+    def __init__(self, directory=DEFAULT_CACHE):
+        self.directory = directory
+
+    def path(self, source, size):
+        name = os.path.splitext(os.path.basename(source))[0]
+        return os.path.join(self.directory, '{}-{}x{}-{:x}.raw'.format(
+            name, size[0], size[1], int(mtime(source) or 0)))
+
+    def background(self, source, size, pygame=pygame):
+        '''The composed background, from the cache if it is there.'''
+        path = self.path(source, size)
+        try:
+            with open(path, 'rb') as raw_file:
+                return pygame.image.frombytes(raw_file.read(), tuple(size),
+                                              PIXEL_FORMAT)
+        except (IOError, ValueError):
+            pass
+        background = compose_background(pygame.image.load(source), size,
+                                         pygame)
+        try:
+            if not os.path.isdir(self.directory):
+                os.makedirs(self.directory)
+            # Written aside and renamed, a power cut never leaves half a file
+            with open(path + '.tmp', 'wb') as raw_file:
+                raw_file.write(pygame.image.tobytes(background,
+                                                    PIXEL_FORMAT))
+            os.rename(path + '.tmp', path)
+        except (IOError, OSError):
+            logger.warning('Could not cache the background in %s',
+                           self.directory)
+        return background
+
+
+def build(config, size, path=DEFAULT_PATH, config_path=None,
+          pygame=pygame):
+    '''Build the bundle for a screen size from the configuration.'''
+    if not os.path.isdir(path):
+        os.makedirs(path)
+    pygame.font.init()
+    background = compose_background(
+        pygame.image.load(config['background']), size, pygame)
+    with open(os.path.join(path, BACKGROUND), 'wb') as raw_file:
+        raw_file.write(pygame.image.tobytes(background, PIXEL_FORMAT))
+    manifest = {
+        'size': list(size),
+        'score_font': resolve_font(config.get('score_font'), TEXT_FONT,
+                                   pygame),
+        'text_font': resolve_font(None, TEXT_FONT, pygame),
+        'background': BACKGROUND,
+        # The bundle is stale once the background is changed
+        'background_mtime': mtime(config['background']),
+        'config': CONFIG,
+        'config_mtime': mtime(config_path),
+    }
+    try:
+        data = marshal.dumps(config)
+    except ValueError:
+        # Not plain data, the configuration is parsed on every start
+        logger.warning('Could not bundle the configuration')
+        manifest['config_mtime'] = None
+    else:
+        with open(os.path.join(path, CONFIG), 'wb') as config_file:
+            config_file.write(data)
+    with open(os.path.join(path, MANIFEST), 'w') as manifest_file:
+        json.dump(manifest, manifest_file, indent=2, sort_keys=True)
+    return Bundle(path, manifest)
+
+
+def load(path):
+    '''The Bundle at path, None if there is none.'''
+    manifest = bundle.load_manifest(path)
+    if manifest is None:
+        return None
+    return Bundle(path, manifest)
+
+
+class Bundle(object):
+    '''A loaded asset bundle.'''
+
+    def __init__(self, path, manifest):
+        self.path = path
+        self.manifest = manifest
+        self.size = tuple(manifest['size'])
+
+    def get_config(self, config_path):
+        '''The bundled configuration if config_path has not changed since.'''
+        return bundle.get_config(self.path, self.manifest, config_path)
+
+    def font(self, name, size, pygame=pygame):
+        return pygame.font.Font(self.manifest[name], size)
+
+    def background(self, size, pattern_path, pygame=pygame):
+        '''The background surface, None if it was built for another size
+        or background image.'''
+        if (tuple(size) != self.size or
+                mtime(pattern_path) != self.manifest['background_mtime']):
+            logger.warning('Asset bundle %s is stale, rebuild it', self.path)
+            return None
+        with open(os.path.join(self.path, self.manifest['background']),
+                  'rb') as raw_file:
+            data = raw_file.read()
+        return pygame.image.frombytes(data, self.size, PIXEL_FORMAT)
+
+
+def main():
+    import argparse
+
+    import yaml
+
+    parser = argparse.ArgumentParser(description='Build the asset bundle.')
+    parser.add_argument('path', nargs='?', default=DEFAULT_PATH)
+    parser.add_argument('--config', default='config.yaml')
+    parser.add_argument('--size', default=None,
+                        help='WIDTHxHEIGHT, the window size by default')
+    args = parser.parse_args()
+    with open(args.config) as config_file:
+        config = yaml.safe_load(config_file.read())
+    if args.size:
+        size = tuple(int(value) for value in args.size.split('x'))
+    else:
+        size = tuple(config.get('window_size', REFERENCE_SIZE))
+    build(config, size, args.path, args.config)
+    print('Built {} for {}x{}'.format(args.path, *size))
+    return 0
@@ -0,0 +1,129 @@
+'''
+Game board geometry and pre-rendered board sprites.
+'''
+from math import radians
+
+import pygame
+
+# The board layout, in the coordinates of a reference board size. Targets
+# are [x, y, width, height] rects, arcs are [rect, start, stop] with the
+# angles in degrees. The board is scaled to fill the right half of the
+# screen, so this can be overridden with the 'board' configuration.
+DEFAULT_LAYOUT = {
+    'size': [720, 900],
+    'targets': {1: [310, 725, 100, 100],
+                2: [310, 600, 100, 100],
+                3: [310, 475, 100, 100],
+                4: [310, 300, 100, 100],
+                5: [310, 125, 100, 100],
+                6: [5, 5, 100, 100],
+                7: [615, 5, 100, 100]},
+    'arcs': [[[160, 300, 400, 400], 0, 378],
+             [[0, 105, 720, 720], 180, 360]],
+}
+
+LINE_WIDTH = 3
+
+
+class BoardLayout(object):
+    '''Board geometry resolved once for a screen size.'''
+
+    def __init__(self, screen_size, layout=None, pygame=pygame):
+        layout = layout or DEFAULT_LAYOUT
+        self.size = (screen_size[0] // 2, screen_size[1])
+        self.position = (screen_size[0] - self.size[0], 0)
+        reference = layout.get('size', DEFAULT_LAYOUT['size'])
+        xscale = float(self.size[0]) / reference[0]
+        yscale = float(self.size[1]) / reference[1]
+
+        def scale(rect):
+            return pygame.Rect(int(round(rect[0] * xscale)),
+                               int(round(rect[1] * yscale)),
+                               int(round(rect[2] * xscale)),
+                               int(round(rect[3] * yscale)))
+
+        targets = layout.get('targets', DEFAULT_LAYOUT['targets'])
+        self.targets = dict((int(target), scale(rect))
+                            for target, rect in targets.items())
+        self.arcs = [(scale(rect), radians(start), radians(stop))
+                     for rect, start, stop in
+                     layout.get('arcs', DEFAULT_LAYOUT['arcs'])]
+
+
+class BoardSprites(object):
+    '''The unlit board plus every target's lit animation frames.
+
+    Everything is rendered up front so that highlighting a target during a
+    game is a single small blit with no allocation.
+    '''
+    FLASH_COLOR = (255, 255, 255)
+    FRAMES = 6
+
+    def __init__(self, layout, board_color, target_color, pygame=pygame):
+        self.layout = layout
+        self.board = pygame.Surface(layout.size)
+        pygame.draw.rect(self.board, board_color,
+                         [0, 0, layout.size[0], layout.size[1]], LINE_WIDTH)
+        for rect in layout.targets.values():
+            pygame.draw.ellipse(self.board, board_color, rect, LINE_WIDTH)
+        for rect, start, stop in layout.arcs:
+            pygame.draw.arc(self.board, board_color, rect, start, stop,
+                            LINE_WIDTH)
+
+        # Each highlight flashes and settles on the target color
+        colors = [self.blend(self.FLASH_COLOR, target_color,
+                             float(frame) / (self.FRAMES - 1))
+                  for frame in range(self.FRAMES)]
+        self.lit = {}
+        for target, rect in layout.targets.items():
+            frames = []
+            for color in colors:
+                sprite = self.board.subsurface(rect).copy()
+                pygame.draw.ellipse(sprite, color,
+                                    [0, 0, rect.width, rect.height],
+                                    LINE_WIDTH)
+                frames.append(sprite)
+            self.lit[target] = frames
+
+    @staticmethod
+    def blend(start, end, fraction):
+        return tuple(int(round(a + (b - a) * fraction))
+                     for a, b in zip(start, end))
+
+    def position(self, target):
+        '''Screen position of a target's sprite.'''
+        rect = self.layout.targets[target]
+        return (self.layout.position[0] + rect.x,
+                self.layout.position[1] + rect.y)
+
+
+class Highlight(object):
+    '''Steps a target highlight through its pre-rendered frames.'''
+
+    def __init__(self, sprites):
+        self.sprites = sprites
+        self.target = None
+        self.frame = 0
+
+    def start(self, target):
+        '''Highlight a target, or clear the highlight for None.'''
+        if target not in self.sprites.lit:
+            target = None
+        self.target = target
+        self.frame = 0
+
+    @property
+    def animating(self):
+        return (self.target is not None and
+                self.frame < self.sprites.FRAMES - 1)
+
+    def draw(self, compositor):
+        '''Draw the current frame and advance, returns True if animating.'''
+        if self.target is None:
+            return False
+        compositor.blit(self.sprites.lit[self.target][self.frame],
+                        self.sprites.position(self.target))
+        if self.frame < self.sprites.FRAMES - 1:
+            self.frame += 1
+            return True
+        return False
@@ -0,0 +1,53 @@
+'''
+Dirty rectangle compositor for the display.
+'''
+import pygame
+
+
+class Compositor(object):
+    '''Collects the regions changed in a frame and pushes them at once.
+
+    Everything drawn through the compositor is remembered so that the next
+    frame can restore just those regions from the cached background,
+    instead of clearing and flipping the whole screen.
+    '''
+
+    def __init__(self, screen, background, pygame=pygame):
+        '''Initialize the compositor with a full screen background.'''
+        self.screen = screen
+        self.pygame = pygame
+        self.background = background
+        # Regions drawn in the current frame, and in the frame before it
+        self.dirty = []
+        self.drawn = []
+        self.restored = []
+        self.restore_all()
+
+    def restore_all(self):
+        '''Redraw the whole background, e.g. after another screen.'''
+        self.screen.blit(self.background, (0, 0))
+        self.drawn = []
+        self.restored = [self.screen.get_rect()]
+
+    def clear(self):
+        '''Start a frame by restoring the regions the last frame drew.'''
+        for rect in self.drawn:
+            self.screen.blit(self.background, rect, rect)
+        self.restored.extend(self.drawn)
+        self.drawn = []
+
+    def blit(self, surface, position):
+        '''Draw a surface, returning the screen region it covered.'''
+        rect = self.screen.blit(surface, position)
+        self.dirty.append(rect)
+        return rect
+
+    def present(self):
+        '''Push the frame's changed regions to the display in one update.'''
+        rects = self.restored + self.dirty
+        if rects:
+            self.pygame.display.update(rects)
+        self.drawn.extend(self.dirty)
+        self.dirty = []
+        self.restored = []
+        return rects
@@ -0,0 +1,95 @@
+'''
+Pre-rendered outlined text for the display.
+'''
+from collections import OrderedDict
+
+import pygame
+
+OUTLINE_COLOR = (0, 0, 0)
+OUTLINE_OFFSETS = [(-2, -2), (-2, 2), (2, -2), (2, 2)]
+OUTLINE_WIDTH = 2
+
+
+def render_outlined(font, content, color, pygame=pygame):
+    '''Render text with its black outline baked into one surface.
+
+    The outline is the text drawn in black at each of the outline offsets,
+    the way the score has always been drawn, but done once.
+    '''
+    text = font.render(content, 1, color)
+    outline = font.render(content, 1, OUTLINE_COLOR)
+    width, height = text.get_size()
+    pad = 2 * OUTLINE_WIDTH
+    surface = pygame.Surface((width + pad, height + pad), pygame.SRCALPHA)
+    for xoffset, yoffset in OUTLINE_OFFSETS:
+        surface.blit(outline, (OUTLINE_WIDTH + xoffset,
+                               OUTLINE_WIDTH + yoffset))
+    surface.blit(text, (OUTLINE_WIDTH, OUTLINE_WIDTH))
+    return surface
+
+
+class GlyphAtlas(object):
+    '''Outlined glyphs rendered once, used to draw numbers of any length.'''
+    DIGITS = '0123456789'
+
+    def __init__(self, font, color, characters=DIGITS, pygame=pygame):
+        '''Render every character of the atlas up front.'''
+        self.glyphs = {}
+        self.advances = {}
+        for character in characters:
+            glyph = render_outlined(font, character, color, pygame)
+            self.glyphs[character] = glyph
+            # Neighbouring glyphs overlap by their outlines
+            self.advances[character] = (glyph.get_width() -
+                                        2 * OUTLINE_WIDTH)
+        self.height = max(glyph.get_height()
+                          for glyph in self.glyphs.values())
+
+    def __contains__(self, content):
+        '''True if every character of content is in the atlas.'''
+        return all(character in self.glyphs for character in content)
+
+    def width(self, content):
+        '''Width of the drawn content, outline included.'''
+        return (sum(self.advances[character] for character in content) +
+                2 * OUTLINE_WIDTH)
+
+    def draw(self, compositor, content, center):
+        '''Draw content centered on center, returning the covered rects.'''
+        x = center[0] - self.width(content) // 2
+        y = center[1] - self.height // 2
+        rects = []
+        for character in content:
+            rects.append(compositor.blit(self.glyphs[character], (x, y)))
+            x += self.advances[character]
+        return rects
+
+
+class TextCache(object):
+    '''A bounded least recently used cache of outlined text surfaces.'''
+
+    def __init__(self, capacity=32, pygame=pygame):
+        self.capacity = capacity
+        self.pygame = pygame
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self.surfaces)
+
+    def get(self, font, content, color):
+        '''Returns the outlined rendering of content, rendering on a miss.'''
+        key = (font, content, color)
+        try:
+            surface = self.surfaces[key]
+        except KeyError:
+            self.misses += 1
+            surface = render_outlined(font, content, color, self.pygame)
+            self.surfaces[key] = surface
+            if len(self.surfaces) > self.capacity:
+                self.surfaces.popitem(last=False)
+            return surface
+        self.hits += 1
+        self.surfaces.move_to_end(key)
+        return surface
@@ -0,0 +1,50 @@
+'''
+Screen positions and font sizes, resolved once for the screen size.
+
+The layout is given for a 1440x900 reference screen, as offsets from the
+screen center and font sizes in pixels. It is scaled uniformly to fit the
+actual screen, so a 720p screen and a 4K screen show the same picture.
+Any of DEFAULT_LAYOUT can be overridden with 'layout' in the
+configuration.
+'''
+
+REFERENCE_SIZE = (1440, 900)
+
+DEFAULT_LAYOUT = {
+    'score_font_size': 256,
+    'text_font_size': 128,
+    # Offsets of the centers of what is drawn from the screen center
+    'score': (0, 0),
+    'final_label': (0, -250),
+    'bonus': (0, 250),
+    'high_scores': (0, 0),
+}
+
+
+class Layout(object):
+    '''DEFAULT_LAYOUT resolved to pixels for one screen size.'''
+
+    def __init__(self, screen_size, layout=None):
+        spec = dict(DEFAULT_LAYOUT)
+        spec.update(layout or {})
+        width, height = screen_size
+        self.size = (width, height)
+        self.scale = min(float(width) / REFERENCE_SIZE[0],
+                         float(height) / REFERENCE_SIZE[1])
+        self.center = (width // 2, height // 2)
+        self.score_font_size = self.length(spec['score_font_size'])
+        self.text_font_size = self.length(spec['text_font_size'])
+        self.score = self.position(spec['score'])
+        self.final_label = self.position(spec['final_label'])
+        self.bonus = self.position(spec['bonus'])
+        self.high_scores = self.position(spec['high_scores'])
+
+    def length(self, value):
+        '''Scale a reference length in pixels, at least one pixel.'''
+        return max(1, int(round(value * self.scale)))
+
+    def position(self, offset):
+        '''Scale a reference offset from the center to screen pixels.'''
+        x, y = offset
+        return (self.center[0] + int(round(x * self.scale)),
+                self.center[1] + int(round(y * self.scale)))
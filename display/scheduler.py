@@ -0,0 +1,83 @@
+'''
+Fixed rate render scheduling for the display.
+'''
+import time
+
+NS_PER_SECOND = 1000000000
+DEFAULT_FPS = 30
+
+
+class RenderScheduler(object):
+    '''Renders at most once per frame, and only when something changed.
+
+    Callers mark the display dirty with request() as often as they like,
+    the event loop calls tick() after handling its input and every request
+    made since the last frame is merged into a single render. The render
+    callable returns True when it needs another frame, e.g. to finish an
+    animation.
+    '''
+
+    def __init__(self, render, fps=DEFAULT_FPS, clock=time.monotonic_ns):
+        self.render = render
+        self.clock = clock
+        self.period = NS_PER_SECOND // fps
+        self.dirty = False
+        self.dirty_since = 0
+        self.next_frame = 0
+        # Statistics
+        self.frames = 0
+        self.requests = 0
+        self.coalesced = 0
+        self.dropped = 0
+        self.frame_time_total = 0
+        self.frame_time_max = 0
+
+    def set_fps(self, fps):
+        '''Change the target frame rate.'''
+        self.period = NS_PER_SECOND // fps
+
+    def request(self):
+        '''Mark the display as needing a new frame.'''
+        self.requests += 1
+        if self.dirty:
+            self.coalesced += 1
+            return
+        self.dirty = True
+        self.dirty_since = self.clock()
+
+    def timeout(self, now):
+        '''Nanoseconds until the next frame is due, None if not dirty.'''
+        if not self.dirty:
+            return None
+        return max(0, self.next_frame - now)
+
+    def tick(self, now=None):
+        '''Render a frame if one is wanted and due, returns True if so.'''
+        if now is None:
+            now = self.clock()
+        if not self.dirty or now < self.next_frame:
+            return False
+        # Whole frame slots that went by while a frame was wanted, e.g.
+        # because the last frame or the input handling overran
+        self.dropped += (now - max(self.next_frame, self.dirty_since)) // \
+            self.period
+        self.dirty = bool(self.render())
+        frame_time = self.clock() - now
+        self.frames += 1
+        self.frame_time_total += frame_time
+        self.frame_time_max = max(self.frame_time_max, frame_time)
+        self.next_frame = now + self.period
+        self.dirty_since = self.next_frame
+        return True
+
+    def stats(self):
+        '''Returns the frame statistics, times in milliseconds.'''
+        mean = self.frame_time_total / self.frames if self.frames else 0
+        return {
+            'frames': self.frames,
+            'requests': self.requests,
+            'coalesced': self.coalesced,
+            'dropped': self.dropped,
+            'frame_time_mean_ms': mean / 1e6,
+            'frame_time_max_ms': self.frame_time_max / 1e6,
+        }
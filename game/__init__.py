@@ -2,11 +2,15 @@
 Provides the game play mechanics.
 '''
 import logging
+import time
+
+from game import flow, rules
+
 
 class Game(object):
     '''Scoring and mechanics for the standard skeeball game.'''
-    # Create a target scoring layout
-    # XXX: This should be configurable someday to support different game modes
+    # Create a target scoring layout, more games are defined with 'games'
+    # in the configuration, see game/rules.py
     MIDWAY = {0: 0,
               1: 50,
               2: 100,
@@ -16,14 +20,27 @@ class Game(object):
               6: 300,
               7: 300,
               }
+    GAMES = {'midway': {'targets': MIDWAY, 'balls': 9}}
+    DEFAULT_GAME = 'midway'
+
+    def __init__(self, config=None, clock=time.monotonic):
+        '''Initialize the game board.
 
-    def __init__(self):
-        '''Initialize the game board.'''
-        logging.basicConfig(format='%(asctime)s %(message)s')
+        The game played is config['game'], from the built in GAMES and
+        any config['games']. Every game's rules are compiled up front.
+        '''
         self.logger = logging.getLogger(__name__)
         self.logger.setLevel(logging.INFO)
         self.log(logging.INFO, 'Game setup begin.')
-        self.targets = self.MIDWAY
+        config = config or {}
+        definitions = dict(self.GAMES)
+        definitions.update(config.get('games', {}))
+        self.games = rules.compile_games(definitions)
+        self.clock = clock
+        self.flow = flow.BallFlow(config.get('flow'))
+        self.select(config.get('game', self.DEFAULT_GAME))
+        # A scores.DropLog to record every ball drop in, if any
+        self.drops = None
         self.start_game()
         self.log(logging.INFO, 'Game setup complete.')
 
@@ -31,6 +48,11 @@ class Game(object):
         '''Machine specific event logger.'''
         self.logger.log(level, msg)
 
+    def select(self, name):
+        '''Play the named game from the next start_game().'''
+        self.rules = self.games[name]
+        self.targets = self.rules.targets
+
     def get_target_value(self, target):
         '''Assigns a point total to each target and returns the value.'''
         try:
@@ -40,42 +62,80 @@ class Game(object):
         return value
 
     def drop_ball(self, target):
-        '''Process common ball drop actions.'''
-        self.log(logging.INFO, 'Process drop_ball target: {}'.format(target))
-        value = self.get_target_value(target)
-        self.score += value
-        if target == 0:
-            # This is the special target which catches all balls
+        '''Process common ball drop actions.
+
+        The points and the names of any bonuses scored are left in points
+        and bonus.
+        '''
+        compiled = self.rules
+        balls = self.flow
+        now = self.clock()
+        if target == rules.CATCH_ALL:
+            new_ball = balls.caught(now)
+        else:
+            new_ball = True
+            balls.scored(now)
+        if new_ball:
             self.remaining_balls -= 1
-            self.pending_drops -= 1
-            if self.pending_drops < 0:
-                self.pending_drops = 0
+        if 0 <= target < compiled.miss:
+            ball = min(max(balls.rolled - 1, 0), len(compiled.points) - 1)
+            value, bonus = compiled.points[ball][target]
+            if target != rules.CATCH_ALL:
+                symbol = target
+            elif new_ball:
+                # A ball that scored nothing
+                symbol = compiled.miss
+            else:
+                symbol = None
+            if symbol is not None:
+                index = self.streak * compiled.symbols + symbol
+                award, names = compiled.awards[index]
+                self.streak = compiled.transitions[index]
+                if names:
+                    value += award
+                    bonus += names
         else:
-            self.pending_drops += 1
-        self.log(logging.INFO, 'Score is now {} ({})'.format(value, self.score))
-        self.log(logging.INFO, 'Remaining balls: {}'.format(self.remaining_balls))
-        self.log(logging.INFO, 'Pending drops: {}'.format(self.pending_drops))
+            value, bonus = rules.NO_AWARD
+        self.points = value
+        self.bonus = bonus
+        self.score += value
+        if self.drops is not None:
+            self.drops.append(target, value)
+        if self.logger.isEnabledFor(logging.INFO):
+            self.log(logging.INFO,
+                     'Process drop_ball target: {}, Score is now {} ({}), '
+                     'Remaining balls: {}, In transit: {}'.format(
+                         target, value, self.score, self.remaining_balls,
+                         len(balls.in_transit)))
 
     def check_game_over(self):
         '''Determine if the game is over.
         
-        This will 'guess' that the game is over before the last ball passes
-        the catch-all target. This is done by keeping track of the balls that
-        it knows of passed the catch-all and those that have hit a scoring
-        target. If these add up to the total number of balls, the game is over.
-
-        This currently requires the balls to 'drain' into the next play area
-        before the next game starts.
+        A ball is counted as soon as it scores, or reaches the catch-all
+        without scoring, so the game ends without waiting for the last ball
+        to drain. A game of balls that has stalled, see flow.BallFlow, is
+        over as well, so a missed edge never holds up the lane.
         '''
-        if self.remaining_balls - self.pending_drops == 0:
+        now = self.clock()
+        if (self.rules.balls and
+                (self.remaining_balls <= 0 or self.flow.stalled(now)) or
+                self.rules.seconds and
+                now - self.started >= self.rules.seconds):
             self.game_over = True
             self.log(logging.INFO, 'Game is over.')
             return True
         return False
 
     def start_game(self):
+        if self.drops is not None:
+            self.drops.start_game()
         self.score = 0
-        self.remaining_balls = 9
-        self.pending_drops = 0
+        self.remaining_balls = self.rules.balls
+        self.points = 0
+        self.bonus = ()
+        # The state of the rules' streak state machine
+        self.streak = 0
+        self.started = self.clock()
+        self.flow.start(self.started)
         self.game_over = False
         self.log(logging.INFO, 'Game is ready to start.')
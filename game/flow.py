@@ -0,0 +1,167 @@
+'''
+Tracks the balls of a game from the targets to the catch-all.
+
+Every ball ends at the catch-all target, balls that score pass a scoring
+target first. A ball is counted as rolled when it scores, or when it
+reaches the catch-all without having scored, so the last ball is counted
+as soon as there is evidence of it.
+
+Counting on edges alone goes wrong when a catch-all edge is missed: a later
+ball that scored nothing is taken for the ball still on its way, is never
+counted, and the game never ends. Here the time each ball takes from its
+target to the catch-all is learned, and used to tell the two apart:
+
+  * a catch-all well before any transit seen is a ball that scored nothing
+  * a ball not at the catch-all long after it should be has been lost
+
+The gaps between balls are learned too, a game with no sign of a ball for
+much longer than players take between balls has stalled and is over. Both
+are learned as the range of recent samples, with a margin either side.
+
+Times are in seconds on the game's clock. The estimates carry over from
+game to game, so they are learned for the cabinet.
+'''
+import collections
+
+# Durations are learned from the most recent samples
+WINDOW = 64
+# Samples needed before the learned durations are trusted
+MIN_SAMPLES = 8
+# A transit shorter than LOW_MARGIN times the shortest seen is taken for a
+# ball that scored nothing. A ball not at the catch-all HIGH_MARGIN times
+# the longest transit seen after it scored has been lost, as has a game
+# with no ball for HIGH_MARGIN times the longest gap.
+LOW_MARGIN = 0.5
+HIGH_MARGIN = 1.5
+
+DEFAULT_MAX_TRANSIT_MS = 5000
+DEFAULT_MIN_STALL_MS = 20000
+DEFAULT_MAX_STALL_MS = 120000
+
+
+class Durations(object):
+    '''The range of the most recent samples of a duration.
+
+    low and high are the range widened by the margins, both None until
+    there are enough samples to trust.
+    '''
+    __slots__ = ('samples', 'shortest', 'longest', 'low', 'high')
+
+    def __init__(self):
+        self.samples = collections.deque(maxlen=WINDOW)
+        self.shortest = 0.0
+        self.longest = 0.0
+        self.low = None
+        self.high = None
+
+    def __len__(self):
+        return len(self.samples)
+
+    def add(self, value):
+        samples = self.samples
+        evicted = samples[0] if len(samples) == WINDOW else None
+        samples.append(value)
+        if len(samples) == 1 or evicted in (self.shortest, self.longest):
+            self.shortest = min(samples)
+            self.longest = max(samples)
+        elif value < self.shortest:
+            self.shortest = value
+        elif value > self.longest:
+            self.longest = value
+        if len(samples) >= MIN_SAMPLES:
+            self.low = self.shortest * LOW_MARGIN
+            self.high = self.longest * HIGH_MARGIN
+
+    @property
+    def mean(self):
+        if not self.samples:
+            return 0.0
+        return sum(self.samples) / len(self.samples)
+
+
+class BallFlow(object):
+    '''The balls of the current game, and what is known about their flow.'''
+
+    def __init__(self, settings=None):
+        '''Settings are the 'flow' section of the configuration, in ms.'''
+        settings = settings or {}
+        self.max_transit = settings.get(
+            'max_transit_ms', DEFAULT_MAX_TRANSIT_MS) / 1000.0
+        self.min_stall = settings.get(
+            'min_stall_ms', DEFAULT_MIN_STALL_MS) / 1000.0
+        self.max_stall = settings.get(
+            'max_stall_ms', DEFAULT_MAX_STALL_MS) / 1000.0
+        self.transit = Durations()
+        self.gap = Durations()
+        # How long a ball may take to reach the catch-all
+        self.transit_limit = self.max_transit
+        # Balls lost between a target and the catch-all, over all games
+        self.lost = 0
+        self.start(0)
+
+    def start(self, now):
+        '''Start tracking a new game.'''
+        self.rolled = 0
+        # When each ball still on its way to the catch-all scored
+        self.in_transit = collections.deque()
+        self.last_ball = None
+        self.last_activity = now
+
+    def ball(self, now):
+        '''Count a ball as rolled.'''
+        if self.last_ball is not None:
+            self.gap.add(now - self.last_ball)
+        self.last_ball = now
+        self.rolled += 1
+
+    def scored(self, now):
+        '''A ball passed a scoring target.'''
+        self.last_activity = now
+        self.expire(now)
+        self.ball(now)
+        self.in_transit.append(now)
+
+    def caught(self, now):
+        '''A ball reached the catch-all, returns True if it is a new ball.
+
+        A ball that scored nothing is counted here as it is rolled.
+        '''
+        self.last_activity = now
+        self.expire(now)
+        in_transit = self.in_transit
+        transit = self.transit
+        if in_transit and (transit.low is None or
+                           now - in_transit[0] >= transit.low):
+            transit.add(now - in_transit.popleft())
+            if transit.high is not None:
+                self.transit_limit = min(self.max_transit, transit.high)
+            return False
+        self.ball(now)
+        return True
+
+    def expire(self, now):
+        '''Forget the balls that should have reached the catch-all.'''
+        in_transit = self.in_transit
+        while in_transit and now - in_transit[0] > self.transit_limit:
+            in_transit.popleft()
+            self.lost += 1
+
+    def stall_timeout(self):
+        '''Seconds without a ball after which the game has stalled.'''
+        if self.gap.high is None:
+            return self.max_stall
+        return max(self.min_stall, min(self.max_stall, self.gap.high))
+
+    def stalled(self, now):
+        return now - self.last_activity >= self.stall_timeout()
+
+    def stats(self):
+        '''The learned model, in milliseconds.'''
+        return {
+            'transit_ms': round(self.transit.mean * 1000),
+            'transit_range_ms': (round(self.transit.shortest * 1000),
+                                 round(self.transit.longest * 1000)),
+            'gap_ms': round(self.gap.mean * 1000),
+            'stall_ms': round(self.stall_timeout() * 1000),
+            'lost': self.lost,
+        }
@@ -0,0 +1,124 @@
+'''
+Scoring rules, compiled into lookup tables.
+
+A game definition gives the points of each target, the number of balls,
+an optional time limit in seconds and a list of bonus rules:
+
+    balls: 9
+    seconds: 0
+    targets: {0: 0, 1: 50, 2: 100, ...}
+    rules:
+      - name: Double Ball
+        multiplier: 2
+        balls: [9]
+      - name: Hot Streak
+        streak: 3
+        targets: [6, 7]
+        bonus: 500
+
+A multiplier multiplies the points scored by the listed balls, numbered
+from 1, on the listed targets, all of them by default. The points are
+rounded to whole points, e.g. for a multiplier of 1.5. A streak awards its
+bonus once count balls in a row have scored in one of its targets. Any
+other scoring target, or a ball that scores nothing, breaks the streak.
+
+Multipliers are folded into a table of the points for each ball and
+target. The streaks are combined into a single state machine with a
+transition and award for each state and target. Scoring a ball costs the
+same two lookups however many rules are active.
+'''
+import collections
+
+CATCH_ALL = 0
+NO_AWARD = (0, ())
+
+Rule = collections.namedtuple('Rule', 'name targets count bonus')
+
+
+class Rules(object):
+    '''The compiled scoring rules of a game definition.'''
+    __slots__ = ('name', 'targets', 'balls', 'seconds', 'points', 'symbols',
+                 'miss', 'transitions', 'awards')
+
+    def __init__(self, name, definition):
+        self.name = name
+        self.targets = dict((int(target), value) for target, value
+                            in definition['targets'].items())
+        self.balls = definition.get('balls', 9)
+        self.seconds = definition.get('seconds', 0)
+        rules = definition.get('rules', [])
+        self.points = self.compile_points(
+            [rule for rule in rules if 'multiplier' in rule])
+        # One symbol per target, and a last one for a ball that scored
+        # nothing
+        self.symbols = len(self.points[0]) + 1
+        self.miss = self.symbols - 1
+        self.compile_streaks([
+            Rule(rule.get('name', 'Streak'),
+                 frozenset(rule.get('targets', [
+                     target for target in self.targets
+                     if target != CATCH_ALL])),
+                 rule['streak'], rule.get('bonus', 0))
+            for rule in rules if 'streak' in rule])
+
+    def compile_points(self, multipliers):
+        '''A (points, bonus names) table indexed by [ball - 1][target].'''
+        width = max(self.targets) + 1
+        table = []
+        for ball in range(1, max(self.balls, 1) + 1):
+            row = []
+            for target in range(width):
+                points = self.targets.get(target, 0)
+                names = ()
+                for rule in multipliers:
+                    if (ball in rule.get('balls', [ball]) and
+                            target in rule.get('targets', [target]) and
+                            points):
+                        # Scores are whole points, e.g. in the drop log
+                        points = int(round(points * rule['multiplier']))
+                        names += (rule.get('name', 'Multiplier'),)
+                row.append((points, names))
+            table.append(tuple(row))
+        return tuple(table)
+
+    def compile_streaks(self, streaks):
+        '''Build the streak state machine.
+
+        A state is the count of each streak so far, the reachable states
+        are numbered from the start state, 0.
+        '''
+        start = (0,) * len(streaks)
+        numbers = {start: 0}
+        pending = [start]
+        transitions = []
+        awards = []
+        while pending:
+            counts = pending.pop(0)
+            for symbol in range(self.symbols):
+                after = []
+                bonus = 0
+                names = ()
+                for streak, count in zip(streaks, counts):
+                    if symbol != self.miss and symbol in streak.targets:
+                        count += 1
+                        if count == streak.count:
+                            bonus += streak.bonus
+                            names += (streak.name,)
+                            count = 0
+                    else:
+                        count = 0
+                    after.append(count)
+                after = tuple(after)
+                if after not in numbers:
+                    numbers[after] = len(numbers)
+                    pending.append(after)
+                transitions.append(numbers[after])
+                awards.append((bonus, names) if names else NO_AWARD)
+        self.transitions = tuple(transitions)
+        self.awards = tuple(awards)
+
+
+def compile_games(definitions):
+    '''Compile a dict of game definitions into a dict of Rules.'''
+    return dict((name, Rules(name, definition))
+                for name, definition in definitions.items())
@@ -0,0 +1,164 @@
+'''
+Run a row of lanes from one host, each lane in its own worker process.
+
+Each lane is a complete Cortex with its own bank of pins, game and window,
+so a slow frame on one lane never holds up the input of another. The lanes
+are listed in the configuration, anything given for a lane overrides the
+shared settings for that lane only:
+
+    lanes:
+      - pins: {base: 20, start: 19, servo: 12}
+        viewport: [0, 0, 960, 1080]
+      - pins: {base: 4, start: 3, servo: 13}
+        viewport: [960, 0, 960, 1080]
+
+The files a lane writes, its scores, drops, event log, log file and metrics
+snapshot, get the lane number added to their names unless the lane names
+its own, and a lane's metrics are served on the metrics port plus its
+number. Lanes are pinned to the CPUs in turn where the platform allows
+it. A lane that crashes is started again, a lane that quits stays
+stopped.
+'''
+import logging
+import multiprocessing
+import multiprocessing.connection
+import os
+
+import logs
+
+# Settings holding the path of a file, or directory, each lane writes
+LANE_FILES = ('scores', 'drops', 'record')
+# Times a crashed lane is started again before it is left stopped
+MAX_RESTARTS = 5
+
+
+def lane_path(path, number):
+    '''Add the lane number to a path, before any extension.'''
+    root, extension = os.path.splitext(path)
+    return '{}-{}{}'.format(root, number, extension)
+
+
+def get_cpus():
+    '''The CPUs this process may run on, None if it cannot tell.'''
+    if not hasattr(os, 'sched_getaffinity'):
+        return None
+    return sorted(os.sched_getaffinity(0))
+
+
+def lane_config(config, number):
+    '''The configuration of one lane.'''
+    overrides = config['lanes'][number] or {}
+    lane = dict(config)
+    del lane['lanes']
+    for key in LANE_FILES:
+        if lane.get(key) and key not in overrides:
+            lane[key] = lane_path(lane[key], number)
+    if 'logging' not in overrides:
+        settings = dict(lane.get('logging', {}))
+        settings['path'] = lane_path(
+            settings.get('path', logs.DEFAULT_PATH), number)
+        lane['logging'] = settings
+    if lane.get('metrics') and 'metrics' not in overrides:
+        # Each lane serves on the next port and snapshots to its own file
+        settings = dict(lane['metrics'])
+        if settings.get('port'):
+            settings['port'] += number
+        if settings.get('snapshot'):
+            settings['snapshot'] = lane_path(settings['snapshot'], number)
+        lane['metrics'] = settings
+    cpus = get_cpus()
+    if cpus:
+        lane['cpu'] = cpus[number % len(cpus)]
+    lane.update(overrides)
+    lane['lane'] = number
+    return lane
+
+
+def run_lane(config):
+    '''Run one lane until it quits, in a worker process.'''
+    if config.get('cpu') is not None and hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, [config['cpu']])
+    import cortex
+    listener = logs.configure(config)
+    try:
+        cortex.Cortex(config).event_loop()
+    finally:
+        listener.stop()
+
+
+class LaneController(object):
+    '''Starts a worker process for every lane and keeps them running.'''
+
+    def __init__(self, config, target=run_lane):
+        '''The target is called with each lane's configuration.'''
+        self.logger = logging.getLogger(__name__)
+        self.configs = [lane_config(config, number)
+                        for number in range(len(config['lanes']))]
+        self.target = target
+        # Each lane starts from a fresh interpreter, nothing of SDL or the
+        # GPIO library is inherited from this process
+        self.context = multiprocessing.get_context('spawn')
+        self.processes = [None] * len(self.configs)
+        self.restarts = [0] * len(self.configs)
+
+    def __len__(self):
+        return len(self.configs)
+
+    def start_lane(self, number):
+        process = self.context.Process(
+            target=self.target, args=(self.configs[number],),
+            name='lane-{}'.format(number))
+        process.start()
+        self.processes[number] = process
+        self.logger.info('Lane %d started, pid %d', number, process.pid)
+
+    def start(self):
+        for number in range(len(self.configs)):
+            self.start_lane(number)
+
+    def check(self, timeout=None):
+        '''Wait for a lane to stop, starting it again if it crashed.
+
+        Returns the number of lanes still running.
+        '''
+        running = dict((process.sentinel, number)
+                       for number, process in enumerate(self.processes)
+                       if process is not None)
+        if not running:
+            return 0
+        for sentinel in multiprocessing.connection.wait(list(running),
+                                                        timeout):
+            number = running[sentinel]
+            process = self.processes[number]
+            process.join()
+            self.processes[number] = None
+            if process.exitcode == 0:
+                self.logger.info('Lane %d stopped', number)
+            elif self.restarts[number] < MAX_RESTARTS:
+                self.restarts[number] += 1
+                self.logger.warning('Lane %d exited with %d, restarting',
+                                    number, process.exitcode)
+                self.start_lane(number)
+            else:
+                self.logger.error('Lane %d exited with %d, giving up',
+                                  number, process.exitcode)
+        return sum(process is not None for process in self.processes)
+
+    def run(self):
+        '''Run every lane until they have all stopped.'''
+        self.start()
+        try:
+            while self.check():
+                pass
+        finally:
+            self.stop()
+
+    def stop(self):
+        '''Stop every lane still running.'''
+        for process in self.processes:
+            if process is not None and process.is_alive():
+                process.terminate()
+        for number, process in enumerate(self.processes):
+            if process is not None:
+                process.join()
+                self.processes[number] = None
@@ -0,0 +1,144 @@
+'''
+Non-blocking, structured logging.
+
+Records are queued by the thread that logs them and written out by a
+background listener thread, so a slow SD card never blocks the event loop.
+The log file is size capped: it is rotated into a single backup, giving a
+ring buffer of at most twice max_bytes on disk.
+'''
+import logging
+import logging.handlers
+import os
+import queue
+import time
+
+DEFAULT_PATH = 'skeeball.log'
+DEFAULT_MAX_BYTES = 1024 * 1024
+DEFAULT_QUEUE_SIZE = 10000
+
+
+def event(logger, level, name, **fields):
+    '''Log a structured event record, e.g. event(logger, INFO, 'hit', x=1).
+
+    Nothing is formatted unless the level is enabled, and then only by the
+    listener thread.
+    '''
+    if logger.isEnabledFor(level):
+        logger.log(level, name, extra={'fields': fields})
+
+
+def process_start_ns():
+    '''The monotonic time the process started, or now if it is unknown.
+
+    Linux gives the start time in clock ticks since boot, and the
+    monotonic clock counts from boot too unless the system has suspended.
+    '''
+    now = time.monotonic_ns()
+    try:
+        with open('/proc/self/stat') as stat_file:
+            stat = stat_file.read()
+        # The command name may hold spaces, the fields follow its ')'
+        ticks = int(stat[stat.rindex(')') + 2:].split()[19])
+        start = ticks * 1000000000 // os.sysconf('SC_CLK_TCK')
+        boot = time.clock_gettime_ns(time.CLOCK_BOOTTIME)
+    except (IOError, ValueError, AttributeError):
+        return now
+    return now - (boot - start)
+
+
+class Timeline(object):
+    '''Times of named milestones since the process started.'''
+
+    def __init__(self, start=None):
+        self.start = process_start_ns() if start is None else start
+        self.marks = []
+
+    def mark(self, name, now=None):
+        '''Record the first time name is reached.'''
+        if any(mark == name for mark, _ in self.marks):
+            return
+        if now is None:
+            now = time.monotonic_ns()
+        self.marks.append((name, now - self.start))
+
+    def report(self):
+        '''The milestones in milliseconds since the process started.'''
+        return dict((name, elapsed / 1e6) for name, elapsed in self.marks)
+
+
+# The milestones of this process' startup
+startup = Timeline()
+
+
+def mark(name):
+    '''Mark a startup milestone, e.g. mark('first_frame').'''
+    startup.mark(name)
+
+
+class EventFormatter(logging.Formatter):
+    '''Formats records as compact 'time level logger message k=v' lines.'''
+
+    def format(self, record):
+        line = '{:.3f} {} {} {}'.format(record.created, record.levelname[0],
+                                        record.name, record.getMessage())
+        fields = getattr(record, 'fields', None)
+        if fields:
+            line += ' ' + ' '.join('{}={}'.format(key, value)
+                                   for key, value in fields.items())
+        if record.exc_info:
+            line += '\n' + self.formatException(record.exc_info)
+        return line
+
+
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    '''A queue handler that never blocks, it counts records it drops.'''
+
+    def __init__(self, log_queue):
+        logging.handlers.QueueHandler.__init__(self, log_queue)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # The listener runs in this process, so the record can be queued
+        # as is and formatted there instead of here
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def configure(config):
+    '''Route all logging through a background writer.
+
+    Settings come from the 'logging' section of the configuration:
+
+        logging:
+          path: skeeball.log
+          max_bytes: 1048576
+          console: WARNING
+
+    Returns the started QueueListener, stop() it to flush on exit.
+    '''
+    settings = config.get('logging', {})
+    file_handler = logging.handlers.RotatingFileHandler(
+        settings.get('path', DEFAULT_PATH),
+        maxBytes=settings.get('max_bytes', DEFAULT_MAX_BYTES),
+        backupCount=1)
+    file_handler.setFormatter(EventFormatter())
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(settings.get('console', 'WARNING'))
+    console_handler.setFormatter(EventFormatter())
+
+    log_queue = queue.Queue(settings.get('queue_size', DEFAULT_QUEUE_SIZE))
+    handler = DroppingQueueHandler(log_queue)
+    listener = logging.handlers.QueueListener(
+        log_queue, file_handler, console_handler, respect_handler_level=True)
+
+    root = logging.getLogger()
+    for old_handler in root.handlers[:]:
+        root.removeHandler(old_handler)
+    root.addHandler(handler)
+    listener.start()
+    return listener
@@ -1,9 +1,15 @@
 '''Receive GPIO machine inputs.'''
 import logging
+import multiprocessing
+import queue
 import time
+from array import array
 
 import pygame
 
+from machine import events, ring, scanner
+from machine.servo import ServoController
+
 try:
     import RPi.GPIO as GPIO
 except RuntimeError:
@@ -11,7 +17,25 @@ except RuntimeError:
     import tests.fake_gpio
     GPIO = tests.fake_gpio.FakeGPIO()
 
-DEFAULT_BOUNCETIME = 2000
+NS_PER_MS = 1000000
+NS_PER_US = 1000
+
+# Debounce defaults, in microseconds. A target fires as soon as it goes low
+# and must then stay clear for the re-arm time before it can fire again.
+DEFAULT_MIN_PULSE_US = 0
+DEFAULT_REARM_US = 20000
+START_REARM_US = 500000
+
+# Input modes: poll every pin on a timer, let the GPIO library report
+# edges from its callback thread, or scan in a process of its own, see
+# machine.scanner.
+POLL_MODE = 'poll'
+EDGE_MODE = 'edge'
+PROCESS_MODE = 'process'
+
+# Servo angles, in degrees, that release and hold the balls
+RELEASE_ANGLE = 90
+HOLD_ANGLE = 0
 
 
 class Machine(object):
@@ -20,10 +44,38 @@ class Machine(object):
     SERVO_PIN = 12
     START_PIN = 19
 
-    def __init__(self, start_event, gpio=GPIO):
-        '''Initialize the machine.'''
+    def __init__(self, start_event, gpio=GPIO, input_mode=POLL_MODE,
+                 debounce=None, wake_event=None, timers=None, servo=None,
+                 pins=None, input_process=None, event_queue=None):
+        '''Initialize the machine.
+
+        The debounce settings come from the 'debounce' section of the
+        configuration, see get_debounce(). In edge mode the wake_event, if
+        given, is posted for every edge so a sleeping event loop wakes up
+        to drain them. With timers, a timers.Timers on the same clock,
+        pulses are confirmed when they are due rather than on the next
+        poll. The servo settings come from the 'servo' section of the
+        configuration, see machine.servo. The pins come from 'pins', as
+        {'base': 20, 'start': 19, 'servo': 12}, so that one host can drive
+        several lanes, each on its own bank of pins. In process mode the
+        input_process settings configure the input process and its ring,
+        see start(). Input events are put on event_queue, a
+        machine.events.EventQueue, if given, rather than posted to pygame.
+        '''
         self.gpio = gpio
-        logging.basicConfig(format='%(asctime)s %(message)s')
+        self.input_mode = input_mode
+        self.wake_event = wake_event
+        # Called from the GPIO thread for every edge, if set, for event
+        # loops that do not wait on pygame
+        self.wake = None
+        self.timers = timers
+        self.debounce = debounce or {}
+        self.event_queue = event_queue
+        pins = pins or {}
+        self.base_pin = pins.get('base', self.BASE_PIN)
+        self.start_pin = pins.get('start', self.START_PIN)
+        self.servo_pin = pins.get('servo', self.SERVO_PIN)
+        self.clock = time.monotonic_ns
         self.logger = logging.getLogger(__name__)
         self.logger.setLevel(logging.INFO)
         self.log(logging.INFO, 'Machine setup begin.')
@@ -31,133 +83,463 @@ class Machine(object):
         self.gpio.setwarnings(False)
         self.log(logging.INFO, 'Machine setup complete.')
         self.triggers = []
+        # Edges timestamped in the GPIO callback thread, drained by the
+        # event loop
+        self.edges = queue.Queue()
+        # Set to record every raw edge, see the recorder module
+        self.recorder = None
+        # The input process and the ring its hits arrive in, process mode
+        self.input_settings = input_process or {}
+        self.input_target = scanner.run_input
+        self.input_process = None
+        self.input_stop = None
+        self.ring = None
 
-        self.bouncetime = DEFAULT_BOUNCETIME
-        self.start_latched = False
-        self.start_latch_time = 0
+        # Debounce state for the start button and every trigger
+        self.inputs = InputBank()
         self.start_event = start_event
-        self.gpio.setup(self.START_PIN, self.gpio.IN,
-                        pull_up_down=self.gpio.PUD_UP)
-        #self.duty_time = 0
-        #self.gpio.setup(self.SERVO_PIN, self.gpio.OUT)
-        #self.pwm = self.gpio.PWM(self.SERVO_PIN, 50)
+        min_pulse, rearm = self.get_debounce('start')
+        self.start_index = self.add_input('start', self.start_pin,
+                                          start_event, self.start_callback,
+                                          min_pulse, rearm)
+        servo = dict(servo or {})
+        self.release_angle = servo.pop('release_angle', RELEASE_ANGLE)
+        self.hold_angle = servo.pop('hold_angle', HOLD_ANGLE)
+        self.servo = ServoController(self.gpio, self.servo_pin, **servo)
         self.log(logging.INFO, 'GPIO: {}'.format(self.gpio))
+        self.log(logging.INFO, 'Input mode: {}'.format(self.input_mode))
 
-    def log(self, level, msg):
+    def log(self, level, msg, *args):
         '''Machine specific event logger.'''
-        self.logger.log(level, msg)
+        self.logger.log(level, msg, *args)
+
+    def get_debounce(self, target):
+        '''Returns the (min_pulse_us, rearm_us) settings for a target.
+
+        The configuration looks like:
+
+            debounce:
+              min_pulse_us: 0
+              rearm_us: 20000
+              start:
+                rearm_us: 500000
+              targets:
+                0:
+                  rearm_us: 5000
+
+        Target settings override the defaults, 'start' is the start button.
+        '''
+        if target == 'start':
+            settings = self.debounce.get('start', {})
+            rearm = START_REARM_US
+        else:
+            settings = self.debounce.get('targets', {}).get(target, {})
+            rearm = self.debounce.get('rearm_us', DEFAULT_REARM_US)
+        min_pulse = self.debounce.get('min_pulse_us', DEFAULT_MIN_PULSE_US)
+        return (settings.get('min_pulse_us', min_pulse),
+                settings.get('rearm_us', rearm))
+
+    def add_input(self, name, pin, event, callback,
+                  min_pulse=DEFAULT_MIN_PULSE_US, rearm=DEFAULT_REARM_US):
+        '''Configure an input pin and add it to the input bank.'''
+        if self.input_mode != PROCESS_MODE:
+            # In process mode the input process owns the input pins
+            self.gpio.setup(pin, self.gpio.IN, pull_up_down=self.gpio.PUD_UP)
+        if self.input_mode == EDGE_MODE:
+            # Both edges are needed to measure the pulse width, the input
+            # bank does the debouncing
+            self.gpio.add_event_detect(pin, self.gpio.BOTH,
+                                       callback=callback)
+        self.log(logging.INFO, '{} debounce: min pulse {} us, '
+                 're-arm {} us'.format(name, min_pulse, rearm))
+        return self.inputs.add(name, pin, event, min_pulse, rearm)
 
     def create_trigger(self, name, target, event_number, sub_event):
-        pin = self.BASE_PIN + target
+        pin = self.base_pin + target
         event = pygame.event.Event(event_number, sub=sub_event)
-        trigger = Trigger(self.gpio, self.logger, name, pin, event)
+        trigger = Trigger(self, len(self.inputs), name)
+        min_pulse, rearm = self.get_debounce(target)
+        self.add_input(name, pin, event, trigger.callback, min_pulse, rearm)
+        self.log(logging.INFO, 'Configuring {} on pin {}.'.format(name, pin))
         self.triggers.append(trigger)
         return trigger
 
-    def poll(self):
-        '''Poll the status of the machine inputs.'''
-        state = GPIO.input(self.START_PIN)
-        now = self.get_current_time()
+    def queue_edge(self, index, channel):
+        '''Timestamp an edge and queue it, runs in the GPIO thread.'''
+        now = self.clock()
+        self.edges.put((now, index, self.gpio.input(channel)))
+        if self.wake_event is not None:
+            pygame.event.post(self.wake_event)
+        if self.wake is not None:
+            self.wake()
 
-        if self.start_latch_time + self.bouncetime > now:
+    def start_callback(self, channel):
+        '''GPIO callback for the start button, runs in the GPIO thread.'''
+        if channel is None:
+            # Simulated press, e.g. from the keyboard
+            self.post(self.start_event, events.CONTROL)
             return
+        self.queue_edge(self.start_index, channel)
+
+    def post(self, event, priority=events.SCORE):
+        '''Hand an input event to the event loop.'''
+        if self.event_queue is None:
+            pygame.event.post(event)
+        else:
+            self.event_queue.put(event, priority)
+
+    def priority(self, index):
+        '''The event queue priority of an input's events.'''
+        return events.CONTROL if index == self.start_index else events.SCORE
+
+    def make_event(self, index, edge_time):
+        '''Copy an input's event, adding the time of its edge.'''
+        event = self.inputs.events[index]
+        attrs = dict(event.dict, edge_time=edge_time)
+        return pygame.event.Event(event.type, attrs)
+
+    def get_edge_events(self):
+        '''Drain the edges queued by the GPIO callbacks.
 
-        if self.start_latched and state == 1:
-            self.start_latched = False
+        Returns a list of pygame events, each with an 'edge_time' attribute
+        holding the monotonic time in nanoseconds the pulse started.
+        '''
+        events = []
+        inputs = self.inputs
+        while True:
+            try:
+                now, index, level = self.edges.get_nowait()
+            except queue.Empty:
+                return events
+            if self.recorder is not None:
+                self.recorder.edge(now, index, level)
+            if inputs.update(index, level, now):
+                events.append(self.make_event(index,
+                                              inputs.pulse_start[index]))
+            elif (self.timers is not None and level == 0 and
+                    inputs.state[index] == inputs.PENDING):
+                # Confirm the pulse once it has been low long enough
+                self.timers.call_at(
+                    inputs.edge_time[index] + inputs.min_pulse[index],
+                    self.confirm_inputs)
+
+    def confirm_inputs(self):
+        '''Post the events of pending pulses that reached their width.'''
+        inputs = self.inputs
+        for index in inputs.confirm(self.clock()):
+            self.post(self.make_event(index, inputs.pulse_start[index]),
+                      self.priority(index))
+
+    def start(self):
+        '''Start taking input, once every input has been added.
+
+        In process mode this starts the input process. If it cannot be
+        started the inputs are polled from the event loop instead.
+        '''
+        if self.input_mode != PROCESS_MODE:
+            return
+        inputs = self.inputs
+        described = [(inputs.names[index], inputs.pins[index],
+                      inputs.min_pulse[index] // NS_PER_US,
+                      inputs.rearm[index] // NS_PER_US)
+                     for index in range(len(inputs))]
+        try:
+            self.ring = ring.HitRing(self.input_settings.get(
+                'capacity', ring.DEFAULT_CAPACITY))
+            context = multiprocessing.get_context('spawn')
+            self.input_stop = context.Event()
+            self.input_process = context.Process(
+                target=self.input_target, name='input',
+                args=(self.ring.name, described, self.input_settings,
+                      self.input_stop))
+            self.input_process.daemon = True
+            self.input_process.start()
+        except (OSError, ImportError) as error:
+            self.fall_back('input process failed to start: {}'.format(error))
             return
+        self.log(logging.INFO, 'Input process started, pid {}'.format(
+            self.input_process.pid))
 
-        if state == 0:
-            self.start_latched = True
-            self.start_latch_time = now
-            pygame.event.post(self.start_event)
+    def fall_back(self, reason):
+        '''Leave process mode and poll the inputs from the event loop.'''
+        self.log(logging.WARNING, 'Polling inputs, {}'.format(reason))
+        self.stop_input_process()
+        self.input_mode = POLL_MODE
+        for pin in self.inputs.pins:
+            self.gpio.setup(pin, self.gpio.IN, pull_up_down=self.gpio.PUD_UP)
+
+    def stop_input_process(self):
+        if self.input_process is not None:
+            self.input_stop.set()
+            self.input_process.join(1)
+            if self.input_process.is_alive():
+                self.input_process.terminate()
+                self.input_process.join()
+            self.input_process = None
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
+
+    def ring_report(self):
+        '''Returns the input ring's waiting, overflows and high_water.'''
+        if self.ring is None:
+            return {}
+        return self.ring.stats()
+
+    def poll(self):
+        '''Poll the status of all of the machine inputs in one pass.'''
+        if self.input_mode == PROCESS_MODE:
+            self.poll_ring()
+            return
+        if self.input_mode == EDGE_MODE:
+            # The GPIO callbacks already queue every edge, only pulses
+            # still waiting out their minimum width need checking
+            self.confirm_inputs()
+            return
+        now = self.clock()
+        input_events = self.inputs.events
+        for index in self.inputs.scan(self.gpio.input, now):
+            self.post(input_events[index], self.priority(index))
+
+    def poll_ring(self):
+        '''Post the hits the input process has published.'''
+        if self.input_process is None:
+            return
+        hits = self.inputs.hits
+        for edge_time, index in self.ring.get_all():
+            hits[index] += 1
+            self.post(self.make_event(index, edge_time), self.priority(index))
+        if not self.input_process.is_alive():
+            self.fall_back('input process exited with {}'.format(
+                self.input_process.exitcode))
+
+    def debounce_report(self):
+        '''Returns {name: (hits, suppressed)} for every input.'''
+        return self.inputs.report()
 
     def get_current_time(self):
-        return int(round(time.time() * 1000))
-
-    # The servo control is untested
-    def check_duty_cycle(self):
-        return
-        now = self.get_current_time()
-        if self.duty_time + 1000 > now:
-            self.turn_off_duty_cycle()
-            self.duty_time = 0
-
-    def turn_off_duty_cycle(self):
-        return
-        self.gpio.output(self.SERVO_PIN, False)
-        self.pwm.ChangeDutyCycle(0)
-
-    def set_angle(self, angle):
-        '''Sets the angle of the servo motor.'''
-        duty = angle / 18 + 2
-        self.gpio.output(self.SERVO_PIN, True)
-        self.pwm.ChangeDutyCycle(duty)
+        return self.clock() // NS_PER_MS
 
     def release_balls(self):
         '''Activate the servo to release the balls'''
-        return
-        self.set_angle(90)
-        self.duty_time = self.get_current_time()
+        self.servo.move(self.release_angle)
 
     def hold_balls(self):
         '''Activate the servo to hold the balls'''
-        return
-        self.set_angle(0)
-        self.duty_time = self.get_current_time()
+        self.servo.move(self.hold_angle)
+
+    def close(self):
+        '''Stop the input process and switch off the servo.'''
+        self.stop_input_process()
+        self.servo.close()
+
+
+class InputBank(object):
+    '''Debounce state for all of the machine inputs.
+
+    The state is kept in parallel arrays indexed by input number so that a
+    scan of every pin costs one read per pin and one timestamp per scan.
+    Times are monotonic nanoseconds, the settings are in microseconds.
+
+    Each input runs a small state machine:
+
+        IDLE    -> PENDING  pin goes low
+        PENDING -> ACTIVE   low for at least the minimum pulse width (fires)
+        PENDING -> IDLE     high again too soon, a glitch (suppressed)
+        ACTIVE  -> REARM    pin goes high
+        REARM   -> ACTIVE   low again before the re-arm time (suppressed)
+        REARM   -> IDLE     high for at least the re-arm time
+
+    A pulse that reaches its minimum width while still low is confirmed by
+    the next scan or confirm() call, or by its rising edge.
+    '''
+    IDLE = 0
+    PENDING = 1
+    ACTIVE = 2
+    REARM = 3
+
+    __slots__ = ('names', 'pins', 'events', 'min_pulse', 'rearm', 'state',
+                 'edge_time', 'pulse_start', 'hits', 'suppressed')
+
+    def __init__(self):
+        self.names = []
+        self.pins = array('i')
+        self.events = []
+        self.min_pulse = array('q')
+        self.rearm = array('q')
+        self.state = bytearray()
+        # The last edge, for the debounce timing, and the fall that
+        # started the last pulse, for the events
+        self.edge_time = array('q')
+        self.pulse_start = array('q')
+        self.hits = array('L')
+        self.suppressed = array('L')
+
+    def __len__(self):
+        return len(self.pins)
+
+    def add(self, name, pin, event, min_pulse=DEFAULT_MIN_PULSE_US,
+            rearm=DEFAULT_REARM_US):
+        '''Add an input, returning its index.'''
+        self.names.append(name)
+        self.pins.append(pin)
+        self.events.append(event)
+        self.min_pulse.append(min_pulse * NS_PER_US)
+        self.rearm.append(rearm * NS_PER_US)
+        self.state.append(self.IDLE)
+        self.edge_time.append(0)
+        self.pulse_start.append(0)
+        self.hits.append(0)
+        self.suppressed.append(0)
+        return len(self.pins) - 1
+
+    def fire(self, index):
+        self.state[index] = self.ACTIVE
+        self.hits[index] += 1
+        return True
+
+    def update(self, index, level, now):
+        '''Debounce one input sample or edge, returns True if it fired.'''
+        state = self.state[index]
+        if level == 0:
+            if state == self.ACTIVE:
+                return False
+            if state == self.PENDING:
+                if now - self.edge_time[index] >= self.min_pulse[index]:
+                    return self.fire(index)
+                return False
+            if (state == self.REARM and
+                    now - self.edge_time[index] < self.rearm[index]):
+                # Bounce, or a second ball inside the re-arm time
+                self.suppressed[index] += 1
+                self.state[index] = self.ACTIVE
+                return False
+            self.edge_time[index] = now
+            self.pulse_start[index] = now
+            if self.min_pulse[index] == 0:
+                return self.fire(index)
+            self.state[index] = self.PENDING
+            return False
+
+        if state == self.PENDING:
+            if now - self.edge_time[index] >= self.min_pulse[index]:
+                # A full width pulse that was not confirmed while low
+                self.hits[index] += 1
+                self.state[index] = self.REARM
+                self.edge_time[index] = now
+                return True
+            self.suppressed[index] += 1
+            self.state[index] = self.IDLE
+        elif state == self.ACTIVE:
+            self.state[index] = self.REARM
+            self.edge_time[index] = now
+        elif (state == self.REARM and
+                now - self.edge_time[index] >= self.rearm[index]):
+            self.state[index] = self.IDLE
+        return False
+
+    def scan(self, read, now):
+        '''Read and debounce every input.
+
+        Returns the indexes of the inputs that fired.
+        '''
+        states = [read(pin) for pin in self.pins]
+        update = self.update
+        idle = self.IDLE
+        state = self.state
+        fired = []
+        for index, level in enumerate(states):
+            # Most inputs are idle and high, skip the state machine for them
+            if level and state[index] == idle:
+                continue
+            if update(index, level, now):
+                fired.append(index)
+        return fired
+
+    def confirm(self, now):
+        '''Fire the pending inputs that have reached their minimum width.
+
+        Used in edge mode, where there is no scan to notice a pulse that is
+        still low. Returns the indexes of the inputs that fired.
+        '''
+        fired = []
+        for index, state in enumerate(self.state):
+            if (state == self.PENDING and
+                    now - self.edge_time[index] >= self.min_pulse[index]):
+                self.fire(index)
+                fired.append(index)
+        return fired
+
+    def report(self):
+        '''Returns {name: (hits, suppressed)} for every input.'''
+        return dict((name, (self.hits[index], self.suppressed[index]))
+                    for index, name in enumerate(self.names))
 
 
 class Trigger(object):
-    '''An input trigger.'''
+    '''An input trigger, a view of one entry in the machine's inputs.'''
+    __slots__ = ('machine', 'index', 'name')
 
-    def __init__(self, gpio, logger, name, pin, event,
-                 bouncetime=DEFAULT_BOUNCETIME):
-        '''Initialize the GPIO trigger.'''
-        self.gpio = gpio
-        self.logger = logger
+    def __init__(self, machine, index, name):
+        '''Initialize the trigger view.'''
+        self.machine = machine
+        self.index = index
         self.name = name
-        self.pin = pin
-        self.event = event
-        self.bouncetime = bouncetime
-        self.latched = False
-        self.latch_time = 0
-        self.gpio.setup(pin, self.gpio.IN, pull_up_down=self.gpio.PUD_UP)
-        self.log(logging.INFO, 'Configuring {} on pin {}.'.format(name, pin))
 
     def __repr__(self):
         return '[name: {}, pin: {}, event: {}]'.format(
             self.name, self.pin, self.event)
 
-    def log(self, level, msg):
+    @property
+    def pin(self):
+        return self.machine.inputs.pins[self.index]
+
+    @property
+    def event(self):
+        return self.machine.inputs.events[self.index]
+
+    @property
+    def min_pulse_us(self):
+        return self.machine.inputs.min_pulse[self.index] // NS_PER_US
+
+    @property
+    def rearm_us(self):
+        return self.machine.inputs.rearm[self.index] // NS_PER_US
+
+    @property
+    def latched(self):
+        return self.machine.inputs.state[self.index] != InputBank.IDLE
+
+    @property
+    def hits(self):
+        return self.machine.inputs.hits[self.index]
+
+    @property
+    def suppressed(self):
+        return self.machine.inputs.suppressed[self.index]
+
+    def log(self, level, msg, *args):
         '''Trigger specific event logger.'''
-        self.logger.log(level, msg)
+        self.machine.log(level, msg, *args)
 
     def get_current_time(self):
-        return int(round(time.time() * 1000))
+        return self.machine.get_current_time()
 
     def poll(self):
         '''Poll the status of this target.'''
-        state = GPIO.input(self.pin)
-        now = self.get_current_time()
+        state = self.machine.gpio.input(self.pin)
+        if self.machine.inputs.update(self.index, state, self.machine.clock()):
+            self.machine.post(self.event)
 
-        # Perform debouncing by ensuring this does not trigger again until
-        # after the bouncetime
-        if self.latch_time + self.bouncetime > now:
-            return
+    def callback(self, data):
+        '''GPIO event callback.
 
-        # The target must also be clear for a minimum time before it can
-        # be triggered again
-        if self.latched and state == 1:
-            self.latched = False
+        In edge mode this runs in the GPIO library's thread, so it only
+        timestamps the edge and queues it for the event loop.
+        '''
+        if data is not None and self.machine.input_mode == EDGE_MODE:
+            self.machine.queue_edge(self.index, data)
             return
-
-        if state == 0:
-            self.latched = True
-            self.latch_time = now
-            pygame.event.post(self.event)
-
-    def callback(self, data):
-        '''GPIO event callback.'''
-        self.log(logging.INFO, 'GPIO callback: {}'.format(self.name))
-        self.log(logging.INFO, 'Event: {}'.format(self.event))
-        self.log(logging.INFO, 'Data: {}'.format(data))
-        pygame.event.post(self.event)
+        self.log(logging.INFO, 'GPIO callback: %s, event: %s, data: %s',
+                 self.name, self.event, data)
+        self.machine.post(self.event)
@@ -0,0 +1,91 @@
+'''
+A bounded queue of input events, kept apart from the SDL event queue.
+
+SDL's queue has a fixed size and drops events silently once it is full, a
+ball lost there is never noticed. Input events go here instead, and the
+event loop drains this queue before SDL's.
+
+Every event has a priority. Events are handled in the order they arrived,
+the priority only decides what gives way when the queue is full: a new
+event pushes out the newest waiting event of a lower priority, and is
+itself dropped if there is none. A score is never pushed out by a start
+press or a poll tick. A poll tick is also dropped while another is still
+waiting, one tick does the work of any number.
+
+Drops are counted by priority, and the most events ever waiting is kept
+as the high-water mark, so a lost ball always shows in the report.
+'''
+import collections
+import threading
+
+SCORE = 0
+CONTROL = 1
+TICK = 2
+PRIORITY_NAMES = ('score', 'control', 'tick')
+
+DEFAULT_CAPACITY = 256
+
+
+class EventQueue(object):
+    '''Input events waiting for the event loop, safe to put from any thread.'''
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        self.capacity = capacity
+        # (priority, event) in arrival order
+        self.events = collections.deque()
+        # Waiting events of each priority
+        self.waiting = [0] * len(PRIORITY_NAMES)
+        self.dropped = [0] * len(PRIORITY_NAMES)
+        self.coalesced = 0
+        self.high_water = 0
+        self.lock = threading.Lock()
+
+    def __len__(self):
+        return len(self.events)
+
+    def put(self, event, priority=SCORE):
+        '''Queue an event, returns False if it was dropped.'''
+        with self.lock:
+            if priority == TICK and self.waiting[TICK]:
+                self.coalesced += 1
+                return True
+            if len(self.events) >= self.capacity and not self.evict(priority):
+                self.dropped[priority] += 1
+                return False
+            self.events.append((priority, event))
+            self.waiting[priority] += 1
+            if len(self.events) > self.high_water:
+                self.high_water = len(self.events)
+            return True
+
+    def evict(self, priority):
+        '''Drop the newest waiting event of the lowest priority below.'''
+        for lower in range(len(PRIORITY_NAMES) - 1, priority, -1):
+            if not self.waiting[lower]:
+                continue
+            for position in range(len(self.events) - 1, -1, -1):
+                if self.events[position][0] == lower:
+                    del self.events[position]
+                    self.waiting[lower] -= 1
+                    self.dropped[lower] += 1
+                    return True
+        return False
+
+    def get_all(self):
+        '''Remove and return every waiting event, oldest first.'''
+        with self.lock:
+            events = [event for _, event in self.events]
+            self.events.clear()
+            for priority in range(len(self.waiting)):
+                self.waiting[priority] = 0
+        return events
+
+    def report(self):
+        '''Returns the capacity, high-water mark and drops by priority.'''
+        with self.lock:
+            report = {'capacity': self.capacity,
+                      'high_water': self.high_water,
+                      'coalesced': self.coalesced}
+            for priority, name in enumerate(PRIORITY_NAMES):
+                report['dropped_' + name] = self.dropped[priority]
+            return report
@@ -0,0 +1,136 @@
+'''
+A single producer, single consumer ring of hits in shared memory.
+
+The input process writes a record for every debounced hit, the event loop
+reads them. Neither side takes a lock: the producer only ever moves the
+head, the consumer only ever moves the tail, and each reads the other's
+index. Both indexes count up forever, the slot is the index modulo the
+capacity, so the ring is full when head - tail == capacity.
+
+Python has no memory fences, and on a weakly ordered CPU, e.g. the ARM of
+a Pi, the consumer may see the new head before the record it publishes.
+Every record ends with a sequence number, its head index plus one,
+which the producer writes after the rest of the record. The consumer
+checks it before reading the record, and leaves a record whose sequence
+number has not arrived yet, and any after it, for its next read.
+
+A hit that finds the ring full is dropped and counted in overflows rather
+than waiting, the input process must never block on the event loop. The
+most records ever waiting is kept in high_water, to size the ring.
+
+Layout, with the indexes on cache lines of their own:
+
+    0    head        written by the producer
+    64   tail        written by the consumer
+    128  overflows   written by the producer
+    136  high_water  written by the producer
+    144  capacity
+    192  records, (edge time ns, input index, sequence number) each
+'''
+import struct
+from multiprocessing import shared_memory
+
+DEFAULT_CAPACITY = 1024
+
+INDEX = struct.Struct('<Q')
+RECORD = struct.Struct('<qII')
+HIT = struct.Struct('<qI')
+SEQUENCE = struct.Struct('<I')
+# The offset of the sequence number in a record
+SEQUENCE_OFFSET = HIT.size
+SEQUENCE_MASK = 0xffffffff
+HEAD = 0
+TAIL = 64
+OVERFLOWS = 128
+HIGH_WATER = 136
+CAPACITY = 144
+RECORDS = 192
+
+
+class HitRing(object):
+    '''Hits passed from the input process to the event loop.'''
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, name=None):
+        '''Create a ring, or attach to the named one.'''
+        if name is None:
+            self.memory = shared_memory.SharedMemory(
+                create=True, size=RECORDS + capacity * RECORD.size)
+            self.owner = True
+            self.buffer = self.memory.buf
+            for offset in (HEAD, TAIL, OVERFLOWS, HIGH_WATER):
+                INDEX.pack_into(self.buffer, offset, 0)
+            INDEX.pack_into(self.buffer, CAPACITY, capacity)
+        else:
+            self.memory = shared_memory.SharedMemory(name=name)
+            self.owner = False
+            self.buffer = self.memory.buf
+        self.capacity = INDEX.unpack_from(self.buffer, CAPACITY)[0]
+        # Each side keeps a copy of the index only it writes
+        self.head = INDEX.unpack_from(self.buffer, HEAD)[0]
+        self.tail = INDEX.unpack_from(self.buffer, TAIL)[0]
+
+    @property
+    def name(self):
+        return self.memory.name
+
+    def put(self, edge_time, index):
+        '''Add a hit, returns False if the ring was full and it was lost.'''
+        buffer = self.buffer
+        head = self.head
+        waiting = head - INDEX.unpack_from(buffer, TAIL)[0]
+        if waiting >= self.capacity:
+            overflows = INDEX.unpack_from(buffer, OVERFLOWS)[0]
+            INDEX.pack_into(buffer, OVERFLOWS, overflows + 1)
+            return False
+        offset = RECORDS + head % self.capacity * RECORD.size
+        HIT.pack_into(buffer, offset, edge_time, index)
+        # Publish the record only once it is written, the sequence number
+        # last so the consumer can tell it is whole
+        self.head = head + 1
+        SEQUENCE.pack_into(buffer, offset + SEQUENCE_OFFSET,
+                           self.head & SEQUENCE_MASK)
+        INDEX.pack_into(buffer, HEAD, self.head)
+        if waiting + 1 > INDEX.unpack_from(buffer, HIGH_WATER)[0]:
+            INDEX.pack_into(buffer, HIGH_WATER, waiting + 1)
+        return True
+
+    def get_all(self):
+        '''Remove and return every waiting hit, as (edge time, index).'''
+        buffer = self.buffer
+        head = INDEX.unpack_from(buffer, HEAD)[0]
+        tail = self.tail
+        if head == tail:
+            return []
+        capacity = self.capacity
+        size = RECORD.size
+        unpack = HIT.unpack_from
+        sequence = SEQUENCE.unpack_from
+        hits = []
+        for position in range(tail, head):
+            offset = RECORDS + position % capacity * size
+            if (sequence(buffer, offset + SEQUENCE_OFFSET)[0] !=
+                    (position + 1) & SEQUENCE_MASK):
+                # Not written yet, as far as this CPU can see
+                break
+            hits.append(unpack(buffer, offset))
+        if hits:
+            self.tail = tail = tail + len(hits)
+            INDEX.pack_into(buffer, TAIL, tail)
+        return hits
+
+    def stats(self):
+        '''The waiting, overflows and high_water counts.'''
+        buffer = self.buffer
+        return {
+            'waiting': (INDEX.unpack_from(buffer, HEAD)[0] -
+                        INDEX.unpack_from(buffer, TAIL)[0]),
+            'overflows': INDEX.unpack_from(buffer, OVERFLOWS)[0],
+            'high_water': INDEX.unpack_from(buffer, HIGH_WATER)[0],
+        }
+
+    def close(self):
+        '''Detach, and free the memory if this side created it.'''
+        self.buffer = None
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
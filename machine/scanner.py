@@ -0,0 +1,74 @@
+'''
+The input process: scans and debounces the inputs away from the display.
+
+In the process input mode the event loop does no GPIO work at all. A small
+process of its own scans every input on a fixed period, runs the same
+InputBank debouncing, and publishes each hit, with the time its edge was
+seen, to a machine.ring.HitRing. A slow frame in the event loop then delays
+when a hit is scored, but not when it is seen, and never loses it.
+
+The process asks for a higher scheduling priority, 'priority' in the
+'input_process' settings as a nice value, and carries on without it if
+that is not allowed.
+'''
+import logging
+import os
+import time
+
+NS_PER_US = 1000
+
+DEFAULT_SCAN_US = 1000
+DEFAULT_PRIORITY = -10
+
+
+def raise_priority(priority):
+    '''Renice this process, returns False if not permitted.'''
+    try:
+        os.setpriority(os.PRIO_PROCESS, 0, priority)
+    except (AttributeError, OSError):
+        return False
+    return True
+
+
+def scan_loop(ring, bank, read, stop, period, clock=time.monotonic_ns):
+    '''Scan every period nanoseconds until stop is set.
+
+    Missed periods are skipped rather than run back to back.
+    '''
+    deadline = clock()
+    pulse_start = bank.pulse_start
+    while not stop.is_set():
+        for index in bank.scan(read, clock()):
+            ring.put(pulse_start[index], index)
+        deadline += period
+        delay = deadline - clock()
+        if delay > 0:
+            time.sleep(delay / 1e9)
+        else:
+            deadline = clock()
+
+
+def run_input(ring_name, inputs, settings, stop, gpio=None):
+    '''Run the input process, inputs are (name, pin, min_pulse_us, rearm_us).
+
+    Runs in the child process until stop is set.
+    '''
+    import machine
+    from machine.ring import HitRing
+    logger = logging.getLogger(__name__)
+    if not raise_priority(settings.get('priority', DEFAULT_PRIORITY)):
+        logger.warning('Input process priority unchanged')
+    if gpio is None:
+        gpio = machine.GPIO
+    gpio.setmode(gpio.BCM)
+    gpio.setwarnings(False)
+    bank = machine.InputBank()
+    for name, pin, min_pulse, rearm in inputs:
+        gpio.setup(pin, gpio.IN, pull_up_down=gpio.PUD_UP)
+        bank.add(name, pin, None, min_pulse, rearm)
+    ring = HitRing(name=ring_name)
+    try:
+        scan_loop(ring, bank, gpio.input, stop,
+                  settings.get('scan_us', DEFAULT_SCAN_US) * NS_PER_US)
+    finally:
+        ring.close()
@@ -0,0 +1,173 @@
+'''
+The ball release servo, driven from its own timing thread.
+
+A move is a motion profile: the PWM duty cycle steps from the angle the
+servo was last stepped to, to the new one, one step per PWM period, and
+is then held long enough for the servo to settle before the duty cycle is
+switched off. Switching it off stops the servo hunting and jittering while
+it is idle.
+
+Moves are queued by move() and run by the controller thread against
+monotonic deadlines, so the event loop never waits on the servo. A new
+move replaces whatever is left of the current one.
+'''
+import collections
+import logging
+import queue
+import threading
+import time
+
+NS_PER_MS = 1000000
+NS_PER_S = 1000000000
+
+DEFAULT_FREQUENCY = 50
+DEFAULT_MOVE_MS = 300
+DEFAULT_HOLD_MS = 500
+# Deadlines are slept towards and the last of the wait is spun, for
+# timing closer than the scheduler gives
+SPIN_NS = 500000
+
+# Queued to stop the controller thread
+STOP = None
+
+
+def angle_to_duty(angle):
+    '''The duty cycle, in percent, that turns the servo to angle degrees.'''
+    return angle / 18.0 + 2
+
+
+class ServoController(object):
+    '''Runs servo moves on a dedicated thread.'''
+
+    def __init__(self, gpio, pin, frequency=DEFAULT_FREQUENCY,
+                 move_ms=DEFAULT_MOVE_MS, hold_ms=DEFAULT_HOLD_MS,
+                 clock=time.monotonic_ns):
+        self.logger = logging.getLogger(__name__)
+        self.gpio = gpio
+        self.pin = pin
+        self.period = NS_PER_S // frequency
+        self.move_ms = move_ms
+        self.hold_ms = hold_ms
+        self.clock = clock
+        self.gpio.setup(pin, gpio.OUT)
+        self.pwm = gpio.PWM(pin, frequency)
+        self.pwm.start(0)
+        # The last angle commanded, and the last one the servo was
+        # stepped to, None until the first move
+        self.angle = None
+        self.position = None
+        self.commands = queue.Queue()
+        # Moves queued and not yet taken by the thread, the servo is only
+        # idle once there are none and the last move is done
+        self.pending = 0
+        self.lock = threading.Lock()
+        self.idle = threading.Event()
+        self.idle.set()
+        self.thread = None
+        # How late each step was applied, in nanoseconds
+        self.steps = 0
+        self.lateness_total = 0
+        self.lateness_max = 0
+
+    def move(self, angle):
+        '''Turn the servo to angle degrees, without waiting for it.'''
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name='servo')
+            self.thread.daemon = True
+            self.thread.start()
+        with self.lock:
+            self.pending += 1
+            self.idle.clear()
+        self.commands.put(angle)
+
+    def wait(self, timeout=None):
+        '''Wait until the servo is switched off, returns False on timeout.'''
+        return self.idle.wait(timeout)
+
+    def profile(self, angle, now):
+        '''The (deadline, duty, angle) steps of a move to angle from now.
+
+        The move starts from where the servo was last stepped to, part way
+        through the move before if that was cut short.
+        '''
+        start = self.position if self.position is not None else angle
+        count = max(1, self.move_ms * NS_PER_MS // self.period)
+        steps = collections.deque()
+        for step in range(1, count + 1):
+            position = start + (angle - start) * step / count
+            steps.append((now + (step - 1) * self.period,
+                          angle_to_duty(position), position))
+        # Hold the final position, then let the servo go
+        steps.append((steps[-1][0] + self.hold_ms * NS_PER_MS, 0, angle))
+        return steps
+
+    def run(self):
+        steps = collections.deque()
+        while True:
+            try:
+                if steps:
+                    wait = steps[0][0] - self.clock() - SPIN_NS
+                    if wait > 0:
+                        command = self.commands.get(timeout=wait / NS_PER_S)
+                    else:
+                        command = self.commands.get_nowait()
+                else:
+                    command = self.commands.get()
+            except queue.Empty:
+                self.step(*steps.popleft())
+                if not steps:
+                    self.set_idle()
+                continue
+            with self.lock:
+                self.pending -= 1
+            if command is STOP:
+                self.switch_off()
+                self.idle.set()
+                return
+            if not steps:
+                # Power the servo for the new move
+                self.gpio.output(self.pin, True)
+            steps = self.profile(command, self.clock())
+            self.angle = command
+
+    def set_idle(self):
+        '''Mark the servo idle, unless another move is on its way.'''
+        with self.lock:
+            if not self.pending:
+                self.idle.set()
+
+    def step(self, deadline, duty, angle):
+        '''Apply one step of a move at its deadline.'''
+        while self.clock() < deadline:
+            pass
+        late = self.clock() - deadline
+        self.steps += 1
+        self.lateness_total += late
+        self.lateness_max = max(self.lateness_max, late)
+        self.position = angle
+        if duty:
+            self.pwm.ChangeDutyCycle(duty)
+        else:
+            self.switch_off()
+
+    def switch_off(self):
+        self.pwm.ChangeDutyCycle(0)
+        self.gpio.output(self.pin, False)
+
+    def stats(self):
+        '''Step timing, as a dict of the step count and lateness in ms.'''
+        return {
+            'steps': self.steps,
+            'late_mean_ms': (self.lateness_total / self.steps / NS_PER_MS
+                             if self.steps else 0.0),
+            'late_max_ms': self.lateness_max / NS_PER_MS,
+        }
+
+    def close(self):
+        '''Switch the servo off and stop the thread.'''
+        if self.thread is not None:
+            with self.lock:
+                self.pending += 1
+            self.commands.put(STOP)
+            self.thread.join()
+            self.thread = None
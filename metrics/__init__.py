@@ -0,0 +1,238 @@
+'''
+Counters, gauges and histograms of a running cabinet.
+
+Metrics are recorded by the event loop with no locks and no allocation:
+a histogram's buckets are a list allocated with it, an observation is a
+bisect of the bucket bounds and two additions. The exporter reads them
+from its own threads, a scrape may see an observation half made, which
+the next one corrects.
+
+Times are recorded in nanoseconds and exported in seconds, as Prometheus
+expects. The exporter serves the Prometheus text format on localhost and
+writes the same metrics as JSON to a snapshot file every so often:
+
+    metrics:
+      port: 9100
+      snapshot: metrics.json
+      snapshot_s: 60
+'''
+import bisect
+import http.server
+import json
+import logging
+import os
+import threading
+import time
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_SNAPSHOT_S = 60
+NS_PER_SECOND = 1000000000
+# Upper bounds in ns, from 50 us to a second
+DEFAULT_BOUNDS = (50000, 100000, 250000, 500000, 1000000, 2500000,
+                  5000000, 10000000, 25000000, 50000000, 100000000,
+                  250000000, 1000000000)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class Counter(object):
+    '''A count that only goes up.'''
+    kind = 'counter'
+
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self.value = 0
+
+    def inc(self, count=1):
+        self.value += count
+
+    def lines(self):
+        yield '{} {}'.format(self.name, self.value)
+
+    def snapshot(self):
+        return self.value
+
+
+class Gauge(Counter):
+    '''A value that is set, e.g. a queue depth.'''
+    kind = 'gauge'
+
+    def set(self, value):
+        self.value = value
+
+
+class Histogram(object):
+    '''Counts of observations in preallocated buckets.
+
+    Observations are in ns, or plain numbers if scale is 1.
+    '''
+    kind = 'histogram'
+
+    def __init__(self, name, help, bounds=DEFAULT_BOUNDS,
+                 scale=NS_PER_SECOND):
+        self.name = name
+        self.help = help
+        self.bounds = tuple(bounds)
+        self.scale = scale
+        # One bucket per bound and one for everything above the last
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def lines(self):
+        cumulative = 0
+        for bound, count in zip(self.bounds, self.counts):
+            cumulative += count
+            yield '{}_bucket{{le="{}"}} {}'.format(
+                self.name, format_number(bound / self.scale), cumulative)
+        yield '{}_bucket{{le="+Inf"}} {}'.format(
+            self.name, cumulative + self.counts[-1])
+        yield '{}_sum {}'.format(self.name,
+                                 format_number(self.sum / self.scale))
+        yield '{}_count {}'.format(self.name, self.count)
+
+    def snapshot(self):
+        return {
+            'bounds': [bound / self.scale for bound in self.bounds],
+            'counts': list(self.counts),
+            'sum': self.sum / self.scale,
+            'count': self.count,
+        }
+
+
+def format_number(value):
+    '''A float in the shortest form, without a trailing .0.'''
+    text = repr(float(value))
+    return text[:-2] if text.endswith('.0') else text
+
+
+class Registry(object):
+    '''The metrics of one process, in the order they were added.'''
+
+    def __init__(self):
+        self.metrics = []
+
+    def add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def counter(self, name, help):
+        return self.add(Counter(name, help))
+
+    def gauge(self, name, help):
+        return self.add(Gauge(name, help))
+
+    def histogram(self, name, help, **kwargs):
+        return self.add(Histogram(name, help, **kwargs))
+
+    def render(self):
+        '''The metrics in the Prometheus text format.'''
+        lines = []
+        for metric in self.metrics:
+            lines.append('# HELP {} {}'.format(metric.name, metric.help))
+            lines.append('# TYPE {} {}'.format(metric.name, metric.kind))
+            lines.extend(metric.lines())
+        lines.append('')
+        return '\n'.join(lines)
+
+    def snapshot(self):
+        '''The metrics as a dict, with the wall clock time.'''
+        metrics = dict((metric.name, metric.snapshot())
+                       for metric in self.metrics)
+        return {'time': time.time(), 'metrics': metrics}
+
+
+def write_snapshot(registry, path):
+    '''Write a snapshot, replacing the last one whole.'''
+    temporary = path + '.tmp'
+    with open(temporary, 'w') as snapshot_file:
+        json.dump(registry.snapshot(), snapshot_file, sort_keys=True)
+    os.replace(temporary, path)
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    '''Serves the registry of the server at /metrics.'''
+
+    def do_GET(self):
+        if self.path.split('?')[0] not in ('/', '/metrics'):
+            self.send_error(404)
+            return
+        body = self.server.registry.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', CONTENT_TYPE)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.getLogger(__name__).debug(format, *args)
+
+
+class Exporter(object):
+    '''Serves the metrics over HTTP and writes snapshots, from threads.'''
+
+    def __init__(self, registry, port=None, host=DEFAULT_HOST,
+                 snapshot=None, snapshot_s=DEFAULT_SNAPSHOT_S):
+        '''Serve on port, 0 for any free one, and snapshot to a path.
+
+        Either may be None to leave it out.
+        '''
+        self.logger = logging.getLogger(__name__)
+        self.registry = registry
+        self.snapshot = snapshot
+        self.snapshot_s = snapshot_s
+        self.server = None
+        self.stopping = threading.Event()
+        self.threads = []
+        if port is not None:
+            try:
+                self.server = http.server.ThreadingHTTPServer(
+                    (host, port), Handler)
+            except OSError as e:
+                self.logger.warning('Cannot serve metrics on %s:%s: %s',
+                                    host, port, e)
+            else:
+                self.server.daemon_threads = True
+                self.server.registry = registry
+                self.start(self.server.serve_forever)
+        if snapshot is not None:
+            self.start(self.write_snapshots)
+
+    @property
+    def port(self):
+        '''The port served on, None if not serving.'''
+        if self.server is None:
+            return None
+        return self.server.server_address[1]
+
+    def start(self, target):
+        thread = threading.Thread(target=target, name='metrics')
+        thread.daemon = True
+        thread.start()
+        self.threads.append(thread)
+
+    def write_snapshots(self):
+        while not self.stopping.wait(self.snapshot_s):
+            self.write()
+
+    def write(self):
+        try:
+            write_snapshot(self.registry, self.snapshot)
+        except (IOError, OSError) as e:
+            self.logger.warning('Cannot write metrics snapshot: %s', e)
+
+    def stop(self):
+        '''Stop serving, and write a last snapshot.'''
+        self.stopping.set()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+        for thread in self.threads:
+            thread.join()
+        if self.snapshot is not None:
+            self.write()
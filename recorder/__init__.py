@@ -0,0 +1,192 @@
+'''
+Records the event loop's input to a compact binary log and replays it.
+
+The log is append-only: an 8 byte header followed by fixed size records of
+a monotonic nanosecond timestamp, the record kind, a 16 bit code and two
+32 bit arguments.
+
+    kind    code          a           b
+    EDGE    input index   level       0
+    EVENT   event type    see below
+    MODE    mode number   0           0
+
+Target events store (target, points) in a and b, key events store the key
+in a. A recorded night of play is replayed with:
+
+    python -m recorder night.rec
+'''
+import collections
+import logging
+import struct
+import time
+
+import pygame
+
+HEADER = b'SKEEREC1'
+RECORD = struct.Struct('<qBxHii')
+BUFFER_SIZE = 64 * 1024
+
+EDGE = 1
+EVENT = 2
+MODE = 3
+
+Record = collections.namedtuple('Record', 'time kind code a b')
+
+
+class Recorder(object):
+    '''Appends records to a binary log file.'''
+
+    def __init__(self, path, modes):
+        '''Open the log for appending, modes lists the operating modes.'''
+        self.file = open(path, 'ab', buffering=BUFFER_SIZE)
+        if self.file.tell() == 0:
+            self.file.write(HEADER)
+        self.modes = dict((mode, number) for number, mode in enumerate(modes))
+        self.count = 0
+
+    def write(self, kind, code, a=0, b=0, now=None):
+        if now is None:
+            now = time.monotonic_ns()
+        self.file.write(RECORD.pack(now, kind, code, a, b))
+        self.count += 1
+
+    def edge(self, now, index, level):
+        '''Record a raw input edge.'''
+        self.write(EDGE, index, int(level), 0, now)
+
+    def event(self, event):
+        '''Record a pygame event handled by the event loop.'''
+        sub = getattr(event, 'sub', None)
+        if sub is not None:
+            a, b = sub
+        else:
+            a, b = getattr(event, 'key', 0), 0
+        self.write(EVENT, event.type, a, b, getattr(event, 'edge_time', None))
+
+    def mode(self, mode):
+        '''Record an operating mode transition.'''
+        self.write(MODE, self.modes[mode])
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+
+def read(path):
+    '''Yield the Records in a log file.'''
+    with open(path, 'rb') as log_file:
+        if log_file.read(len(HEADER)) != HEADER:
+            raise ValueError('{} is not an event log'.format(path))
+        while True:
+            data = log_file.read(RECORD.size * 1024)
+            # Ignore a partial record left by a power cut mid write
+            end = len(data) - len(data) % RECORD.size
+            for values in RECORD.iter_unpack(data[:end]):
+                yield Record(*values)
+            if len(data) < RECORD.size * 1024:
+                return
+
+
+def make_event(record, target_event):
+    '''Rebuild the pygame event of an EVENT record.'''
+    if record.code == target_event:
+        return pygame.event.Event(record.code, sub=(record.a, record.b),
+                                  edge_time=record.time)
+    if record.code in (pygame.KEYDOWN, pygame.KEYUP):
+        return pygame.event.Event(record.code, key=record.a)
+    return pygame.event.Event(record.code)
+
+
+def replay(path, config=None, speed=None):
+    '''Replay a log headlessly against the game, returns a summary.
+
+    The display is headless, nothing is drawn, and the machine is fake,
+    no pins are claimed and the servo is not driven. With no speed the
+    events are handled as fast as possible, otherwise the gaps between
+    them are shortened by the speed factor. The log is appended to by
+    every run of the cabinet, a QUIT, or any other event that stopped the
+    event loop, ends a session and the next one starts again in ATTRACT.
+    '''
+    import cortex
+
+    config = dict(config or {})
+    config.pop('record', None)
+    config['headless'] = True
+    ctex = cortex.Cortex(config)
+
+    scores = []
+    post_play = ctex.post_play
+
+    def record_score():
+        scores.append(ctex.game.score)
+        post_play()
+    ctex.post_play = record_score
+
+    # The game and its timers run on the clock of the log, so the learned
+    # ball flow times out as it did on the cabinet however fast the replay
+    now = [0]
+    ctex.timers.clock = lambda: now[0]
+    ctex.game.clock = lambda: now[0] / 1e9
+
+    modes = list(cortex.OperationMode.ALL)
+    mismatches = 0
+    events = 0
+    sessions = 1
+    ended = False
+    last = None
+    start = time.monotonic()
+    try:
+        for record in read(path):
+            if speed and last is not None and record.time > last:
+                time.sleep((record.time - last) / 1e9 / speed)
+            last = record.time
+            if record.kind == MODE:
+                if modes[record.code] != ctex.mode:
+                    mismatches += 1
+                continue
+            if record.kind != EVENT:
+                continue
+            events += 1
+            if ended:
+                sessions += 1
+                ended = False
+            now[0] = record.time
+            if not ctex.handle_event(make_event(record, ctex.TARGET_EVENT)):
+                # The next session starts afresh, as the cabinet does
+                ctex.attract()
+                ended = True
+            ctex.render.tick()
+            # Everything the handlers post or queue, e.g. the hit of a
+            # key, was recorded when it was handled
+            pygame.event.clear()
+            ctex.input_events.get_all()
+    finally:
+        ctex.shutdown()
+    elapsed = time.monotonic() - start
+    return {
+        'events': events,
+        'seconds': elapsed,
+        'events_per_second': events / elapsed if elapsed else 0.0,
+        'scores': scores,
+        'mode_mismatches': mismatches,
+        'sessions': sessions,
+    }
+
+
+def main():
+    import argparse
+    parser = argparse.ArgumentParser(description='Replay an event log.')
+    parser.add_argument('path')
+    parser.add_argument('--speed', type=float, default=None,
+                        help='replay at this multiple of real time')
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+    summary = replay(args.path, speed=args.speed)
+    print('Replayed {} events in {:.3f} s ({:.0f} events/s)'.format(
+        summary['events'], summary['seconds'], summary['events_per_second']))
+    print('Scores: {}'.format(summary['scores']))
+    if summary['mode_mismatches']:
+        print('Mode mismatches: {}'.format(summary['mode_mismatches']))
+    return 0
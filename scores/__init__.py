@@ -0,0 +1,210 @@
+'''
+Persistent high scores and game history.
+
+Every finished game is appended to an SQLite database in WAL mode by a
+background writer thread, so the event loop never waits on the SD card. A
+commit is atomic: a power cut mid write loses at most the games still
+queued, never the database.
+
+Rank and top score queries are answered from an in-memory index of the
+score counts, built when the store is opened.
+'''
+import logging
+import queue
+import sqlite3
+import threading
+import time
+
+from scores.drops import DropLog
+
+DEFAULT_PATH = 'scores.db'
+DEFAULT_CAPACITY = 4096
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    ended REAL NOT NULL,
+    score INTEGER NOT NULL
+)
+'''
+INSERT = 'INSERT INTO games (ended, score) VALUES (?, ?)'
+
+# Queued to stop the writer thread
+STOP = None
+
+
+class RankIndex(object):
+    '''Counts of each score, held in a Fenwick tree indexed by score.
+
+    Adding a score, the rank of a score and the score at a rank all take
+    O(log n) in the highest score. Scores are integers, the tree doubles
+    in size when a score does not fit. Negative scores, possible with
+    negative target points, are counted as 0.
+    '''
+    __slots__ = ('tree', 'total')
+
+    def __init__(self, capacity=DEFAULT_CAPACITY):
+        '''capacity is rounded up to a power of two.'''
+        size = 1
+        while size < capacity:
+            size *= 2
+        self.tree = [0] * (size + 1)
+        self.total = 0
+
+    def __len__(self):
+        return self.total
+
+    def grow(self, score):
+        '''Double the tree until score fits.'''
+        tree = self.tree
+        while score + 1 >= len(tree):
+            size = len(tree) - 1
+            # The new top node covers every existing count
+            tree.extend([0] * size)
+            tree[2 * size] = self.total
+
+    def add(self, score, count=1):
+        if score < 0:
+            score = 0
+        tree = self.tree
+        if score + 1 >= len(tree):
+            self.grow(score)
+        index = score + 1
+        size = len(tree)
+        while index < size:
+            tree[index] += count
+            index += index & -index
+        self.total += count
+
+    def count_below(self, score):
+        '''The number of scores lower than score.'''
+        tree = self.tree
+        index = min(score, len(tree) - 1)
+        count = 0
+        while index > 0:
+            count += tree[index]
+            index -= index & -index
+        return count
+
+    def rank(self, score):
+        '''The 1 based rank score has, or would have, among the scores.
+
+        Ties share the best rank.
+        '''
+        if score < 0:
+            score = 0
+        return self.total - self.count_below(score + 1) + 1
+
+    def select(self, position):
+        '''The score at 1 based position from the lowest.'''
+        tree = self.tree
+        index = 0
+        step = len(tree) - 1
+        while step:
+            if tree[index + step] < position:
+                index += step
+                position -= tree[index]
+            step //= 2
+        return index
+
+    def top(self, count):
+        '''The highest count scores, best first.'''
+        count = min(count, self.total)
+        return [self.select(self.total - offset) for offset in range(count)]
+
+
+class ScoreStore(object):
+    '''High scores and game history, written behind the event loop.'''
+
+    def __init__(self, path=None):
+        '''Open the store at path, or keep the scores in memory for None.'''
+        self.logger = logging.getLogger(__name__)
+        self.path = path
+        self.index = RankIndex()
+        self.queue = queue.Queue()
+        self.thread = None
+        if path is None:
+            return
+        connection = self.connect()
+        try:
+            with connection:
+                connection.execute(SCHEMA)
+            for score, count in connection.execute(
+                    'SELECT score, COUNT(*) FROM games GROUP BY score'):
+                self.index.add(score, count)
+        finally:
+            connection.close()
+        self.logger.info('Loaded %d games from %s', len(self.index), path)
+        self.thread = threading.Thread(target=self.run, name='scores')
+        self.thread.daemon = True
+        self.thread.start()
+
+    def connect(self):
+        connection = sqlite3.connect(self.path)
+        connection.execute('PRAGMA journal_mode=WAL')
+        # Sync the WAL on every commit, so a committed game survives a
+        # power cut. Games are committed in batches, this is cheap
+        connection.execute('PRAGMA synchronous=FULL')
+        return connection
+
+    def run(self):
+        '''Write queued games, one transaction per batch.'''
+        connection = self.connect()
+        running = True
+        while running:
+            rows = [self.queue.get()]
+            while True:
+                try:
+                    rows.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            if STOP in rows:
+                running = False
+                rows = [row for row in rows if row is not STOP]
+            try:
+                with connection:
+                    connection.executemany(INSERT, rows)
+            except sqlite3.Error:
+                self.logger.exception('Failed to store %d games', len(rows))
+            for _ in range(len(rows) + (not running)):
+                self.queue.task_done()
+        connection.close()
+
+    def add(self, score, ended=None):
+        '''Record a finished game, returns the rank of its score.'''
+        self.index.add(score)
+        if self.thread is not None:
+            self.queue.put((ended if ended is not None else time.time(),
+                            score))
+        return self.index.rank(score)
+
+    def rank(self, score):
+        return self.index.rank(score)
+
+    def top(self, count):
+        return self.index.top(count)
+
+    def history(self, count):
+        '''The last count games as (ended, score), most recent first.'''
+        if self.thread is None:
+            return []
+        self.flush()
+        connection = sqlite3.connect(self.path)
+        try:
+            return connection.execute(
+                'SELECT ended, score FROM games ORDER BY id DESC LIMIT ?',
+                (count,)).fetchall()
+        finally:
+            connection.close()
+
+    def flush(self):
+        '''Wait until every queued game has been written.'''
+        if self.thread is not None:
+            self.queue.join()
+
+    def close(self):
+        '''Write any queued games and stop the writer.'''
+        if self.thread is not None:
+            self.queue.put(STOP)
+            self.thread.join()
+            self.thread = None
@@ -0,0 +1,122 @@
+'''
+A columnar log of every ball drop.
+
+Each column is an append-only file of fixed size values in a directory,
+so the history can be read back a column and a chunk at a time:
+
+    game.col    uint32  game number, counting up from 0
+    target.col  uint8   target number
+    points.col  int32   points scored, with any bonus; may be negative
+    time.col    int64   wall clock time in nanoseconds
+
+The columns are written together but not atomically. A power cut may
+leave them different lengths, the shortest gives the rows to keep.
+'''
+import array
+import os
+import time
+
+# (column, array typecode, numpy dtype) in native byte order
+COLUMNS = (
+    ('game', 'I', '=u4'),
+    ('target', 'B', '=u1'),
+    ('points', 'i', '=i4'),
+    ('time', 'q', '=i8'),
+)
+DEFAULT_DIRECTORY = 'drops'
+EXTENSION = '.col'
+FLUSH_ROWS = 256
+
+
+def column_path(directory, name):
+    return os.path.join(directory, name + EXTENSION)
+
+
+def row_count(directory):
+    '''The number of complete rows in the log in directory.'''
+    rows = None
+    for name, typecode, _ in COLUMNS:
+        try:
+            size = os.path.getsize(column_path(directory, name))
+        except OSError:
+            size = 0
+        count = size // array.array(typecode).itemsize
+        rows = count if rows is None else min(rows, count)
+    return rows
+
+
+class DropLog(object):
+    '''Appends a row per ball drop to the columns in a directory.'''
+
+    def __init__(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.rows = row_count(directory)
+        self.files = {}
+        self.buffers = {}
+        for name, typecode, _ in COLUMNS:
+            path = column_path(directory, name)
+            log_file = open(path, 'ab')
+            # Drop anything past the last complete row
+            log_file.truncate(self.rows * array.array(typecode).itemsize)
+            self.files[name] = log_file
+            self.buffers[name] = array.array(typecode)
+        self.next_game = self.last_game() + 1
+        self.game = None
+
+    def last_game(self):
+        '''The last game number written, -1 for an empty log.'''
+        if not self.rows:
+            return -1
+        games = array.array('I')
+        with open(column_path(self.directory, 'game'), 'rb') as game_file:
+            game_file.seek((self.rows - 1) * games.itemsize)
+            games.fromfile(game_file, 1)
+        return games[0]
+
+    def start_game(self):
+        '''Number the drops that follow as a new game.'''
+        self.game = self.next_game
+        self.next_game += 1
+
+    def append(self, target, points, now=None):
+        '''Add a ball drop to the current game.'''
+        if self.game is None:
+            self.start_game()
+        buffers = self.buffers
+        buffers['game'].append(self.game)
+        buffers['target'].append(target)
+        buffers['points'].append(points)
+        buffers['time'].append(time.time_ns() if now is None else now)
+        if len(buffers['game']) >= FLUSH_ROWS:
+            self.flush()
+
+    def flush(self):
+        '''Write the buffered rows out to the columns.'''
+        self.write_rows(self.detach())
+
+    def detach(self):
+        '''Take the buffered rows, to be written with write_rows().
+
+        Lets the writing be done on another thread while drops carry on
+        being appended.
+        '''
+        buffers = self.buffers
+        self.buffers = dict((name, array.array(typecode))
+                            for name, typecode, _ in COLUMNS)
+        return buffers
+
+    def write_rows(self, buffers):
+        '''Write rows taken with detach() out to the columns.'''
+        count = len(buffers['game'])
+        if not count:
+            return
+        for name, _, _ in COLUMNS:
+            buffers[name].tofile(self.files[name])
+            self.files[name].flush()
+        self.rows += count
+
+    def close(self):
+        self.flush()
+        for log_file in self.files.values():
+            log_file.close()
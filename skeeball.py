@@ -1,33 +1,68 @@
 #!/usr/bin/env python
-import logging
 import sys
-import time
-import yaml
 
-import cortex
+import logs
 
+CONFIG_PATH = 'config.yaml'
 
-def main():
-    # Configure logging for the main module
-    logging.basicConfig(format='%(asctime)s %(message)s')
-    logger = logging.getLogger(__name__)
 
+def load_config(path=CONFIG_PATH):
+    '''Load the configuration, from the asset bundle if it is up to date.
+
+    The bundle keeps a parsed copy of the configuration, which saves
+    importing and running the YAML parser on every start.
+    '''
+    import bundle
+    manifest = bundle.load_manifest(bundle.DEFAULT_PATH)
+    if manifest is not None:
+        config = bundle.get_config(bundle.DEFAULT_PATH, manifest, path)
+        if config is not None:
+            config = dict(config)
+            config.setdefault('assets', bundle.DEFAULT_PATH)
+            return config
+
+    import yaml
+    loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
     try:
-        with open('config.yaml') as config_file:
-            config = yaml.safe_load(config_file.read())
+        with open(path) as config_file:
+            config = yaml.load(config_file.read(), Loader=loader)
     except IOError:
         config = {}
-    # Initialize the start-up machine state
-    #mach = machine.Machine()
-    ctex = cortex.Cortex(config)
-    ctex.event_loop()
-    return
-    for score in range(0, 1001, 250):
-        #disp.show_score(score)
-        time.sleep(1)
+    return config
+
 
+def main():
+    config = load_config()
+    logs.mark('config')
 
-    #cortext = cortex.Cortex(machine, display)
+    import bundle
+    import cortex
+    import scores
+    config.setdefault('cache', bundle.DEFAULT_CACHE)
+    config.setdefault('scores', scores.DEFAULT_PATH)
+    config.setdefault('drops', scores.drops.DEFAULT_DIRECTORY)
+
+    # Configure logging, records are written by a background thread
+    listener = logs.configure(config)
+
+    if config.get('lanes'):
+        # One worker process per lane, see the lanes module
+        import lanes
+        try:
+            lanes.LaneController(config).run()
+        finally:
+            listener.stop()
+        return 0
+
+    ctex = cortex.Cortex(config)
+    try:
+        if config.get('runtime') == 'asyncio':
+            from cortex import aio
+            aio.AsyncRuntime(ctex).run()
+        else:
+            ctex.event_loop()
+    finally:
+        listener.stop()
     return 0
 
 
@@ -0,0 +1,87 @@
+'''
+Simulated ball bursts driven through FakeGPIO on a virtual clock.
+'''
+import mock
+
+NS_PER_MS = 1000000
+NS_PER_US = 1000
+
+
+class VirtualClock(object):
+    '''A monotonic nanosecond clock that only moves when told to.'''
+
+    def __init__(self, now=0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class BurstHarness(object):
+    '''Rolls balls through targets and counts the hits the machine sees.'''
+
+    def __init__(self, machine, gpio):
+        self.machine = machine
+        self.gpio = gpio
+        self.clock = VirtualClock()
+        self.machine.clock = self.clock
+        self.transitions = []
+
+    def ball(self, pin, at, width=15 * NS_PER_MS, chatter=3):
+        '''Add one ball crossing a target's switch.
+
+        The switch chatters as it closes and again as it opens, the way a
+        worn microswitch does.
+        '''
+        self.transitions.append((at, pin, False))
+        t = at
+        for _ in range(chatter):
+            self.transitions.append((t + 200 * NS_PER_US, pin, True))
+            self.transitions.append((t + 400 * NS_PER_US, pin, False))
+            t += 400 * NS_PER_US
+        release = at + width
+        self.transitions.append((release, pin, True))
+        t = release
+        for _ in range(chatter):
+            self.transitions.append((t + 300 * NS_PER_US, pin, False))
+            self.transitions.append((t + 600 * NS_PER_US, pin, True))
+            t += 600 * NS_PER_US
+
+    def burst(self, pin, rate, seconds, **kwargs):
+        '''Add balls into one target at rate balls per second.'''
+        period = int(1e9 / rate)
+        for number in range(int(rate * seconds)):
+            self.ball(pin, (number + 1) * period, **kwargs)
+
+    def run_edges(self):
+        '''Play the transitions in edge mode, returns the hit events.'''
+        hits = []
+        for at, pin, level in sorted(self.transitions):
+            self.clock.now = at
+            self.gpio.set_input(pin, level)
+            hits.extend(self.machine.get_edge_events())
+        self.clock.now += 1000 * NS_PER_MS
+        hits.extend(self.poll())
+        return hits
+
+    def run_scans(self, interval):
+        '''Play the transitions in poll mode, scanning every interval ns.'''
+        transitions = sorted(self.transitions)
+        end = transitions[-1][0] + 1000 * NS_PER_MS
+        hits = []
+        position = 0
+        for now in range(0, end, interval):
+            while (position < len(transitions) and
+                   transitions[position][0] <= now):
+                _, pin, level = transitions[position]
+                self.gpio.levels[pin] = level
+                position += 1
+            self.clock.now = now
+            hits.extend(self.poll())
+        return hits
+
+    def poll(self):
+        '''Run one machine poll, returning the events it posted.'''
+        with mock.patch('machine.pygame.event.post') as post:
+            self.machine.poll()
+        return [call[0][0] for call in post.call_args_list]
@@ -1,13 +1,27 @@
+import threading
+import time
+
+
 class FakeGPIO(object):
     BCM = 'BCM'
     IN = 'IN'
+    OUT = 'OUT'
     PUD_UP = 'PUD_UP'
     FALLING = 'FALLING'
+    RISING = 'RISING'
+    BOTH = 'BOTH'
 
     def __init__(self):
         self.mode = None
         self.warnings = None
         self.pin_mapping = {}
+        self.levels = {}
+        # (monotonic ns, pin, level) of every change made by play()
+        self.history = []
+        # (monotonic ns, pin, level) of every output
+        self.outputs = []
+        # pin: FakePWM
+        self.pwms = {}
 
     def setmode(self, mode):
         self.mode = mode
@@ -30,5 +44,86 @@ class FakeGPIO(object):
         pin['callback'] = callback
         pin['bouncetime'] = bouncetime
 
+    def output(self, pin, level):
+        self.outputs.append((time.monotonic_ns(), pin, level))
+
+    def PWM(self, pin, frequency):
+        pwm = FakePWM(pin, frequency)
+        self.pwms[pin] = pwm
+        return pwm
+
     def input(self, pin):
-        return True
+        return self.levels.get(pin, True)
+
+    def set_input(self, pin, level):
+        '''Drive an input pin, firing any matching edge callback.
+
+        The callback runs in the caller's thread, the same way RPi.GPIO
+        runs callbacks in its own thread.
+        '''
+        previous = self.input(pin)
+        self.levels[pin] = level
+        if previous == level:
+            return
+        edge = self.FALLING if not level else self.RISING
+        callback = self.pin_mapping.get(pin, {}).get('callback')
+        if callback is None:
+            return
+        if self.pin_mapping[pin]['edge'] in (edge, self.BOTH):
+            callback(pin)
+
+    def play(self, script):
+        '''Play back a script of (seconds, pin, level) changes.
+
+        The changes are made from a background thread at their offsets from
+        now, which is returned. The time of each change is added to
+        history just before the pin is driven.
+        '''
+        def run():
+            start = time.monotonic()
+            for at, pin, level in sorted(script):
+                delay = start + at - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+                self.history.append((time.monotonic_ns(), pin, level))
+                self.set_input(pin, level)
+        thread = threading.Thread(target=run)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+
+class FakePWM(object):
+    '''A PWM channel that records when its duty cycle changes.'''
+
+    def __init__(self, pin, frequency):
+        self.pin = pin
+        self.frequency = frequency
+        self.duty = None
+        # (monotonic ns, duty) of every change, including start()
+        self.timeline = []
+
+    def start(self, duty):
+        self.ChangeDutyCycle(duty)
+
+    def ChangeDutyCycle(self, duty):
+        self.duty = duty
+        self.timeline.append((time.monotonic_ns(), duty))
+
+    def stop(self):
+        self.duty = None
+
+
+def ball_drops(pins, count, interval, width=0.015, start=0.1):
+    '''A script of count balls, one every interval seconds.
+
+    The balls drop into each of pins in turn, holding the pin low for
+    width seconds.
+    '''
+    script = []
+    for number in range(count):
+        at = start + number * interval
+        pin = pins[number % len(pins)]
+        script.append((at, pin, False))
+        script.append((at + width, pin, True))
+    return script
@@ -0,0 +1,63 @@
+import shutil
+import tempfile
+import unittest
+
+import analytics
+import game
+import scores
+
+
+class TestAnalytics(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        log = scores.DropLog(self.tmp)
+        state = game.Game()
+        state.drops = log
+        # Three games, target 7 is never hit
+        self.scores = []
+        for number, hits in enumerate(([1, 2, 3], [6, 6], [5, 1, 1, 4])):
+            state.start_game()
+            now = number * 100 * 10**9
+            for target in hits:
+                state.drops.append(target, state.targets[target], now)
+                state.drops.append(0, 0, now + 10**9)
+                now += 10**9
+            state.score = sum(state.targets[t] for t in hits)
+            self.scores.append(state.score)
+        log.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_report(self):
+        report = analytics.analyse(self.tmp, dead_games=3)
+        assert report['games'] == 3
+        assert report['balls'] == 9
+        assert report['hits'][1] == 3
+        assert report['hit_rate'][6] == 2 / 9
+        assert report['mean_score'] == sum(self.scores) / 3
+        assert report['mean_length_s'] == 3.0
+        assert report['dead_targets'] == [7]
+        assert sum(report['score_histogram'].values()) == 3
+
+    def test_chunks(self):
+        whole = analytics.analyse(self.tmp)
+        for chunk_rows in (1, 2, 5):
+            assert analytics.analyse(self.tmp, chunk_rows) == whole
+
+    def test_combine(self):
+        report = analytics.analyse(self.tmp)
+        total = analytics.combine([report, report])
+        assert total['games'] == 6
+        assert total['mean_score'] == report['mean_score']
+
+    def test_negative_scores(self):
+        log = scores.DropLog(self.tmp)
+        log.start_game()
+        log.append(5, -120, 10**12)
+        log.close()
+        report = analytics.analyse(self.tmp)
+        assert report['games'] == 4
+        assert report['score_histogram'][-150] == 1
+        assert sum(report['score_histogram'].values()) == 4
@@ -1,7 +1,202 @@
+import mock
+import shutil
+import tempfile
 import unittest
 
 import cortex
+from cortex import aio
+from burst import VirtualClock
+import scores
 
 class TestOperationModes(unittest.TestCase):
     def test_attract(self):
-        assert cortex.OperationMode.ATTRACT == 'ATTRACT'
\ No newline at end of file
+        assert cortex.OperationMode.ATTRACT == 'ATTRACT'
+
+
+class TestModeRates(unittest.TestCase):
+    def make_cortex(self, config):
+        with mock.patch('display.Display'):
+            return cortex.Cortex(config)
+
+    def test_default_rates(self):
+        ctex = self.make_cortex({})
+        assert ctex.get_rates(cortex.OperationMode.ATTRACT) == (100, 10)
+        assert ctex.get_rates(cortex.OperationMode.SHUTDOWN) == (
+            ctex.POLL_SPEED, 30)
+
+    def test_configured_rates(self):
+        ctex = self.make_cortex({
+            'modes': {cortex.OperationMode.PLAY: {'fps': 60}}})
+        assert ctex.get_rates(cortex.OperationMode.PLAY) == (10, 60)
+        ctex.set_mode(cortex.OperationMode.PLAY)
+        poll, = ctex.mode_timers
+        assert poll.period == 10 * cortex.machine.NS_PER_MS
+        assert poll.args[0].type == ctex.POLL_EVENT
+        assert ctex.render.period == 1000000000 // 60
+
+    def test_wait_for_frame(self):
+        ctex = self.make_cortex({})
+        ctex.render.request()
+        ctex.render.next_frame = ctex.render.clock() + 5000000
+        with mock.patch('cortex.pygame.event.wait') as wait:
+            wait.return_value = cortex.pygame.event.Event(
+                cortex.pygame.NOEVENT)
+            assert ctex.wait_events() == []
+        assert 0 < wait.call_args[0][0] <= 5
+
+
+class TestDispatch(unittest.TestCase):
+    def setUp(self):
+        with mock.patch('display.Display'):
+            self.ctex = cortex.Cortex({})
+        self.ctex.hit_target = mock.Mock()
+        self.ctex.play = mock.Mock()
+
+    def test_target_only_in_play(self):
+        event = cortex.pygame.event.Event(self.ctex.TARGET_EVENT, sub=(1, 10))
+        self.ctex.mode = cortex.OperationMode.ATTRACT
+        assert self.ctex.handle_event(event)
+        self.ctex.hit_target.assert_not_called()
+        self.ctex.mode = cortex.OperationMode.PLAY
+        assert self.ctex.handle_event(event)
+        self.ctex.hit_target.assert_called_once_with(event)
+
+    def test_start(self):
+        event = cortex.pygame.event.Event(self.ctex.START_EVENT)
+        self.ctex.mode = cortex.OperationMode.ATTRACT
+        self.ctex.handle_event(event)
+        self.ctex.mode = cortex.OperationMode.PLAY
+        self.ctex.handle_event(event)
+        self.ctex.play.assert_called_once_with()
+
+    def test_quit(self):
+        event = cortex.pygame.event.Event(cortex.pygame.QUIT)
+        assert not self.ctex.handle_event(event)
+
+    def test_key_hits_target(self):
+        event = cortex.pygame.event.Event(cortex.pygame.KEYDOWN, key=ord('3'))
+        assert self.ctex.handle_event(event)
+        hit, = self.ctex.input_events.get_all()
+        assert hit.sub[0] == 3
+
+
+class TestHighScores(unittest.TestCase):
+    def test_game_is_ranked(self):
+        with mock.patch('display.Display'):
+            ctex = cortex.Cortex({})
+        ctex.play()
+        ctex.game.score = 450
+        ctex.post_play()
+        ctex.attract()
+        assert ctex.mode == cortex.OperationMode.ATTRACT
+        ctex.display.set_high_scores.assert_called_once_with([450])
+
+
+class TestTimedActions(unittest.TestCase):
+    def setUp(self):
+        self.clock = VirtualClock()
+        with mock.patch('display.Display'):
+            self.ctex = cortex.Cortex({'post_play_ms': 1000,
+                                       'attract_ms': 500})
+        self.ctex.timers.clock = self.clock
+        self.posted = []
+        patcher = mock.patch('cortex.pygame.event.post',
+                             side_effect=self.posted.append)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def advance(self, ms):
+        self.clock.now += ms * cortex.machine.NS_PER_MS
+        self.ctex.timers.run()
+        types = [event.type for event in self.posted]
+        del self.posted[:]
+        return types
+
+    def test_post_play_timeout(self):
+        ctex = self.ctex
+        ctex.set_mode(cortex.OperationMode.PLAY)
+        ctex.post_play()
+        assert ctex.POST_PLAY_TIMEOUT not in self.advance(999)
+        assert ctex.POST_PLAY_TIMEOUT in self.advance(1)
+        assert ctex.timers.timeout() is not None
+
+    def test_timeout_cancelled_by_play(self):
+        ctex = self.ctex
+        ctex.post_play()
+        ctex.play()
+        assert ctex.POST_PLAY_TIMEOUT not in self.advance(2000)
+
+    def test_attract_rotation(self):
+        ctex = self.ctex
+        ctex.last_score = 450
+        ctex.attract()
+        assert self.advance(500).count(ctex.ATTRACT_EVENT) == 1
+        ctex.rotate_attract()
+        ctex.display.set_score.assert_called_once_with(450, 0, 0, [],
+                                                       final=True)
+        # Missed periods are skipped, not run back to back
+        assert self.advance(5000).count(ctex.ATTRACT_EVENT) == 1
+
+    def test_edge_mode_does_not_poll(self):
+        with mock.patch('display.Display'):
+            ctex = cortex.Cortex({'input_mode': 'edge'})
+        ctex.set_mode(cortex.OperationMode.PLAY)
+        assert ctex.mode_timers == []
+
+    def test_stalled_game_ends(self):
+        ctex = self.ctex
+        ctex.game.clock = lambda: self.clock.now / 1e9
+        ctex.play()
+        stall_ms = int(ctex.game.flow.stall_timeout() * 1000)
+        self.advance(stall_ms // 2)
+        # A ball resets the stall timeout
+        ctex.hit_target(mock.Mock(sub=(3, 150)))
+        assert ctex.END_EVENT not in self.advance(stall_ms - 1)
+        assert ctex.END_EVENT in self.advance(1)
+
+
+class TestAsyncRuntime(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        with mock.patch('display.Display'):
+            self.ctex = cortex.Cortex({'drops': self.tmp})
+        cortex.pygame.event.clear()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_start_then_quit(self):
+        ctex = self.ctex
+        ctex.play = mock.Mock()
+        ctex.input_events.put(ctex.start_event, cortex.machine.events.CONTROL)
+        cortex.pygame.event.post(cortex.pygame.event.Event(cortex.pygame.QUIT))
+        aio.AsyncRuntime(ctex).run()
+        ctex.play.assert_called_once_with()
+        assert ctex.machine.wake is None
+
+    def test_persist_in_executor(self):
+        ctex = self.ctex
+        ctex.game.drops.append(3, 150, now=1)
+        # Starting a game writes out the last one
+        ctex.play = lambda: ctex.persist()
+        ctex.input_events.put(ctex.start_event, cortex.machine.events.CONTROL)
+        cortex.pygame.event.post(cortex.pygame.event.Event(cortex.pygame.QUIT))
+        runtime = aio.AsyncRuntime(ctex)
+        runtime.run()
+        assert len(runtime.writes) == 1
+        assert scores.drops.row_count(self.tmp) == 1
+
+    def test_edge_mode_attract_rotates(self):
+        with mock.patch('display.Display'):
+            ctex = cortex.Cortex({'drops': self.tmp, 'input_mode': 'edge',
+                                  'attract_ms': 10})
+        ctex.set_mode(cortex.OperationMode.POST_PLAY)
+        # The rotation timer is added by a handler in the frame task, and
+        # no poll tick wakes the input task to run it
+        cortex.pygame.event.post(
+            cortex.pygame.event.Event(ctex.POST_PLAY_TIMEOUT))
+        ctex.timers.post_later(200 * cortex.machine.NS_PER_MS,
+                               cortex.pygame.event.Event(cortex.pygame.QUIT))
+        aio.AsyncRuntime(ctex).run()
+        assert ctex.mode == cortex.OperationMode.ATTRACT
+        assert ctex.attract_page >= 5
@@ -1,4 +1,9 @@
 import mock
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
 import unittest
 
 import display
@@ -15,3 +20,223 @@ class TestDisplay(unittest.TestCase):
         pygame.display.list_modes = mock.Mock(return_value=resolutions)
         d = display.Display(self.mock_config, True, pygame)
         assert d.get_fullscreen_resolution() == resolutions[0]
+
+
+class TestCompositor(unittest.TestCase):
+
+    def setUp(self):
+        self.pygame = mock.Mock()
+        self.screen = display.pygame.Surface((100, 100))
+        self.background = display.pygame.Surface((100, 100))
+        self.background.fill((1, 2, 3))
+        self.compositor = display.Compositor(self.screen, self.background,
+                                             self.pygame)
+
+    def test_first_frame_updates_screen(self):
+        rects = self.compositor.present()
+        assert rects == [self.screen.get_rect()]
+        self.pygame.display.update.assert_called_once_with(rects)
+
+    def test_restores_only_drawn_regions(self):
+        self.compositor.present()
+        sprite = display.pygame.Surface((10, 10))
+        sprite.fill((255, 255, 255))
+        self.compositor.blit(sprite, (5, 5))
+        assert self.compositor.present() == [display.pygame.Rect(5, 5, 10, 10)]
+        self.compositor.clear()
+        self.compositor.blit(sprite, (50, 50))
+        rects = self.compositor.present()
+        assert rects == [display.pygame.Rect(5, 5, 10, 10),
+                         display.pygame.Rect(50, 50, 10, 10)]
+        assert self.screen.get_at((6, 6))[:3] == (1, 2, 3)
+        assert self.screen.get_at((51, 51))[:3] == (255, 255, 255)
+        assert self.pygame.display.update.call_count == 3
+
+
+class TestGlyphs(unittest.TestCase):
+
+    def setUp(self):
+        display.pygame.font.init()
+        self.font = display.pygame.font.Font(None, 32)
+
+    def test_atlas_draws_each_digit(self):
+        atlas = display.GlyphAtlas(self.font, (255, 255, 0))
+        assert '1250' in atlas
+        assert 'Final' not in atlas
+        compositor = mock.Mock()
+        rects = atlas.draw(compositor, '1250', (100, 100))
+        assert len(rects) == 4
+        assert compositor.blit.call_count == 4
+        assert atlas.width('1250') > atlas.width('12')
+
+    def test_text_cache(self):
+        cache = display.TextCache(capacity=2)
+        first = cache.get(self.font, 'Final Score', (255, 255, 0))
+        assert cache.get(self.font, 'Final Score', (255, 255, 0)) is first
+        assert (cache.hits, cache.misses) == (1, 1)
+        cache.get(self.font, 'a', (0, 0, 0))
+        cache.get(self.font, 'b', (0, 0, 0))
+        assert len(cache) == 2
+        # The least recently used entry was evicted
+        assert cache.get(self.font, 'Final Score', (255, 255, 0)) is not first
+        assert cache.misses == 4
+
+
+class TestBoard(unittest.TestCase):
+
+    def test_default_layout(self):
+        layout = display.BoardLayout((1440, 900))
+        assert layout.size == (720, 900)
+        assert layout.position == (720, 0)
+        assert layout.targets[1] == display.pygame.Rect(310, 725, 100, 100)
+
+    def test_layout_scales(self):
+        layout = display.BoardLayout((2880, 1800))
+        assert layout.targets[7] == display.pygame.Rect(1230, 10, 200, 200)
+
+    def test_custom_layout(self):
+        config = {'size': [100, 100], 'targets': {'1': [10, 10, 20, 20]},
+                  'arcs': []}
+        layout = display.BoardLayout((400, 200), config)
+        assert layout.targets == {1: display.pygame.Rect(20, 20, 40, 40)}
+
+    def test_highlight_animation(self):
+        layout = display.BoardLayout((400, 300))
+        sprites = display.BoardSprites(layout, (0, 255, 0), (255, 255, 0))
+        assert len(sprites.lit[1]) == sprites.FRAMES
+        highlight = display.Highlight(sprites)
+        compositor = mock.Mock()
+        highlight.start(3)
+        frames = 1
+        while highlight.draw(compositor):
+            frames += 1
+        assert frames == sprites.FRAMES
+        last = compositor.blit.call_args[0]
+        assert last[0] is sprites.lit[3][-1]
+        assert last[1] == sprites.position(3)
+        # Settled on the lit frame
+        assert not highlight.draw(compositor)
+        highlight.start(0)
+        assert highlight.target is None
+
+
+class TestRenderScheduler(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 0
+        self.render = mock.Mock(return_value=False)
+        self.scheduler = display.RenderScheduler(self.render, fps=50,
+                                                 clock=lambda: self.now)
+
+    def test_idle(self):
+        assert self.scheduler.timeout(0) is None
+        assert not self.scheduler.tick()
+        assert self.render.call_count == 0
+
+    def test_requests_coalesce(self):
+        for _ in range(5):
+            self.scheduler.request()
+        assert self.scheduler.tick()
+        assert self.render.call_count == 1
+        stats = self.scheduler.stats()
+        assert stats['requests'] == 5
+        assert stats['coalesced'] == 4
+
+    def test_rate_limited(self):
+        self.scheduler.request()
+        self.scheduler.tick()
+        self.scheduler.request()
+        self.now = 10000000
+        assert self.scheduler.timeout(self.now) == 10000000
+        assert not self.scheduler.tick()
+        self.now = 20000000
+        assert self.scheduler.tick()
+        assert self.scheduler.stats()['dropped'] == 0
+
+    def test_animation_and_dropped_frames(self):
+        self.render.return_value = True
+        self.scheduler.request()
+        self.scheduler.tick()
+        # Still animating, so a frame is due without a new request
+        self.now = 80000000
+        assert self.scheduler.tick()
+        assert self.scheduler.stats()['dropped'] == 3
+
+
+class TestAssets(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.pattern = os.path.join(self.tmp, 'background.png')
+        surface = display.pygame.Surface((20, 10))
+        surface.fill((10, 20, 30))
+        display.pygame.image.save(surface, self.pattern)
+        self.path = os.path.join(self.tmp, 'assets')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_round_trip(self):
+        config = {'background': self.pattern, 'score_font': ''}
+        display.assets.build(config, (40, 30), self.path)
+        bundle = display.assets.load(self.path)
+        background = bundle.background((40, 30), self.pattern)
+        # The image is scaled to cover the whole screen
+        assert background.get_at((0, 0))[:3] == (10, 20, 30)
+        assert background.get_at((39, 29))[:3] == (10, 20, 30)
+        # Built for another screen size
+        assert bundle.background((80, 60), self.pattern) is None
+        assert bundle.get_config(None) is None
+        assert bundle.font('text_font', 12).get_height() > 0
+
+    def test_config_keeps_key_types(self):
+        config_path = os.path.join(self.tmp, 'config.yaml')
+        open(config_path, 'w').close()
+        config = {'background': self.pattern, 'score_font': '',
+                  'debounce': {'targets': {0: {'rearm_us': 5000}}}}
+        display.assets.build(config, (40, 30), self.path, config_path)
+        bundled = display.assets.load(self.path).get_config(config_path)
+        assert bundled['debounce']['targets'][0] == {'rearm_us': 5000}
+
+    def test_scaled_cache(self):
+        cache = display.assets.ScaledCache(self.path)
+        background = cache.background(self.pattern, (40, 30))
+        assert background.get_size() == (40, 30)
+        assert os.path.exists(cache.path(self.pattern, (40, 30)))
+        with mock.patch('display.assets.compose_background') as compose:
+            cached = cache.background(self.pattern, (40, 30))
+        compose.assert_not_called()
+        assert cached.get_at((20, 15)) == background.get_at((20, 15))
+
+    def test_missing(self):
+        with mock.patch('bundle.logger'):
+            assert display.assets.load(self.path) is None
+
+    def test_config_without_pygame(self):
+        # The cabinet reads its configuration before pygame is imported
+        config_path = os.path.join(self.tmp, 'config.yaml')
+        open(config_path, 'w').close()
+        config = {'background': self.pattern, 'score_font': '', 'fps': 30}
+        display.assets.build(config, (40, 30), self.path, config_path)
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        output = subprocess.check_output([
+            sys.executable, '-c',
+            'import sys, skeeball; '
+            'print(skeeball.load_config()["fps"], "pygame" in sys.modules)'],
+            cwd=self.tmp, env=dict(os.environ, PYTHONPATH=root))
+        assert output.split() == [b'30', b'False']
+
+
+class TestLayout(unittest.TestCase):
+
+    def test_reference(self):
+        layout = display.Layout((1440, 900))
+        assert layout.score_font_size == 256
+        assert layout.final_label == (720, 200)
+
+    def test_scaled(self):
+        layout = display.Layout((3840, 2160), {'bonus': (0, 100)})
+        assert layout.scale == 2.4
+        assert layout.text_font_size == 307
+        assert layout.score == (1920, 1080)
+        assert layout.bonus == (1920, 1320)
@@ -54,4 +54,135 @@ class TestGame(unittest.TestCase):
 
     def test_target_invalid_target(self):
         '''Hitting an invalid target number has a 0 point value.'''
-        assert self.game.get_target_value(10) == 0
\ No newline at end of file
+        assert self.game.get_target_value(10) == 0
+
+class TestRules(unittest.TestCase):
+    CONFIG = {
+        'game': 'bonus',
+        'games': {
+            'bonus': {
+                'balls': 3,
+                'targets': {0: 0, 1: 50, 2: 100},
+                'rules': [
+                    {'name': 'Double', 'multiplier': 2, 'balls': [3]},
+                    {'name': 'Streak', 'streak': 2, 'targets': [2],
+                     'bonus': 500},
+                ],
+            },
+            'timed': {
+                'balls': 0,
+                'seconds': 30,
+                'targets': {0: 0, 1: 10},
+            },
+        },
+    }
+
+    def setUp(self):
+        self.now = 0
+        with mock.patch('game.Game.log'):
+            self.game = game.Game(self.CONFIG, clock=lambda: self.now)
+            self.game.log = mock.Mock()
+
+    def roll(self, target):
+        '''Roll a ball into target and then the catch-all.'''
+        self.game.drop_ball(target)
+        points, bonus = self.game.points, self.game.bonus
+        self.game.drop_ball(0)
+        return points, bonus
+
+    def test_default_game(self):
+        with mock.patch('game.Game.log'):
+            midway = game.Game()
+        assert midway.targets == game.Game.MIDWAY
+        assert midway.remaining_balls == 9
+
+    def test_multiplier_and_streak(self):
+        assert self.roll(2) == (100, ())
+        assert self.roll(2) == (600, ('Streak',))
+        assert self.roll(1) == (100, ('Double',))
+        assert self.game.score == 800
+        assert self.game.check_game_over()
+
+    def test_miss_breaks_streak(self):
+        self.roll(2)
+        # The second ball scores nothing
+        self.game.drop_ball(0)
+        assert self.game.bonus == ()
+        assert self.roll(2) == (200, ('Double',))
+
+    def test_timed(self):
+        self.game.select('timed')
+        self.game.start_game()
+        for _ in range(20):
+            self.roll(1)
+        assert not self.game.check_game_over()
+        self.now = 30
+        assert self.game.check_game_over()
+
+    def test_fractional_multiplier(self):
+        rules = game.rules.Rules('half', {
+            'balls': 1, 'targets': {0: 0, 1: 25},
+            'rules': [{'multiplier': 1.5}]})
+        points, _ = rules.points[0][1]
+        assert points == 38 and isinstance(points, int)
+
+    def test_states(self):
+        '''Streaks compile to one state per combination of counts.'''
+        compiled = self.game.rules
+        assert len(compiled.transitions) == 2 * compiled.symbols
+
+
+class TestBallFlow(unittest.TestCase):
+
+    def setUp(self):
+        self.now = 0
+        with mock.patch('game.Game.log'):
+            self.game = game.Game(clock=lambda: self.now)
+            self.game.log = mock.Mock()
+        self.flow = self.game.flow
+
+    def roll(self, target, transit=0.5, gap=3):
+        '''Roll a ball, then move on to when the next is rolled.'''
+        self.game.drop_ball(target)
+        self.now += transit
+        self.game.drop_ball(0)
+        self.now += gap - transit
+
+    def test_learns_transit(self):
+        for _ in range(9):
+            self.roll(1)
+        assert self.game.check_game_over()
+        assert self.flow.transit.high is not None
+        assert abs(self.flow.transit.mean - 0.5) < 1e-6
+        assert self.flow.gap.mean == 3
+
+    def test_missed_catch_all(self):
+        for _ in range(8):
+            self.roll(1)
+        self.game.start_game()
+        # The catch-all edge of the first ball is missed
+        self.game.drop_ball(2)
+        self.now += 3
+        for _ in range(8):
+            # Balls that score nothing
+            self.game.drop_ball(0)
+            self.now += 3
+        assert self.game.remaining_balls == 0
+        assert self.game.check_game_over()
+        assert self.flow.lost == 1
+
+    def test_catch_too_soon_is_a_new_ball(self):
+        for _ in range(8):
+            self.roll(1)
+        self.game.start_game()
+        self.game.drop_ball(1)
+        self.now += 0.05
+        # Another ball that scored nothing, before the first could arrive
+        self.game.drop_ball(0)
+        assert self.game.remaining_balls == 7
+
+    def test_stalled(self):
+        self.game.drop_ball(1)
+        assert not self.game.check_game_over()
+        self.now += self.flow.stall_timeout()
+        assert self.game.check_game_over()
@@ -0,0 +1,61 @@
+import mock
+import sys
+import unittest
+
+import lanes
+
+
+def exit_with(config):
+    '''A lane that exits at once, with the code in its configuration.'''
+    sys.exit(config['exit'])
+
+
+class TestLaneConfig(unittest.TestCase):
+    CONFIG = {
+        'scores': 'scores.db',
+        'drops': 'drops',
+        'fps': 30,
+        'lanes': [
+            {'pins': {'base': 20, 'start': 19, 'servo': 12}},
+            {'pins': {'base': 4, 'start': 3, 'servo': 13},
+             'scores': 'other.db', 'fps': 20},
+        ],
+    }
+
+    def test_lane_files(self):
+        config = lanes.lane_config(self.CONFIG, 0)
+        assert config['lane'] == 0
+        assert config['scores'] == 'scores-0.db'
+        assert config['drops'] == 'drops-0'
+        assert config['logging']['path'] == 'skeeball-0.log'
+        assert 'lanes' not in config
+
+    def test_overrides(self):
+        config = lanes.lane_config(self.CONFIG, 1)
+        assert config['pins']['base'] == 4
+        assert config['scores'] == 'other.db'
+        assert config['fps'] == 20
+        assert self.CONFIG['fps'] == 30
+
+    def test_metrics_per_lane(self):
+        config = dict(self.CONFIG, metrics={'port': 9100,
+                                            'snapshot': 'metrics.json'})
+        config = lanes.lane_config(config, 1)
+        assert config['metrics'] == {'port': 9101,
+                                     'snapshot': 'metrics-1.json'}
+
+    def test_cpus(self):
+        with mock.patch('lanes.get_cpus', return_value=[0, 1]):
+            assert lanes.lane_config(self.CONFIG, 0)['cpu'] == 0
+            assert lanes.lane_config(self.CONFIG, 1)['cpu'] == 1
+
+
+class TestLaneController(unittest.TestCase):
+
+    def test_crashed_lane_restarts(self):
+        config = {'lanes': [{'exit': 0}, {'exit': 3}]}
+        controller = lanes.LaneController(config, target=exit_with)
+        with mock.patch('lanes.MAX_RESTARTS', 1):
+            controller.run()
+        assert controller.restarts == [0, 1]
+        assert controller.processes == [None, None]
@@ -0,0 +1,85 @@
+import logging
+import mock
+import os
+import queue
+import shutil
+import tempfile
+import unittest
+
+import logs
+
+
+class TestEventFormatter(unittest.TestCase):
+
+    def test_fields(self):
+        record = logging.LogRecord('cortex', logging.INFO, __file__, 1,
+                                   'hit', None, None)
+        record.fields = {'target': 1, 'points': 50}
+        line = logs.EventFormatter().format(record)
+        assert line.endswith(' I cortex hit target=1 points=50')
+
+
+class TestEvent(unittest.TestCase):
+
+    def test_disabled_level(self):
+        logger = logging.getLogger('test_logs.disabled')
+        logger.setLevel(logging.WARNING)
+        with mock.patch.object(logger, 'log') as log:
+            logs.event(logger, logging.INFO, 'hit', target=1)
+        assert log.call_count == 0
+
+
+class TestDroppingQueueHandler(unittest.TestCase):
+
+    def test_drops_when_full(self):
+        handler = logs.DroppingQueueHandler(queue.Queue(1))
+        record = logging.LogRecord('x', logging.INFO, __file__, 1,
+                                   'msg %s', (1,), None)
+        handler.handle(record)
+        handler.handle(record)
+        assert handler.dropped == 1
+        # Records are queued unformatted
+        assert handler.queue.get_nowait().args == (1,)
+
+
+class TestConfigure(unittest.TestCase):
+
+    def setUp(self):
+        self.root = logging.getLogger()
+        self.handlers = self.root.handlers[:]
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        for handler in self.root.handlers[:]:
+            self.root.removeHandler(handler)
+        for handler in self.handlers:
+            self.root.addHandler(handler)
+        shutil.rmtree(self.tmp)
+
+    def test_written_by_listener(self):
+        path = os.path.join(self.tmp, 'test.log')
+        listener = logs.configure({'logging': {'path': path,
+                                               'max_bytes': 200}})
+        logger = logging.getLogger('test_logs.configure')
+        logger.setLevel(logging.INFO)
+        for number in range(20):
+            logs.event(logger, logging.INFO, 'hit', number=number)
+        listener.stop()
+        with open(path) as log_file:
+            assert 'hit number=19' in log_file.read()
+        # The file is capped, older records were rotated out
+        assert os.path.getsize(path) <= 200
+        assert sorted(os.listdir(self.tmp)) == ['test.log', 'test.log.1']
+
+
+class TestTimeline(unittest.TestCase):
+
+    def test_marks(self):
+        timeline = logs.Timeline(start=1000000)
+        timeline.mark('first_frame', now=3000000)
+        timeline.mark('first_frame', now=9000000)
+        timeline.mark('input_ready', now=5000000)
+        assert timeline.report() == {'first_frame': 2.0, 'input_ready': 4.0}
+
+    def test_process_start(self):
+        assert logs.process_start_ns() <= logs.startup.start + 1000000
@@ -1,8 +1,25 @@
 import mock
+import threading
+import time
 import unittest
 
+import burst
 import machine
+import timers
 import fake_gpio
+from machine import events, ring, scanner
+
+
+def drop_one_ball(ring_name, inputs, settings, stop):
+    '''An input process whose second input sees one ball.'''
+    gpio = fake_gpio.FakeGPIO()
+    pin = inputs[1][1]
+    gpio.play([(0.05, pin, False), (0.07, pin, True)])
+    scanner.run_input(ring_name, inputs, settings, stop, gpio=gpio)
+
+
+def crash(ring_name, inputs, settings, stop):
+    raise SystemExit(3)
 
 
 class TestMachine(unittest.TestCase):
@@ -22,3 +39,439 @@ class TestMachine(unittest.TestCase):
         assert len(m.triggers) == 0
         m.create_trigger('test', 1, 0, 0)
         assert len(m.triggers) == 1
+
+
+class TestEdgeMode(unittest.TestCase):
+
+    def setUp(self):
+        self.gpio = fake_gpio.FakeGPIO()
+        self.start_event = machine.pygame.event.Event(1)
+        self.m = machine.Machine(self.start_event, gpio=self.gpio,
+                                 input_mode=machine.EDGE_MODE)
+
+    def test_event_detect_configured(self):
+        trigger = self.m.create_trigger('test', 1, 2, (1, 50))
+        pin = self.gpio.pin_mapping[trigger.pin]
+        assert pin['edge'] == self.gpio.BOTH
+        assert pin['callback'] == trigger.callback
+        start = self.gpio.pin_mapping[self.m.START_PIN]
+        assert start['callback'] == self.m.start_callback
+
+    def test_edges_queued_with_time(self):
+        trigger = self.m.create_trigger('test', 1, 2, (1, 50))
+        before = machine.time.monotonic_ns()
+        self.gpio.set_input(trigger.pin, False)
+        self.gpio.set_input(trigger.pin, True)
+        events = self.m.get_edge_events()
+        assert len(events) == 1
+        assert events[0].type == 2
+        assert events[0].sub == (1, 50)
+        assert events[0].edge_time >= before
+        assert self.m.get_edge_events() == []
+
+    def test_start_edge(self):
+        self.gpio.set_input(self.m.START_PIN, False)
+        events = self.m.get_edge_events()
+        assert [event.type for event in events] == [1]
+
+    def test_pulse_confirmed_by_timer(self):
+        clock = burst.VirtualClock()
+        self.m.clock = clock
+        self.m.timers = timers.Timers(clock)
+        self.m.debounce = {'min_pulse_us': 5000}
+        trigger = self.m.create_trigger('test', 1, 2, (1, 50))
+        self.gpio.set_input(trigger.pin, False)
+        assert self.m.get_edge_events() == []
+        assert self.m.timers.timeout() == 5 * machine.NS_PER_MS
+        clock.now += 5 * machine.NS_PER_MS
+        with mock.patch('machine.pygame.event.post') as post:
+            self.m.timers.run()
+        assert post.call_args[0][0].sub == (1, 50)
+
+
+class TestInputBank(unittest.TestCase):
+
+    def setUp(self):
+        self.bank = machine.InputBank()
+        self.bank.add('a', 20, 'a', min_pulse=0, rearm=10000)
+        self.bank.add('b', 21, 'b', min_pulse=1000, rearm=10000)
+        self.levels = {20: 1, 21: 1}
+
+    def test_scan_fires_low_pins(self):
+        self.levels[20] = 0
+        assert self.bank.scan(self.levels.get, 0) == [0]
+        assert self.bank.state[0] == self.bank.ACTIVE
+        # Held low does not fire again
+        assert self.bank.scan(self.levels.get, 20 * machine.NS_PER_MS) == []
+
+    def test_rearm(self):
+        self.levels[20] = 0
+        assert self.bank.scan(self.levels.get, 0) == [0]
+        self.levels[20] = 1
+        assert self.bank.scan(self.levels.get, 1 * machine.NS_PER_MS) == []
+        self.levels[20] = 0
+        assert self.bank.scan(self.levels.get, 5 * machine.NS_PER_MS) == []
+        assert self.bank.suppressed[0] == 1
+        self.levels[20] = 1
+        assert self.bank.scan(self.levels.get, 6 * machine.NS_PER_MS) == []
+        self.levels[20] = 0
+        assert self.bank.scan(self.levels.get, 16 * machine.NS_PER_MS) == [0]
+        assert self.bank.hits[0] == 2
+
+    def test_min_pulse(self):
+        self.levels[21] = 0
+        assert self.bank.scan(self.levels.get, 0) == []
+        assert self.bank.state[1] == self.bank.PENDING
+        # A glitch shorter than the minimum pulse is dropped
+        self.levels[21] = 1
+        assert self.bank.scan(self.levels.get, 500 * machine.NS_PER_US) == []
+        assert self.bank.suppressed[1] == 1
+        self.levels[21] = 0
+        assert self.bank.scan(self.levels.get, 1 * machine.NS_PER_MS) == []
+        assert self.bank.scan(self.levels.get, 2 * machine.NS_PER_MS) == [1]
+
+    def test_confirm(self):
+        assert not self.bank.update(1, 0, 0)
+        assert self.bank.confirm(500 * machine.NS_PER_US) == []
+        assert self.bank.confirm(1 * machine.NS_PER_MS) == [1]
+        assert self.bank.report() == {'a': (0, 0), 'b': (1, 0)}
+
+
+    def test_fired_on_rise_keeps_pulse_start(self):
+        assert not self.bank.update(1, 0, 100)
+        # Only seen again once the pulse has ended
+        assert self.bank.update(1, 1, 100 + 2 * machine.NS_PER_MS)
+        assert self.bank.pulse_start[1] == 100
+
+class TestDebounceConfig(unittest.TestCase):
+
+    def test_per_target(self):
+        debounce = {'rearm_us': 30000,
+                    'targets': {2: {'min_pulse_us': 500}},
+                    'start': {'rearm_us': 100000}}
+        m = machine.Machine('start', gpio=fake_gpio.FakeGPIO(),
+                            debounce=debounce)
+        one = m.create_trigger('one', 1, 2, (1, 50))
+        two = m.create_trigger('two', 2, 2, (2, 100))
+        assert (one.min_pulse_us, one.rearm_us) == (0, 30000)
+        assert (two.min_pulse_us, two.rearm_us) == (500, 30000)
+        assert m.get_debounce('start') == (0, 100000)
+
+
+class TestBurst(unittest.TestCase):
+    '''Ten balls a second into one target must not lose any hits.'''
+
+    def make_harness(self, input_mode):
+        gpio = fake_gpio.FakeGPIO()
+        m = machine.Machine('start', gpio=gpio, input_mode=input_mode)
+        trigger = m.create_trigger('test', 1, 2, (1, 50))
+        harness = burst.BurstHarness(m, gpio)
+        harness.burst(trigger.pin, 10, 5)
+        return harness, trigger
+
+    def test_edge_mode(self):
+        harness, trigger = self.make_harness(machine.EDGE_MODE)
+        hits = harness.run_edges()
+        assert len(hits) == 50
+        assert trigger.hits == 50
+        assert trigger.suppressed > 0
+
+    def test_poll_mode(self):
+        harness, trigger = self.make_harness(machine.POLL_MODE)
+        hits = harness.run_scans(1 * machine.NS_PER_MS)
+        assert len(hits) == 50
+        assert trigger.hits == 50
+
+
+class TestPoll(unittest.TestCase):
+
+    def test_poll_posts_events(self):
+        gpio = fake_gpio.FakeGPIO()
+        m = machine.Machine('start', gpio=gpio)
+        trigger = m.create_trigger('test', 1, 2, (1, 50))
+        gpio.set_input(trigger.pin, False)
+        with mock.patch('machine.pygame.event.post') as post:
+            m.poll()
+        post.assert_called_once_with(trigger.event)
+        assert trigger.latched
+
+
+class TestScriptedGPIO(unittest.TestCase):
+
+    def test_play_ball_drops(self):
+        gpio = fake_gpio.FakeGPIO()
+        m = machine.Machine('start', gpio=gpio, input_mode=machine.EDGE_MODE)
+        one = m.create_trigger('one', 1, 2, (1, 50))
+        two = m.create_trigger('two', 2, 2, (2, 100))
+        script = fake_gpio.ball_drops([one.pin, two.pin], 4, 0.03,
+                                      width=0.002, start=0)
+        gpio.play(script).join()
+        assert [pin for _, pin, level in gpio.history if not level] == [
+            one.pin, two.pin, one.pin, two.pin]
+        events = m.get_edge_events()
+        assert [event.sub[0] for event in events] == [1, 2, 1, 2]
+
+
+class TestServo(unittest.TestCase):
+
+    def setUp(self):
+        self.gpio = fake_gpio.FakeGPIO()
+        self.m = machine.Machine('start', gpio=self.gpio,
+                                 servo={'move_ms': 60, 'hold_ms': 20})
+        self.pwm = self.gpio.pwms[self.m.SERVO_PIN]
+
+    def tearDown(self):
+        self.m.close()
+
+    def test_setup(self):
+        pin = self.gpio.pin_mapping[self.m.SERVO_PIN]
+        assert pin['direction'] == self.gpio.OUT
+        assert self.pwm.frequency == 50
+        assert self.pwm.timeline[-1][1] == 0
+
+    def test_release_does_not_block(self):
+        before = machine.time.monotonic()
+        self.m.release_balls()
+        assert machine.time.monotonic() - before < 0.01
+        assert self.m.servo.wait(1)
+        duties = [duty for _, duty in self.pwm.timeline[1:]]
+        # The first move goes straight to the angle, then switches off
+        assert duties == [7.0, 7.0, 7.0, 0]
+        assert [level for _, _, level in self.gpio.outputs] == [True, False]
+
+    def test_profile_steps_each_period(self):
+        self.m.release_balls()
+        self.m.servo.wait(1)
+        start = len(self.pwm.timeline)
+        self.m.hold_balls()
+        self.m.servo.wait(1)
+        steps = self.pwm.timeline[start:]
+        to_duty = machine.servo.angle_to_duty
+        assert [duty for _, duty in steps] == [
+            to_duty(60), to_duty(30), to_duty(0), 0]
+        times = [at for at, _ in steps]
+        period = 20 * machine.NS_PER_MS
+        for earlier, later in zip(times, times[1:-1]):
+            assert abs(later - earlier - period) < 5 * machine.NS_PER_MS
+        # Held before switching off
+        assert times[-1] - times[-2] > 15 * machine.NS_PER_MS
+        assert self.m.servo.stats()['steps'] == 8
+
+    def test_new_move_replaces_current(self):
+        self.m.release_balls()
+        self.m.hold_balls()
+        assert self.m.servo.wait(1)
+        assert self.m.servo.angle == 0
+        assert self.pwm.duty == 0
+        # Switched off once, at the end of the second move
+        assert [level for _, _, level in self.gpio.outputs] == [True, False]
+
+    def test_reverse_from_position_reached(self):
+        servo = self.m.servo
+        servo.angle = 90
+        # Cut short a third of the way from 90 to 0
+        servo.position = 60
+        steps = servo.profile(90, 0)
+        to_duty = machine.servo.angle_to_duty
+        assert [duty for _, duty, _ in steps] == [
+            to_duty(70), to_duty(80), to_duty(90), 0]
+
+    def test_wait_covers_queued_move(self):
+        for _ in range(20):
+            self.m.release_balls()
+            self.m.hold_balls()
+            assert self.m.servo.wait(1)
+            assert self.m.servo.position == 0
+            assert self.pwm.duty == 0
+
+
+class TestPins(unittest.TestCase):
+
+    def test_configured_pins(self):
+        gpio = fake_gpio.FakeGPIO()
+        m = machine.Machine('start', gpio=gpio,
+                            pins={'base': 4, 'start': 3, 'servo': 13})
+        trigger = m.create_trigger('test', 1, 2, (1, 50))
+        assert trigger.pin == 5
+        assert 3 in gpio.pin_mapping
+        assert 13 in gpio.pwms
+        assert m.START_PIN not in gpio.pin_mapping
+
+
+class TestHitRing(unittest.TestCase):
+
+    def setUp(self):
+        self.ring = ring.HitRing(4)
+        self.addCleanup(self.ring.close)
+
+    def test_put_get(self):
+        reader = ring.HitRing(name=self.ring.name)
+        self.addCleanup(reader.close)
+        assert reader.capacity == 4
+        assert self.ring.put(100, 1)
+        assert self.ring.put(200, 2)
+        assert reader.get_all() == [(100, 1), (200, 2)]
+        assert reader.get_all() == []
+
+    def test_overflow(self):
+        for number in range(6):
+            self.ring.put(number, 0)
+        assert self.ring.stats() == {'waiting': 4, 'overflows': 2,
+                                     'high_water': 4}
+        assert [at for at, _ in self.ring.get_all()] == [0, 1, 2, 3]
+        # Room again once read, wrapping around the end
+        assert self.ring.put(6, 0)
+        assert self.ring.get_all() == [(6, 0)]
+
+    def test_head_seen_before_record(self):
+        reader = ring.HitRing(name=self.ring.name)
+        self.addCleanup(reader.close)
+        for number in range(3):
+            self.ring.put(number, 0)
+        reader.get_all()
+        assert self.ring.put(100, 1)
+        # The next head arrives before its record, as it may on ARM
+        ring.INDEX.pack_into(self.ring.buffer, ring.HEAD, 5)
+        assert reader.get_all() == [(100, 1)]
+        assert self.ring.put(200, 2)
+        assert reader.get_all() == [(200, 2)]
+
+
+class TestScanner(unittest.TestCase):
+
+    def test_scan_loop(self):
+        gpio = fake_gpio.FakeGPIO()
+        bank = machine.InputBank()
+        bank.add('test', 21, None)
+        hits = ring.HitRing(16)
+        self.addCleanup(hits.close)
+        stop = threading.Event()
+        thread = threading.Thread(target=scanner.scan_loop, args=(
+            hits, bank, gpio.input, stop, machine.NS_PER_MS))
+        thread.start()
+        before = time.monotonic_ns()
+        gpio.set_input(21, False)
+        time.sleep(0.02)
+        stop.set()
+        thread.join()
+        [(edge_time, index)] = hits.get_all()
+        assert index == 0
+        assert 0 <= edge_time - before < 10 * machine.NS_PER_MS
+
+
+class TestProcessMode(unittest.TestCase):
+
+    def setUp(self):
+        self.gpio = fake_gpio.FakeGPIO()
+        self.m = machine.Machine('start', gpio=self.gpio,
+                                 input_mode=machine.PROCESS_MODE)
+        self.addCleanup(self.m.close)
+        self.trigger = self.m.create_trigger('test', 1, 2, (1, 50))
+
+    def test_inputs_left_to_process(self):
+        assert self.trigger.pin not in self.gpio.pin_mapping
+
+    def test_hits_from_process(self):
+        self.m.input_target = drop_one_ball
+        self.m.start()
+        posted = []
+        deadline = time.monotonic() + 10
+        with mock.patch('machine.pygame.event.post', posted.append):
+            while not posted and time.monotonic() < deadline:
+                self.m.poll()
+                time.sleep(0.01)
+        assert [event.sub for event in posted] == [(1, 50)]
+        assert self.trigger.hits == 1
+        assert self.m.ring_report()['overflows'] == 0
+
+    def test_falls_back_to_polling(self):
+        self.m.input_target = crash
+        self.m.start()
+        self.m.input_process.join()
+        self.m.poll()
+        assert self.m.input_mode == machine.POLL_MODE
+        assert self.m.ring is None
+        assert self.trigger.pin in self.gpio.pin_mapping
+
+
+class TestEventQueue(unittest.TestCase):
+
+    def test_fifo(self):
+        queue = events.EventQueue(8)
+        queue.put('start', events.CONTROL)
+        queue.put('hit')
+        assert queue.get_all() == ['start', 'hit']
+        assert queue.get_all() == []
+
+    def test_ticks_coalesce(self):
+        queue = events.EventQueue(8)
+        for _ in range(3):
+            assert queue.put('tick', events.TICK)
+        assert queue.get_all() == ['tick']
+        assert queue.report()['coalesced'] == 2
+
+    def test_scores_push_out_lower_priorities(self):
+        queue = events.EventQueue(3)
+        queue.put('tick', events.TICK)
+        queue.put('start', events.CONTROL)
+        queue.put('hit 1')
+        assert queue.put('hit 2')
+        assert queue.put('hit 3')
+        assert not queue.put('hit 4')
+        assert not queue.put('start', events.CONTROL)
+        assert queue.get_all() == ['hit 1', 'hit 2', 'hit 3']
+        report = queue.report()
+        assert report['high_water'] == 3
+        assert report['dropped_tick'] == 1
+        assert report['dropped_control'] == 2
+        assert report['dropped_score'] == 1
+
+    def test_stress(self):
+        '''Flood the queue from every trigger at the rated load.
+
+        The rated load is a full queue of hits between two drains of the
+        event loop. Ticks and start presses flood the queue as well, and
+        the event loop stalls now and then.
+        '''
+        queue = events.EventQueue(events.DEFAULT_CAPACITY)
+        gpio = fake_gpio.FakeGPIO()
+        m = machine.Machine('start', gpio=gpio, event_queue=queue)
+        triggers = [m.create_trigger(str(target), target, 2, (target, 0))
+                    for target in range(8)]
+        balls = 200
+        done = threading.Event()
+
+        def roll(trigger):
+            for _ in range(balls):
+                trigger.callback(None)
+                time.sleep(0.0005)
+
+        def flood():
+            while not done.is_set():
+                queue.put('tick', events.TICK)
+                m.start_callback(None)
+
+        received = []
+
+        def drain():
+            while not done.is_set() or len(queue):
+                received.extend(queue.get_all())
+                time.sleep(0.002)
+
+        threads = [threading.Thread(target=roll, args=(trigger,))
+                   for trigger in triggers]
+        others = [threading.Thread(target=flood),
+                  threading.Thread(target=drain)]
+        for thread in threads + others:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        done.set()
+        for thread in others:
+            thread.join()
+        hits = [event for event in received
+                if getattr(event, 'type', None) == 2]
+        report = queue.report()
+        assert len(hits) == balls * len(triggers)
+        assert report['dropped_score'] == 0
+        assert report['high_water'] <= queue.capacity
@@ -0,0 +1,87 @@
+import json
+import mock
+import os
+import shutil
+import tempfile
+import unittest
+import urllib.request
+
+import cortex
+import metrics
+
+
+class TestHistogram(unittest.TestCase):
+    def test_buckets(self):
+        histogram = metrics.Histogram('t_seconds', 'Time.',
+                                      bounds=(1000, 2000))
+        for value in (500, 1000, 1500, 5000):
+            histogram.observe(value)
+        assert histogram.counts == [2, 1, 1]
+        assert list(histogram.lines()) == [
+            't_seconds_bucket{le="1e-06"} 2',
+            't_seconds_bucket{le="2e-06"} 3',
+            't_seconds_bucket{le="+Inf"} 4',
+            't_seconds_sum 8e-06',
+            't_seconds_count 4',
+        ]
+
+
+class TestRegistry(unittest.TestCase):
+    def setUp(self):
+        self.registry = metrics.Registry()
+        self.registry.counter('games_total', 'Games.').inc(3)
+        self.registry.gauge('fps', 'Frames.').set(30)
+
+    def test_render(self):
+        assert self.registry.render() == (
+            '# HELP games_total Games.\n'
+            '# TYPE games_total counter\n'
+            'games_total 3\n'
+            '# HELP fps Frames.\n'
+            '# TYPE fps gauge\n'
+            'fps 30\n')
+
+    def test_exporter(self):
+        tmp = tempfile.mkdtemp()
+        try:
+            path = os.path.join(tmp, 'metrics.json')
+            exporter = metrics.Exporter(self.registry, port=0,
+                                        snapshot=path)
+            url = 'http://127.0.0.1:{}/metrics'.format(exporter.port)
+            with urllib.request.urlopen(url) as response:
+                assert b'games_total 3' in response.read()
+            exporter.stop()
+            with open(path) as snapshot:
+                assert json.load(snapshot)['metrics']['fps'] == 30
+        finally:
+            shutil.rmtree(tmp)
+
+
+class TestCortexMetrics(unittest.TestCase):
+    def setUp(self):
+        with mock.patch('display.Display'):
+            self.ctex = cortex.Cortex({'metrics': {}})
+        self.metrics = self.ctex.metrics
+        self.now = 0
+        self.metrics.clock = lambda: self.now
+
+    def test_poll_jitter(self):
+        self.ctex.set_mode(cortex.OperationMode.PLAY)
+        self.ctex.poll_targets()
+        self.now += 12 * cortex.machine.NS_PER_MS
+        self.ctex.poll_targets()
+        assert self.metrics.poll_jitter.count == 1
+        assert self.metrics.poll_jitter.sum == 2 * cortex.machine.NS_PER_MS
+
+    def test_hits_and_games(self):
+        self.ctex.play()
+        self.ctex.hit_target(mock.Mock(sub=(3, 150)))
+        assert self.metrics.hits.value == 1
+        assert self.metrics.hit_time.count == 1
+        self.ctex.post_play()
+        self.metrics.sample()
+        assert self.metrics.games_per_hour.value == 1
+        self.now += metrics.NS_PER_SECOND * 3600
+        self.metrics.sample()
+        assert self.metrics.games_per_hour.value == 0
+        assert self.metrics.games.value == 1
@@ -0,0 +1,116 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+
+import cortex
+import recorder
+import tests.fake_gpio
+
+
+class TestRecorder(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, 'test.rec')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_round_trip(self):
+        rec = recorder.Recorder(self.path, cortex.OperationMode.ALL)
+        rec.mode(cortex.OperationMode.PLAY)
+        rec.edge(5, 2, False)
+        rec.event(recorder.pygame.event.Event(cortex.Cortex.TARGET_EVENT,
+                                              sub=(3, 150), edge_time=7))
+        rec.close()
+        records = list(recorder.read(self.path))
+        assert records == [
+            recorder.Record(records[0].time, recorder.MODE, 1, 0, 0),
+            recorder.Record(5, recorder.EDGE, 2, 0, 0),
+            recorder.Record(7, recorder.EVENT, cortex.Cortex.TARGET_EVENT,
+                            3, 150)]
+
+    def test_partial_record_ignored(self):
+        rec = recorder.Recorder(self.path, cortex.OperationMode.ALL)
+        rec.edge(5, 2, True)
+        rec.close()
+        with open(self.path, 'ab') as log_file:
+            log_file.write(b'\0' * 7)
+        assert len(list(recorder.read(self.path))) == 1
+
+    def test_not_a_log(self):
+        with open(self.path, 'wb') as log_file:
+            log_file.write(b'nonsense')
+        with self.assertRaises(ValueError):
+            list(recorder.read(self.path))
+
+    def test_replay(self):
+        rec = recorder.Recorder(self.path, cortex.OperationMode.ALL)
+        rec.write(recorder.EVENT, cortex.Cortex.START_EVENT)
+        for _ in range(9):
+            rec.write(recorder.EVENT, cortex.Cortex.TARGET_EVENT, 2, 100)
+        rec.write(recorder.EVENT, cortex.Cortex.END_EVENT)
+        rec.write(recorder.MODE, 2)
+        rec.close()
+        summary = recorder.replay(self.path)
+        assert summary['events'] == 11
+        assert summary['scores'] == [900]
+        assert summary['mode_mismatches'] == 0
+
+    def test_replay_sessions(self):
+        for _ in range(2):
+            rec = recorder.Recorder(self.path, cortex.OperationMode.ALL)
+            rec.mode(cortex.OperationMode.ATTRACT)
+            rec.write(recorder.EVENT, cortex.Cortex.START_EVENT)
+            rec.write(recorder.EVENT, cortex.Cortex.TARGET_EVENT, 2, 100)
+            rec.write(recorder.EVENT, cortex.Cortex.END_EVENT)
+            rec.write(recorder.EVENT, recorder.pygame.QUIT)
+            rec.close()
+        summary = recorder.replay(self.path)
+        assert summary['sessions'] == 2
+        assert summary['scores'] == [100, 100]
+        assert summary['mode_mismatches'] == 0
+
+    def test_replay_key_hits_once(self):
+        # A key queues a hit, which was recorded when it was handled
+        rec = recorder.Recorder(self.path, cortex.OperationMode.ALL)
+        rec.write(recorder.EVENT, cortex.Cortex.START_EVENT)
+        rec.write(recorder.EVENT, recorder.pygame.KEYDOWN, ord('3'))
+        rec.write(recorder.EVENT, cortex.Cortex.TARGET_EVENT, 3, 150)
+        rec.write(recorder.EVENT, cortex.Cortex.END_EVENT)
+        rec.close()
+        shutdown = cortex.Cortex.shutdown
+        seen = []
+
+        def check_shutdown(ctex):
+            seen.append((len(ctex.input_events), ctex.machine.gpio))
+            shutdown(ctex)
+        with mock.patch.object(cortex.Cortex, 'shutdown', check_shutdown):
+            summary = recorder.replay(self.path)
+        assert summary['scores'] == [150]
+        [(queued, gpio)] = seen
+        assert queued == 0
+        assert isinstance(gpio, tests.fake_gpio.FakeGPIO)
+
+    def test_replay_on_log_clock(self):
+        # The catch-all of the first ball is missed, the second scores
+        # nothing, so the third is tripled only if the first has expired
+        config = {'game': 'triple', 'games': {'triple': {
+            'balls': 3, 'targets': {0: 0, 1: 50, 2: 100},
+            'rules': [{'name': 'Triple', 'multiplier': 3, 'balls': [3]}],
+        }}}
+        second = 10**9
+        rec = recorder.Recorder(self.path, cortex.OperationMode.ALL)
+        rec.write(recorder.EVENT, cortex.Cortex.START_EVENT, now=0)
+        target = cortex.Cortex.TARGET_EVENT
+        rec.write(recorder.EVENT, target, 2, 100, 1 * second)
+        rec.write(recorder.EVENT, target, 0, 0, 10 * second)
+        rec.write(recorder.EVENT, target, 2, 100, 20 * second)
+        rec.write(recorder.EVENT, target, 0, 0, 21 * second)
+        rec.write(recorder.EVENT, cortex.Cortex.END_EVENT, now=21 * second)
+        rec.close()
+        summary = recorder.replay(self.path, config)
+        assert summary['scores'] == [400]
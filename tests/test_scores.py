@@ -0,0 +1,122 @@
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+import scores
+
+
+class TestRankIndex(unittest.TestCase):
+
+    def test_rank_and_top(self):
+        index = scores.RankIndex(capacity=8)
+        rng = random.Random(0)
+        values = [rng.randrange(3000) for _ in range(200)]
+        values += [300, 300, 2700]
+        for value in values:
+            index.add(value)
+        ordered = sorted(values, reverse=True)
+        assert len(index) == len(values)
+        assert index.top(10) == ordered[:10]
+        assert index.top(1000) == ordered
+        for value in (0, 300, 2700, 5000):
+            assert index.rank(value) == 1 + sum(1 for v in values if v > value)
+
+    def test_negative_score(self):
+        index = scores.RankIndex()
+        index.add(-50)
+        index.add(100)
+        assert index.top(5) == [100, 0]
+        assert index.rank(-50) == 2
+
+    def test_empty(self):
+        index = scores.RankIndex()
+        assert index.top(5) == []
+        assert index.rank(100) == 1
+
+
+class TestScoreStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.path = os.path.join(self.tmp, 'scores.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_in_memory(self):
+        store = scores.ScoreStore()
+        assert store.add(100) == 1
+        assert store.add(250) == 1
+        assert store.add(50) == 3
+        assert store.top(2) == [250, 100]
+        assert store.history(5) == []
+        store.close()
+
+    def test_persists(self):
+        store = scores.ScoreStore(self.path)
+        store.add(100, ended=1.0)
+        store.add(450, ended=2.0)
+        assert store.history(1) == [(2.0, 450)]
+        store.close()
+        store = scores.ScoreStore(self.path)
+        assert store.top(5) == [450, 100]
+        assert store.rank(200) == 2
+        store.close()
+
+
+class TestDropLog(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def test_games_continue_after_reopen(self):
+        log = scores.DropLog(self.tmp)
+        log.start_game()
+        log.append(3, 150, now=1)
+        log.append(0, 0, now=2)
+        log.close()
+        log = scores.DropLog(self.tmp)
+        assert log.rows == 2
+        log.start_game()
+        assert log.game == 1
+        log.close()
+
+    def test_detached_rows_written_later(self):
+        log = scores.DropLog(self.tmp)
+        log.append(3, 150, now=1)
+        rows = log.detach()
+        log.append(0, 0, now=2)
+        assert log.rows == 0
+        log.write_rows(rows)
+        assert log.rows == 1
+        log.close()
+        assert log.rows == 2
+
+    def test_large_and_negative_points(self):
+        log = scores.DropLog(self.tmp)
+        # A big streak bonus, and a target with negative points
+        log.append(3, 100150, now=1)
+        log.append(4, -50, now=2)
+        log.close()
+        points = scores.drops.array.array('i')
+        with open(scores.drops.column_path(self.tmp, 'points'), 'rb') as f:
+            points.fromfile(f, 2)
+        assert list(points) == [100150, -50]
+
+    def test_partial_row_dropped(self):
+        log = scores.DropLog(self.tmp)
+        log.append(3, 150, now=1)
+        log.close()
+        # A power cut after only some of the columns were written
+        with open(scores.drops.column_path(self.tmp, 'game'), 'ab') as f:
+            f.write(b'\x01\x00\x00\x00')
+        log = scores.DropLog(self.tmp)
+        assert log.rows == 1
+        log.close()
+        assert os.path.getsize(
+            scores.drops.column_path(self.tmp, 'game')) == 4
@@ -0,0 +1,53 @@
+import unittest
+
+import mock
+
+import timers
+from burst import VirtualClock
+
+
+class TestTimers(unittest.TestCase):
+
+    def setUp(self):
+        self.clock = VirtualClock(1000)
+        self.timers = timers.Timers(self.clock)
+        self.calls = []
+
+    def test_order(self):
+        self.timers.call_later(30, self.calls.append, 'c')
+        self.timers.call_later(10, self.calls.append, 'a')
+        self.timers.call_later(10, self.calls.append, 'b')
+        assert self.timers.timeout() == 10
+        assert self.timers.run(1009) == 0
+        assert self.timers.run(1010) == 2
+        assert self.calls == ['a', 'b']
+        assert self.timers.timeout(1010) == 20
+        self.timers.run(2000)
+        assert self.calls == ['a', 'b', 'c']
+        assert self.timers.timeout() is None
+
+    def test_cancel(self):
+        timer = self.timers.call_later(10, self.calls.append, 'a')
+        self.timers.call_later(20, self.calls.append, 'b')
+        timer.cancel()
+        assert len(self.timers) == 1
+        assert self.timers.timeout() == 20
+        self.timers.run(2000)
+        assert self.calls == ['b']
+
+    def test_every(self):
+        self.timers.call_every(100, self.calls.append, 'tick')
+        self.timers.run(1100)
+        self.timers.run(1199)
+        assert self.calls == ['tick']
+        # A late run catches up once and keeps the beat
+        self.timers.run(1550)
+        assert self.calls == ['tick', 'tick']
+        assert self.timers.timeout(1550) == 50
+
+    def test_post_later(self):
+        event = timers.pygame.event.Event(timers.pygame.USEREVENT)
+        self.timers.post_later(5, event)
+        with mock.patch('timers.pygame.event.post') as post:
+            self.timers.run(1005)
+        post.assert_called_once_with(event)
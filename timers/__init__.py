@@ -0,0 +1,103 @@
+'''
+Deadlines for timed actions, run by the event loop.
+
+Everything that has to happen at a time rather than in response to input
+is scheduled here: leaving post play, rotating the attract screens,
+confirming a debounced input and the input poll itself. The servo keeps
+its own, tighter, deadlines on its own thread, see machine.servo. The
+event loop sleeps until the earliest deadline, see Timers.timeout(), and
+then runs whatever is due with Timers.run().
+
+The deadlines are kept in a heap, cancelled timers are dropped lazily when
+they reach the top.
+'''
+import heapq
+import itertools
+import time
+
+import pygame
+
+
+class Timer(object):
+    '''A scheduled action, returned so that it can be cancelled.'''
+    __slots__ = ('when', 'period', 'action', 'args', 'cancelled')
+
+    def __init__(self, when, period, action, args):
+        self.when = when
+        self.period = period
+        self.action = action
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class Timers(object):
+    '''A heap of deadlines on a monotonic nanosecond clock.'''
+
+    def __init__(self, clock=time.monotonic_ns):
+        self.clock = clock
+        self.heap = []
+        # Breaks ties so timers due together run in the order scheduled
+        self.sequence = itertools.count()
+
+    def __len__(self):
+        return sum(1 for _, _, timer in self.heap if not timer.cancelled)
+
+    def call_at(self, when, action, *args):
+        '''Call action(*args) once the clock reaches when.'''
+        return self.push(Timer(when, None, action, args))
+
+    def call_later(self, delay, action, *args):
+        '''Call action(*args) delay nanoseconds from now.'''
+        return self.call_at(self.clock() + delay, action, *args)
+
+    def call_every(self, period, action, *args):
+        '''Call action(*args) every period nanoseconds, starting in one.'''
+        return self.push(Timer(self.clock() + period, period, action, args))
+
+    def post_later(self, delay, event):
+        '''Post a pygame event delay nanoseconds from now.'''
+        return self.call_later(delay, self.post, event)
+
+    def post_every(self, period, event):
+        '''Post a pygame event every period nanoseconds.'''
+        return self.call_every(period, self.post, event)
+
+    def post(self, event):
+        pygame.event.post(event)
+
+    def push(self, timer):
+        heapq.heappush(self.heap, (timer.when, next(self.sequence), timer))
+        return timer
+
+    def timeout(self, now=None):
+        '''Nanoseconds until the next deadline, None if there is none.'''
+        heap = self.heap
+        while heap and heap[0][2].cancelled:
+            heapq.heappop(heap)
+        if not heap:
+            return None
+        if now is None:
+            now = self.clock()
+        return max(0, heap[0][0] - now)
+
+    def run(self, now=None):
+        '''Run every action that is due, returns how many ran.'''
+        if now is None:
+            now = self.clock()
+        heap = self.heap
+        count = 0
+        while heap and heap[0][0] <= now:
+            _, _, timer = heapq.heappop(heap)
+            if timer.cancelled:
+                continue
+            if timer.period is not None:
+                # Stay on the original beat, skipping any missed periods
+                missed = (now - timer.when) // timer.period
+                timer.when += (missed + 1) * timer.period
+                self.push(timer)
+            timer.action(*timer.args)
+            count += 1
+        return count